@@ -6,6 +6,88 @@ WFS = 4
 
 VECTOR_URL = '/vector/api/'
 
+# Seconds to keep features count for vector layers with 'cached' count strategy
+VECTOR_COUNT_CACHE_TIMEOUT = 300
+
+# Simplification tolerance for vector data in pixels, for 'resolution'/'scale' params
+VECTOR_SIMPLIFY_PIXEL_TOLERANCE = 1
+
+# Screen dpi to get resolution from 'scale' param
+VECTOR_SIMPLIFY_DPI = 96
+
+# Grid steps for bbox side of quantized geometries, when no precision is set
+VECTOR_QUANTIZATION = 1000000
+
+# Seconds to keep distinct values of unique widget, cache is invalidated on layer editing
+VECTOR_WIDGET_UNIQUE_CACHE_TIMEOUT = 3600
+
+# Seconds to keep editing fields structure of vector layers
+VECTOR_CONFIG_CACHE_TIMEOUT = 3600
+
+# Max features for every insert/delete query of vector batch writing
+VECTOR_BATCH_SIZE = 500
+
+# Max related rows for every parent feature of relations batch API
+VECTOR_RELATIONS_PAGE_SIZE = 100
+
+# Max features for every layer of search widgets results
+VECTOR_SEARCH_MAX_RESULTS = 100
+
+# Threads for every process to run layers queries of multi layers searches concurrently
+VECTOR_QUERY_THREADS = 4
+
+# Seconds before every layer query of multi layers searches is aborted, layer result is an error then
+VECTOR_SEARCH_LAYER_TIMEOUT = 10
+
+# Max values of search widgets fields autocomplete
+VECTOR_AUTOCOMPLETE_MAX_RESULTS = 20
+
+# Embed every distinct value of selectbox search fields in project config,
+# set False for clients using autocomplete url only
+VECTOR_SEARCH_SELECTBOX_VALUES = True
+
+# Cluster cell size in pixels, for vector cluster mode
+VECTOR_CLUSTER_PIXEL_SIZE = 60
+
+# Max cells of density grid
+VECTOR_DENSITY_MAX_CELLS = 250000
+
+# Seconds to keep vector tiles in TileStache cache and in HTTP caches, cache is invalidated on layer editing
+VECTOR_TILES_CACHE_TIMEOUT = 3600
+
+# Seconds to keep Spatialite layers connections open, None for persistent connections
+SPATIALITE_CONN_MAX_AGE = None
+
+# Seconds to wait for Spatialite database lock
+SPATIALITE_BUSY_TIMEOUT = 30
+
+# Pragmas of Spatialite layers read and write connections
+SPATIALITE_READ_PRAGMAS = {
+    'query_only': 1,
+    'mmap_size': 268435456,
+    'cache_size': -65536
+}
+SPATIALITE_WRITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -16384
+}
+
+# Max sampled rows and bins for numeric columns histograms of layer statistics
+VECTOR_STATS_SAMPLE_SIZE = 10000
+VECTOR_STATS_HISTOGRAM_BINS = 20
+
+# Read replicas of layers Postgis datasources, by '<host>/<dbname>' of primary datasource,
+# replica keys not set are taken from primary datasource, i.e.:
+# {'dbhost/gis': [{'host': 'dbreplica', 'port': '5432'}]}
+VECTOR_DATASOURCE_REPLICAS = {}
+
+# Max replication lag in seconds to read from a replica
+VECTOR_REPLICA_MAX_LAG = 30
+
+# Seconds between checks of replicas lag
+VECTOR_REPLICA_LAG_CHECK_INTERVAL = 10
+
 # Layer edit options, , for bitwise operations
 INSERT = 1
 UPDATE = 2
@@ -66,9 +66,15 @@ class ClientSearchApiView(APIView):
 
         # build response from modules
         # todo:: to build response
-        response = [res[1].asJSON() for res in resSearch]
+        response = [res[1].asJSON() for res in resSearch if res[1] is not None]
         return Response(response)
 
+    def post(self, request, format=None, group_slug=None, project_type=None, project_id=None, widget_id=None):
+
+        # search values in request body, for long values lists
+        return self.get(request, format=format, group_slug=group_slug, project_type=project_type,
+                        project_id=project_id, widget_id=widget_id)
+
 
 class GroupConfigApiView(APIView):
     """
@@ -0,0 +1,195 @@
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry, GEOSException
+from django.contrib.gis.gdal import OGRException, GDALException
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction, DatabaseError
+from django.utils.translation import ugettext as _
+from core.utils.db import get_write_alias, serialized_write
+import json
+import logging
+
+logger = logging.getLogger('g3wadmin.debug')
+
+
+class BatchRollback(Exception):
+    """
+    Raised inside batch transaction to rollback it
+    """
+    pass
+
+
+class FeaturesBatchWriter(object):
+    """
+    Write in one transaction inserts, updates and deletes of features of a vector layer model.
+    Payload:
+        {
+            'add': [GeoJSON features, 'id' is the client id],
+            'update': [GeoJSON features, 'id' is the primary key],
+            'delete': [primary keys]
+        }
+    :param model: django model of layer
+    :param using: db connection alias, writes go through its write connection
+    :param geometry_field: name of geometry field, None for no geometry layers
+    :param srid: srid of payload geometries
+    :param layer_srid: srid of layer geometries
+    :param lock: editing features lock of metadata layer, updated and deleted features have to be locked by it
+    """
+
+    def __init__(self, model, using, geometry_field=None, srid=None, layer_srid=None, lock=None):
+        self.model = model
+        self.using = get_write_alias(using)
+        self.geometry_field = geometry_field
+        self.srid = srid
+        self.layer_srid = layer_srid
+        self.lock = lock
+        self.fields = {f.name: f for f in model._meta.concrete_fields}
+        self.pk = model._meta.pk
+        self.errors = []
+
+    def get_queryset(self):
+        return self.model.objects.using(self.using)
+
+    def get_geometry(self, data):
+        """
+        GeoJSON geometry to GEOSGeometry, through OGR and WKB
+        """
+        if data is None:
+            return None
+        try:
+            geometry = GEOSGeometry(json.dumps(data) if isinstance(data, dict) else data)
+        except (ValueError, TypeError, GEOSException, OGRException):
+            raise ValidationError(_('Invalid geometry'))
+
+        geometry.srid = self.srid or self.layer_srid
+        if self.layer_srid and geometry.srid != self.layer_srid:
+            try:
+                geometry.transform(self.layer_srid)
+            except (GEOSException, GDALException):
+                raise ValidationError(_('Geometry can not be transformed to layer srid'))
+        return geometry
+
+    def check_lock(self, fid):
+        """
+        Check feature is locked by current editing session, like single feature editing
+        """
+        if self.lock is not None and not self.lock.checkFeatureLocked(fid):
+            raise ValidationError(_('Feature is not locked for editing'))
+
+    def build_instance(self, feature, adding):
+        """
+        Build and validate model instance from GeoJSON feature
+        :return: tuple (instance, list of fields names set)
+        """
+        if not isinstance(feature, dict):
+            raise ValidationError(_('Feature is not an object'))
+
+        properties = feature.get('properties') or {}
+        unknown = [k for k in properties if k not in self.fields]
+        if unknown:
+            raise ValidationError({k: [_('Field not in layer')] for k in unknown})
+
+        values = dict(properties)
+        if not adding:
+            values.pop(self.pk.name, None)
+        if self.geometry_field and 'geometry' in feature:
+            values[self.geometry_field] = self.get_geometry(feature['geometry'])
+
+        instance = self.model(**values)
+
+        # only set fields are validated for updates, not set primary key for inserts
+        if adding:
+            exclude = [self.pk.name] if self.pk.name not in values else []
+        else:
+            exclude = [name for name in self.fields if name not in values]
+        instance.clean_fields(exclude=exclude)
+        return instance, values.keys()
+
+    def add_error(self, operation, fid, error):
+        self.errors.append({
+            'operation': operation,
+            'id': fid,
+            'errors': error.message_dict if hasattr(error, 'error_dict') else error.messages
+        })
+
+    def write(self, payload):
+        """
+        Validate and write payload, nothing is written if any feature has errors
+        :param payload: dict
+        :return: dict of results or None if errors, see self.errors
+        """
+        self.errors = []
+        results = {'new': [], 'updated': [], 'deleted': []}
+
+        # validate every feature before db writing
+        to_add = []
+        for feature in payload.get('add', []):
+            fid = feature.get('id') if isinstance(feature, dict) else None
+            try:
+                to_add.append((fid, self.build_instance(feature, adding=True)[0]))
+            except ValidationError as e:
+                self.add_error('add', fid, e)
+
+        to_update = []
+        for feature in payload.get('update', []):
+            fid = feature.get('id') if isinstance(feature, dict) else None
+            try:
+                if fid is None:
+                    raise ValidationError(_('Feature id is required'))
+                self.check_lock(fid)
+                instance, names = self.build_instance(feature, adding=False)
+                attnames = [self.fields[n].attname for n in names]
+                to_update.append((self.pk.to_python(fid), {a: getattr(instance, a) for a in attnames}))
+            except ValidationError as e:
+                self.add_error('update', fid, e)
+
+        to_delete = []
+        for fid in payload.get('delete', []):
+            try:
+                self.check_lock(fid)
+                to_delete.append(self.pk.to_python(fid))
+            except ValidationError as e:
+                self.add_error('delete', fid, e)
+
+        if self.errors:
+            return None
+
+        try:
+            with serialized_write(self.using), transaction.atomic(using=self.using):
+                queryset = self.get_queryset()
+
+                if to_add:
+                    instances = [i for fid, i in to_add]
+                    if connections[self.using].features.can_return_ids_from_bulk_insert:
+                        queryset.bulk_create(instances, batch_size=settings.VECTOR_BATCH_SIZE)
+                    else:
+                        for instance in instances:
+                            instance.save(force_insert=True, using=self.using)
+                    results['new'] = [{'clientid': fid, 'id': i.pk} for fid, i in to_add]
+
+                # Django 1.11 has no bulk_update: one UPDATE for every feature, in the same transaction
+                for pk, values in to_update:
+                    if values and not queryset.filter(pk=pk).update(**values):
+                        self.add_error('update', pk, ValidationError(_('Feature not found')))
+                    results['updated'].append(pk)
+
+                # in chunks, to stay under db query params limit
+                for n in range(0, len(to_delete), settings.VECTOR_BATCH_SIZE):
+                    chunk = to_delete[n:n + settings.VECTOR_BATCH_SIZE]
+                    existing = set(queryset.filter(pk__in=chunk).values_list('pk', flat=True))
+                    for pk in chunk:
+                        if pk not in existing:
+                            self.add_error('delete', pk, ValidationError(_('Feature not found')))
+                    queryset.filter(pk__in=chunk).delete()
+                results['deleted'] = to_delete
+
+                if self.errors:
+                    raise BatchRollback()
+
+        except BatchRollback:
+            return None
+        except DatabaseError as e:
+            logger.error('Batch write on {}: {}'.format(self.model._meta.db_table, e))
+            self.add_error('batch', None, ValidationError(_('Database error, nothing was written')))
+            return None
+
+        return results
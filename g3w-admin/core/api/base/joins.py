@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models import OuterRef, Subquery, BinaryField
+from django.contrib.gis.db.models import GeometryField
+
+# settings keys to compare to check if two connections aliases are the same database
+DATABASE_IDENTITY_KEYS = ('ENGINE', 'NAME', 'HOST', 'PORT', 'USER', 'OPTIONS')
+
+
+def is_same_database(using, other_using):
+    """
+    Check if two connections aliases point to the same database (and schema search path)
+    """
+    if using == other_using:
+        return True
+    db, other_db = connections.databases.get(using), connections.databases.get(other_using)
+    if not db or not other_db:
+        return False
+    return all(db.get(k) == other_db.get(k) for k in DATABASE_IDENTITY_KEYS)
+
+
+class VectorJoin(object):
+    """
+    One to one join of vector layer features with features of another layer, like QGIS vector joins:
+    joined fields are added to features properties with a prefix.
+    :param model: join layer django model
+    :param using: join layer db connection alias
+    :param join_field: join layer field name
+    :param target_field: layer field name
+    :param prefix: prefix of joined properties names
+    :param excluded_fields: join layer fields names not to add
+    """
+
+    def __init__(self, model, using, join_field, target_field, prefix, excluded_fields=None):
+        self.model = model
+        self.using = using
+        self.join_field = join_field
+        self.target_field = target_field
+        self.prefix = prefix
+
+        excluded_fields = excluded_fields or []
+        self.fields = [f.name for f in model._meta.concrete_fields if f.name != join_field and
+                       f.name not in excluded_fields and not isinstance(f, (GeometryField, BinaryField))]
+
+    def get_queryset(self):
+        return self.model.objects.using(self.using)
+
+    def property_name(self, field):
+        return '{}{}'.format(self.prefix, field)
+
+
+class VectorJoinsMaterializer(object):
+    """
+    Add joined fields to features of a layer queryset:
+    joins with layers in the same database are performed in SQL by subqueries annotations,
+    the other ones by a batched query for every join, keyed on join values.
+    :param joins: list of VectorJoin instances
+    :param using: layer db connection alias
+    """
+
+    def __init__(self, joins, using):
+        self.sql_joins = [j for j in joins if is_same_database(using, j.using)]
+        self.batched_joins = [j for j in joins if j not in self.sql_joins]
+
+    @staticmethod
+    def annotation_name(n, field):
+        return 'g3w_join_{}_{}'.format(n, field)
+
+    def annotate(self, queryset):
+        """
+        Annotate layer queryset with fields of same database joins
+        """
+        annotations = {}
+        for n, join in enumerate(self.sql_joins):
+            joined = join.model._default_manager.filter(**{join.join_field: OuterRef(join.target_field)})
+            for field in join.fields:
+                annotations[self.annotation_name(n, field)] = Subquery(joined.values(field)[:1])
+        return queryset.annotate(**annotations) if annotations else queryset
+
+    def get_batched_values(self, join, instances):
+        """
+        Joined values of batched join, by join value: first join layer feature for every join value
+        :return: dict
+        """
+        keys = list(set(getattr(i, join.target_field) for i in instances) - {None})
+        values = {}
+        for n in range(0, len(keys), settings.VECTOR_BATCH_SIZE):
+            rows = join.get_queryset().filter(**{
+                '{}__in'.format(join.join_field): keys[n:n + settings.VECTOR_BATCH_SIZE]
+            }).order_by().values(join.join_field, *join.fields)
+            for row in rows:
+                values.setdefault(row.pop(join.join_field), row)
+        return values
+
+    def add_properties(self, instances, properties):
+        """
+        Add joined fields to serialized features properties
+        :param instances: list of layer model instances, annotated by self.annotate
+        :param properties: list of features properties dicts, in the same order of instances
+        """
+        for n, join in enumerate(self.sql_joins):
+            for instance, props in zip(instances, properties):
+                for field in join.fields:
+                    props[join.property_name(field)] = getattr(instance, self.annotation_name(n, field), None)
+
+        for join in self.batched_joins:
+            values = self.get_batched_values(join, instances)
+            for instance, props in zip(instances, properties):
+                row = values.get(getattr(instance, join.target_field), {})
+                for field in join.fields:
+                    props[join.property_name(field)] = row.get(field)
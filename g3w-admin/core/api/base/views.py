@@ -1,27 +1,74 @@
 from django.conf import settings
-from django.core.exceptions import PermissionDenied
-from django.http import Http404
+from django.core.exceptions import PermissionDenied, ValidationError, EmptyResultSet
+from django.http import Http404, HttpResponse
 from django.utils import six
 from django.utils.translation import ugettext, ugettext_lazy as _
-from django.contrib.gis.geos import GEOSGeometry
+from django.contrib.gis.geos import GEOSGeometry, Polygon
 from rest_framework.views import APIView
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import PageNumberPagination, BasePagination
+from rest_framework.settings import api_settings
 from rest_framework import exceptions, status
 from rest_framework.compat import set_rollback
 from rest_framework.response import Response
-from rest_framework.exceptions import APIException
-from core.api.filters import IntersectsBBoxFilter
-from core.signals import post_create_maplayerattributes, post_serialize_maplayer
+from rest_framework.exceptions import APIException, NotFound, ParseError
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, F
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.db.models.functions import Transform
+from django.core.paginator import Paginator as DjangoPaginator
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from core.api.filters import IntersectsBBoxFilter, ExpressionFilterBackend
+from core.signals import post_create_maplayerattributes, post_serialize_maplayer, post_save_maplayer
 from core.utils.structure import mapLayerAttributes, mapLayerAttributesFromModel
 from core.api.authentication import CsrfExemptSessionAuthentication
 
 from core.utils.structure import APIVectorLayerStructure
+from core.utils.geo import transform_geometries, transform_featurecollection, transform_length, is_geographic, \
+    round_featurecollection, quantize_featurecollection, mercator_tile_bounds, DEGREE_METERS
+from core.geo.functions import SimplifyPreserveTopology
+from core.api.base.batch import FeaturesBatchWriter
+from core.api.base.joins import VectorJoinsMaterializer
+from core.geo.aggregation import grid_clusters, clusters_featurecollection, density_grid, AGGREGATES
+from core.utils.search import NUMERIC_FIELDS
+from core.utils.stats import layer_statistics
+from core.geo.formats import VECTOR_FORMAT_RESPONDERS
+from core.geo.spatialindex import spatial_index_bbox_queryset
+from core.geo.tiles import vector_tile, tile_buffer_bounds, TileCacheLayer, read_cached_tile, save_cached_tile, \
+    MVT_CONTENT_TYPE, MVT_MAX_ZOOM
+from core.api.renderers import FlatGeobufRenderer, GeoArrowRenderer
+from core.utils.db import estimate_queryset_count, pin_primary
+from core.configs import COUNT_EXACT, COUNT_ESTIMATE, COUNT_CACHED
+from functools import partial
+import hashlib
 from copy import copy
 from collections import OrderedDict
 import json
+import base64
+import binascii
 
 MODE_DATA = 'data'
 MODE_CONFIG = 'config'
+MODE_BATCH = 'batch'
+MODE_CLUSTER = 'cluster'
+MODE_TILES = 'tiles'
+MODE_STATS = 'stats'
+
+# annotation name of simplified geometry
+SIMPLIFIED_GEOMETRY_FIELD = 'g3w_simplified_geometry'
+
+# annotation name of geometry reprojected for binary formats
+OUTPUT_GEOMETRY_FIELD = 'g3w_output_geometry'
+
+# meters for inch, to get resolution from scale
+INCH_METERS = 0.0254
+
+# geometry encoding with integer delta coordinates
+GEOMETRY_ENCODING_QUANTIZED = 'quantized'
+
+# max decimal digits of coordinates
+MAX_GEOMETRY_PRECISION = 15
 
 
 class G3WAPIResults(object):
@@ -131,9 +178,156 @@ class G3WAPIView(APIView):
         return super(G3WAPIView, self).dispatch(request, *args, **kwargs)
 
 
+class G3WDjangoPaginator(DjangoPaginator):
+    """
+    Django paginator with custom count function
+    """
+
+    def __init__(self, object_list, per_page, count_function=None, **kwargs):
+        self.count_function = count_function
+        super(G3WDjangoPaginator, self).__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.count_function:
+            return self.count_function(self.object_list)
+        return super(G3WDjangoPaginator, self).count
+
+
 class G3WAPIPaginator(PageNumberPagination):
     page_size_query_param = 'page_size'
 
+    def paginate_queryset(self, queryset, request, view=None):
+
+        # count by view count strategy
+        if view is not None and hasattr(view, 'get_features_count'):
+            self.django_paginator_class = partial(G3WDjangoPaginator, count_function=view.get_features_count)
+        return super(G3WAPIPaginator, self).paginate_queryset(queryset, request, view=view)
+
+
+class G3WAPIKeysetPaginator(BasePagination):
+    """
+    Keyset (cursor) paginator: pages are selected by a WHERE condition on layer primary key
+    (and optional ordering column) instead of OFFSET scans. Returns opaque next/previous cursors,
+    counting features only if 'count' param is set.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_query_param = 'ordering'
+    count_query_param = 'count'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = None
+
+    invalid_cursor_message = _('Invalid cursor')
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size) if self.max_page_size else page_size
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def encode_cursor(self, instance, reverse):
+        """
+        Build opaque cursor from instance position
+        """
+        position = [getattr(instance, self.pk_name)]
+        if self.ordering_field:
+            position.insert(0, getattr(instance, self.ordering_field))
+        return base64.urlsafe_b64encode(json.dumps({'p': position, 'r': int(reverse)}, cls=DjangoJSONEncoder))
+
+    def decode_cursor(self, request):
+        """
+        Get position and reverse status from cursor request param
+        :return: tuple (position list or None, reverse boolean)
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(str(encoded)))
+            position = cursor['p']
+            if len(position) != len(self.position_fields):
+                raise ValueError
+            position = [f.to_python(v) for f, v in zip(self.position_fields, position)]
+            if None in position:
+                raise ValueError
+            return position, bool(cursor['r'])
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError):
+            raise ParseError(self.invalid_cursor_message)
+
+    def get_ordering(self, request, queryset):
+        """
+        Set ordering column and direction, only one not nullable column is allowed beside pk
+        """
+        self.pk_name = queryset.model._meta.pk.name
+        self.ordering_field = None
+        self.ordering_desc = False
+
+        # fields of cursor position values
+        self.position_fields = [queryset.model._meta.pk]
+
+        ordering = request.query_params.get(self.ordering_query_param)
+        if ordering:
+            self.ordering_desc = ordering.startswith('-')
+            field_name = ordering.lstrip('-')
+            if field_name not in (self.pk_name, 'pk'):
+                try:
+                    field = queryset.model._meta.get_field(field_name)
+                except FieldDoesNotExist:
+                    raise ParseError(_('Ordering field {} does not exist').format(field_name))
+                if field.null:
+                    raise ParseError(_('Keyset pagination can not order by nullable field {}').format(field_name))
+                self.ordering_field = field.name
+                self.position_fields.insert(0, field)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.get_ordering(request, queryset)
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true', 'True'):
+            self.count = view.get_features_count(queryset) if hasattr(view, 'get_features_count') \
+                else queryset.count()
+
+        # direction of page reading
+        desc = self.ordering_desc != reverse
+        lookup = 'lt' if desc else 'gt'
+
+        if position:
+            pk_value = position[-1]
+            if self.ordering_field:
+                ordering_value = position[0]
+                queryset = queryset.filter(
+                    Q(**{'{}__{}'.format(self.ordering_field, lookup): ordering_value}) |
+                    Q(**{self.ordering_field: ordering_value, '{}__{}'.format(self.pk_name, lookup): pk_value}))
+            else:
+                queryset = queryset.filter(**{'{}__{}'.format(self.pk_name, lookup): pk_value})
+
+        order_by = [self.ordering_field, self.pk_name] if self.ordering_field else [self.pk_name]
+        queryset = queryset.order_by(*['-{}'.format(o) if desc else o for o in order_by])
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        # set cursors
+        self.next = self.previous = None
+        if results:
+            has_next = True if reverse else has_more
+            has_previous = has_more if reverse else position is not None
+            if has_next:
+                self.next = self.encode_cursor(results[-1], False)
+            if has_previous:
+                self.previous = self.encode_cursor(results[0], True)
+
+        return results
+
 
 class BaseVectorOnModelApiView(G3WAPIView):
     """
@@ -158,6 +352,9 @@ class BaseVectorOnModelApiView(G3WAPIView):
     # Database keyname to use if different from default settings
     database_to_use = None
 
+    # layer structure of config mode read from cache by set_metadata_layer
+    cached_config = None
+
     # Method to user for the mapping layers attributes to send to client
     mapping_layer_attributes_function = mapLayerAttributes
 
@@ -170,8 +367,34 @@ class BaseVectorOnModelApiView(G3WAPIView):
         MODE_DATA
     ]
 
+    # Modes call reading from datasource read replicas, if any
+    replica_modes_call = [
+        MODE_DATA,
+        MODE_CLUSTER,
+        MODE_TILES,
+        MODE_STATS
+    ]
+
+    # Request param to add joined layers fields in data mode
+    vectorjoins_param = 'joins'
+
     pagination_class = G3WAPIPaginator
 
+    # JSON plus compact binary formats, by Accept header or 'format' param
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + [FlatGeobufRenderer, GeoArrowRenderer]
+
+    # paginator for cursor mode
+    keyset_pagination_class = G3WAPIKeysetPaginator
+
+    # Strategy to count features: exact, estimate or cached
+    count_strategy = COUNT_EXACT
+
+    # False if features are filtered not only by bbox, planner estimate is not used
+    count_estimable = True
+
+    # Default decimal digits of output coordinates, None for full precision
+    geometry_precision = None
+
     @property
     def paginator(self):
         """
@@ -199,6 +422,47 @@ class BaseVectorOnModelApiView(G3WAPIView):
         assert self.paginator is not None
         return self.paginator.get_paginated_response(data)
 
+    def get_features_count(self, queryset, estimable=None):
+        """
+        Count queryset features by count strategy, set count_approximate status
+        :param queryset: features queryset
+        :param estimable: if planner estimate can be used, default self.count_estimable
+        :return: integer
+        """
+        if estimable is None:
+            estimable = self.count_estimable
+
+        # i.e. queryset.none() of indexed search without usable columns
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        count_key = (sql, repr(params), estimable)
+        if count_key in self._features_counts:
+            return self._features_counts[count_key]
+
+        count = None
+        approximate = False
+        if self.count_strategy == COUNT_ESTIMATE and estimable:
+            count = estimate_queryset_count(queryset)
+            approximate = count is not None
+        elif self.count_strategy == COUNT_CACHED:
+            cache_key = 'vector_count_{}'.format(hashlib.md5(u'{}{}{}'.format(
+                getattr(self, 'layer_name', ''), sql, repr(params)).encode('utf-8')).hexdigest())
+            count = cache.get(cache_key)
+            if count is None:
+                count = queryset.count()
+                cache.set(cache_key, count, settings.VECTOR_COUNT_CACHE_TIMEOUT)
+            else:
+                approximate = True
+
+        if count is None:
+            count = queryset.count()
+
+        self.count_approximate = self.count_approximate or approximate
+        self._features_counts[count_key] = count
+        return count
+
     def get_forms(self):
         """
         Method to implement in child class to get form structure if exists
@@ -279,6 +543,31 @@ class BaseVectorOnModelApiView(G3WAPIView):
         :param kwargs:
         """
 
+    @property
+    def metadata_relations(self):
+        """
+        Relations metadata dict, built lazily only by code paths using it
+        """
+        if getattr(self, '_metadata_relations', None) is None:
+            self._metadata_relations = dict()
+            self.set_metadata_relations(self.request, **self.kwargs)
+        return self._metadata_relations
+
+    @metadata_relations.setter
+    def metadata_relations(self, value):
+        self._metadata_relations = value
+
+    def get_reprojecting_srids(self, to_layer=False):
+        """
+        Return srids couple for reprojection
+        :param to_layer: Reprojecting versus
+        :return: tuple (from srid, to srid)
+        """
+        if to_layer:
+            return self.layer.project.group.srid.auth_srid, self.layer.srid
+        else:
+            return self.layer.srid, self.layer.project.group.srid.auth_srid
+
     def reproject_feature(self, feature, to_layer=False):
         """
         Reproject single geomtry feature
@@ -287,25 +576,30 @@ class BaseVectorOnModelApiView(G3WAPIView):
         :return:
         """
 
-        if to_layer:
-            from_srid = self.layer.project.group.srid.auth_srid
-            to_srid = self.layer.srid
-        else:
-            from_srid = self.layer.srid
-            to_srid = self.layer.project.group.srid.auth_srid
-
-        geometry = GEOSGeometry(json.dumps(feature['geometry']), srid=int(from_srid))
-        geometry.transform(to_srid)
-        feature['geometry'] = json.loads(geometry.json)
+        from_srid, to_srid = self.get_reprojecting_srids(to_layer)
+        transform_geometries([feature['geometry']], from_srid, to_srid)
 
     def reproject_featurecollection(self, featurecollection, to_layer=False):
         """
-        Reproject features
+        Reproject features, all coordinates are transformed with one call
         :param featurecollection:
         :return:
         """
-        for feature in featurecollection['features']:
-            self.reproject_feature(feature, to_layer)
+        from_srid, to_srid = self.get_reprojecting_srids(to_layer)
+        transform_featurecollection(featurecollection, from_srid, to_srid)
+
+    def perform_content_negotiation(self, request, force=False):
+        """
+        Binary formats renderers are available only in data mode
+        """
+        renderer, media_type = super(BaseVectorOnModelApiView, self).perform_content_negotiation(request, force=force)
+        if renderer.format in VECTOR_FORMAT_RESPONDERS and self.kwargs.get('mode_call') != MODE_DATA:
+            if force:
+                renderer = self.get_renderers()[0]
+                return renderer, renderer.media_type
+            raise exceptions.NotAcceptable(_('Output format {} is available only in data mode').format(
+                renderer.format))
+        return renderer, media_type
 
     def initial(self, request, *args, **kwargs):
         super(BaseVectorOnModelApiView, self).initial(request, *args, **kwargs)
@@ -314,10 +608,34 @@ class BaseVectorOnModelApiView(G3WAPIView):
 
         self.set_mode_call(request, **kwargs)
 
+        self.count_approximate = False
+        self._features_counts = dict()
+        self.binary_response = None
+
         self.set_metadata_layer(request, **kwargs)
 
-        self.metadata_relations = dict()
-        self.set_metadata_relations(request, **kwargs)
+        # other modes read from primary db, i.e. editing reads
+        if self.database_to_use and self.mode_call not in self.replica_modes_call:
+            pin_primary(self.database_to_use)
+
+        # relations metadata are built on first access
+        self._metadata_relations = None
+
+    def get_config_cache_key(self):
+        """
+        Method to implement in child class to get cache key of layer structure of config mode,
+        None for no caching
+        :return: string or None
+        """
+        return None
+
+    def get_cached_config(self):
+        """
+        Get cached layer structure of config mode, called by set_metadata_layer before geomodel creation
+        :return: dict or None
+        """
+        cache_key = self.get_config_cache_key()
+        return cache.get(cache_key) if cache_key else None
 
     def response_config_mode(self, request):
         """
@@ -327,33 +645,43 @@ class BaseVectorOnModelApiView(G3WAPIView):
         :return: Vector params
         """
 
-        forms = self.get_forms()
+        # layer structure is cached, signals receivers run on every request
+        vector_params = self.cached_config
 
-        # add forms data if exist
-        kwargs = {'fields': forms[self.layer_name]['fields']} if forms and forms.get(self.layer_name) else {}
+        if vector_params is None:
+            forms = self.get_forms()
 
-        if hasattr(self.metadata_layer, 'fields_to_exlude'):
-            kwargs['exlude'] = self.metadata_layer.fields_to_exlude
-        if hasattr(self.metadata_layer, 'order'):
-            kwargs['order'] = self.metadata_layer.order
+            # add forms data if exist
+            kwargs = {'fields': forms[self.layer_name]['fields']} if forms and forms.get(self.layer_name) else {}
 
-        if self.mapping_layer_attributes_function.im_func == mapLayerAttributesFromModel:
-            fields = self.mapping_layer_attributes_function.im_func(
-                self.metadata_layer.model,
-                **kwargs
-            ).values()
-        else:
-            fields = self.mapping_layer_attributes_function.im_func(
-                self.layer,
-                formField=True,
-                **kwargs
-            ).values()
+            if hasattr(self.metadata_layer, 'fields_to_exlude'):
+                kwargs['exlude'] = self.metadata_layer.fields_to_exlude
+            if hasattr(self.metadata_layer, 'order'):
+                kwargs['order'] = self.metadata_layer.order
 
-        vector_params = {
-            'geomentryType': self.metadata_layer.geometry_type,
-            'fields': fields,
-            'pkField': self.metadata_layer.model._meta.pk.name
-        }
+            if self.mapping_layer_attributes_function.im_func == mapLayerAttributesFromModel:
+                fields = self.mapping_layer_attributes_function.im_func(
+                    self.metadata_layer.model,
+                    **kwargs
+                ).values()
+            else:
+                fields = self.mapping_layer_attributes_function.im_func(
+                    self.layer,
+                    formField=True,
+                    **kwargs
+                ).values()
+
+            vector_params = {
+                'geomentryType': self.metadata_layer.geometry_type,
+                'fields': list(fields),
+                'pkField': self.metadata_layer.model._meta.pk.name
+            }
+
+            cache_key = self.get_config_cache_key()
+            if cache_key:
+                cache.set(cache_key, vector_params, settings.VECTOR_CONFIG_CACHE_TIMEOUT)
+
+        vector_params = dict(vector_params)
 
         # post_create_maplayerattributes signal
         extra_fields = post_create_maplayerattributes.send(self, layer=self.layer)
@@ -382,12 +710,66 @@ class BaseVectorOnModelApiView(G3WAPIView):
             for backend in list(self.filter_backends):
                 self.features_layer = backend().filter_queryset(self.request, self.features_layer, self)
 
+        # simplify geometries in SQL by client resolution
+        self.set_simplify_tolerance(request)
+        if self.simplify_tolerance:
+            self.features_layer = self.features_layer.annotate(**{
+                SIMPLIFIED_GEOMETRY_FIELD: SimplifyPreserveTopology(self.bbox_filter_field, self.simplify_tolerance)
+            })
+
+        # select only fields to send, simplified geometry replaces full geometry
+        self.set_fields_projection(request)
+        if self.fields_projection:
+            self.features_layer = self.features_layer.only(*[
+                f for f in self.fields_projection if not (self.simplify_tolerance and f == self.bbox_filter_field)])
+        elif self.simplify_tolerance:
+            self.features_layer = self.features_layer.defer(self.bbox_filter_field)
+
+        # compact binary formats: all filtered features are streamed, without pagination
+        output_format = getattr(getattr(request, 'accepted_renderer', None), 'format', None)
+        if output_format in VECTOR_FORMAT_RESPONDERS:
+            self.binary_response = self.get_binary_response(output_format)
+            return
+
+        # joined layers fields inlined in features properties, by 'joins' param
+        joins_materializer = None
+        request_data = request.data if request.method == 'POST' else request.query_params
+        if request_data.get(self.vectorjoins_param) in ('1', 'true', 'True'):
+            joins = self.get_vectorjoins()
+            if joins:
+                joins_materializer = VectorJoinsMaterializer(joins, self.features_layer.db)
+                self.features_layer = joins_materializer.annotate(self.features_layer)
+                if self.fields_projection:
+                    self.features_layer = self.features_layer.only(*[
+                        f for f in set(self.fields_projection + [j.target_field for j in joins])
+                        if not (self.simplify_tolerance and f == self.bbox_filter_field)])
+
+        count = None
+        cursors = {}
         if 'page' in request.query_params:
             self.features_layer = self.paginate_queryset(self.features_layer)
+            count = self._paginator.page.paginator.count
+        elif self.keyset_pagination_class and \
+                self.keyset_pagination_class.cursor_query_param in request.query_params:
+            keyset_paginator = self.keyset_pagination_class()
+            self.features_layer = keyset_paginator.paginate_queryset(self.features_layer, request, view=self)
+            count = keyset_paginator.count
+            cursors = {
+                'next': keyset_paginator.next,
+                'previous': keyset_paginator.previous
+            }
+
+        if joins_materializer:
+            self.features_layer = list(self.features_layer)
 
         # instance of geoserializer
-        layer_serializer = self.metadata_layer.serializer(self.features_layer, many=True,
-                                                                **self.get_geoserializer_kwargs())
+        serializer_kwargs = self.get_geoserializer_kwargs()
+        if self.simplify_tolerance:
+            serializer_kwargs['geo_field_source'] = SIMPLIFIED_GEOMETRY_FIELD
+        if self.fields_projection:
+            serializer_kwargs.pop('exclude', None)
+            serializer_kwargs['fields'] = self.fields_projection
+        layer_serializer = self.metadata_layer.serializer(self.features_layer, many=True, **serializer_kwargs)
 
         # add extra fields data by signals and receivers
         featurecollection = post_serialize_maplayer.send(layer_serializer, layer=self.layer_name)
@@ -396,16 +778,374 @@ class BaseVectorOnModelApiView(G3WAPIView):
         else:
             featurecollection = layer_serializer.data
 
+        if joins_materializer:
+            features = featurecollection['features'] if isinstance(featurecollection, dict) else featurecollection
+            joins_materializer.add_properties(self.features_layer,
+                                              [f['properties'] if 'properties' in f else f for f in features])
+
         # reproject if necessary
         if self.reproject:
             self.reproject_featurecollection(featurecollection)
 
-        self.results.update(APIVectorLayerStructure(**{
+        # reduce coordinates precision or quantize
+        precision, geometry_encoding = self.get_geometry_encoding(request)
+        if geometry_encoding == GEOMETRY_ENCODING_QUANTIZED:
+            quantize_featurecollection(featurecollection, precision, settings.VECTOR_QUANTIZATION)
+        elif precision is not None:
+            round_featurecollection(featurecollection, precision)
+
+        vector_params = {
             'data': featurecollection,
-            'count': self._paginator.page.paginator.count if 'page' in request.query_params else None,
+            'count': count,
+            'countApproximate': self.count_approximate if count is not None else None,
+            'simplifyTolerance': self.simplify_tolerance,
+            'precision': precision,
+            'geometryEncoding': geometry_encoding,
             'geomentryType': self.metadata_layer.geometry_type,
             'pkField': self.metadata_layer.model._meta.pk.name
-        }).as_dict())
+        }
+        vector_params.update(cursors)
+
+        self.results.update(APIVectorLayerStructure(**vector_params).as_dict())
+
+    def response_cluster_mode(self, request):
+        """
+        Cluster features in grid cells computed in db, for bbox and client resolution:
+        features count, centroids mean and optional attribute aggregates ('aggregates' param,
+        i.e. sum:population,max:height) for every cell.
+        With 'density' param a features count grid for heatmaps is returned too.
+        :param request: DjangoREST API request object
+        """
+        self.set_filters()
+        if not self.bbox_filter:
+            raise ParseError(_('Layer has no geometry'))
+
+        request_data = request.data if request.method == 'POST' else request.query_params
+        bbox = self.bbox_filter.get_filter_bbox(request)
+        resolution = self.get_request_resolution(request)
+        if not bbox or not resolution:
+            raise ParseError(_('bbox and resolution or scale params are required'))
+
+        try:
+            size = resolution * float(request_data.get('cluster_size', settings.VECTOR_CLUSTER_PIXEL_SIZE))
+        except ValueError:
+            raise ParseError(_('Invalid cluster_size param'))
+        if size <= 0:
+            raise ParseError(_('Invalid cluster_size param'))
+
+        density = request_data.get('density') in ('1', 'true', 'True')
+        if density and (bbox.extent[2] - bbox.extent[0]) * (bbox.extent[3] - bbox.extent[1]) / size ** 2 > \
+                settings.VECTOR_DENSITY_MAX_CELLS:
+            raise ParseError(_('Too many density grid cells, increase cluster_size'))
+
+        # only bbox and expression filters: ordering and datatables search/paging don't apply to clusters
+        self.features_layer = self.bbox_filter.filter_queryset(request, self.metadata_layer.get_queryset(), self)
+        if ExpressionFilterBackend in getattr(self, 'filter_backends', ()):
+            self.features_layer = ExpressionFilterBackend().filter_queryset(self.request, self.features_layer, self)
+
+        clusters = grid_clusters(
+            self.features_layer,
+            self.bbox_filter_field,
+            size,
+            srid=self.layer.project.group.srid.auth_srid if self.reproject else None,
+            aggregates=self.get_cluster_aggregates(request_data)
+        )
+
+        vector = APIVectorLayerStructure(**{
+            'data': clusters_featurecollection(clusters),
+            'count': sum(c['count'] for c in clusters),
+            'geomentryType': 'Point',
+            'pkField': self.metadata_layer.model._meta.pk.name
+        }).as_dict()
+
+        vector['vector']['cluster_size'] = size
+        if density:
+            vector['vector']['density'] = density_grid(clusters, bbox.extent, size)
+
+        self.results.update(vector)
+
+    def get_cluster_aggregates(self, request_data):
+        """
+        Parse 'aggregates' param: comma separated <function>:<numeric field>
+        :return: list of (function, field name) tuples
+        """
+        fields = {f.name: f for f in self.metadata_layer.model._meta.concrete_fields
+                  if isinstance(f, NUMERIC_FIELDS) and f.name not in self.get_excluded_fields()}
+
+        aggregates = []
+        for aggregate in [a for a in request_data.get('aggregates', '').split(',') if a]:
+            function, _sep, field = aggregate.partition(':')
+            if function not in AGGREGATES or field not in fields:
+                raise ParseError(_('Invalid aggregate: {}').format(aggregate))
+            aggregates.append((function, field))
+        return aggregates
+
+    def get_vectorjoins(self):
+        """
+        Method to implement in child class to get layer vector joins
+        :return: list of core.api.base.joins.VectorJoin instances
+        """
+        return []
+
+    def get_stats_cache_key(self):
+        """
+        Method to implement in child class to get cache key of layer statistics,
+        None for no caching
+        :return: string or None
+        """
+        return None
+
+    def response_stats_mode(self, request):
+        """
+        Layer statistics: features count, extent (layer srid) and for every not excluded column
+        min, max, distinct values count and histogram of numeric columns.
+        Db planner statistics are used where available, see core.utils.stats
+        :param request: DjangoREST API request object
+        """
+        self.set_geo_filter()
+
+        cache_key = self.get_stats_cache_key()
+        stats = cache.get(cache_key) if cache_key else None
+
+        if stats is None:
+            stats = layer_statistics(
+                self.metadata_layer.get_queryset(),
+                geometry_field=self.bbox_filter_field if self.bbox_filter else None,
+                excluded_fields=self.get_excluded_fields()
+            )
+            if cache_key:
+                cache.set(cache_key, stats, None)
+
+        stats['srid'] = self.layer.srid
+        self.results.update({'stats': stats})
+
+    def get_tile_cache_name(self):
+        """
+        Method to implement in child class to get name of layer vector tiles in TileStache cache,
+        None for no caching
+        :return: string or None
+        """
+        return None
+
+    def response_tiles_mode(self, request):
+        """
+        Mapbox Vector Tile of layer features for XYZ EPSG:3857 tile z/x/y of url.
+        Features are not filtered by request params, so tiles are cacheable for every client.
+        :param request: DjangoREST API request object
+        """
+        self.set_geo_filter()
+        if not self.bbox_filter:
+            raise ParseError(_('Layer has no geometry'))
+
+        z, x, y = int(self.kwargs['z']), int(self.kwargs['x']), int(self.kwargs['y'])
+        if z > MVT_MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+            raise NotFound(_('Tile out of tiles grid'))
+
+        cache_name = self.get_tile_cache_name()
+        cache_layer = TileCacheLayer(cache_name, settings.VECTOR_TILES_CACHE_TIMEOUT) if cache_name else None
+        tile = read_cached_tile(cache_layer, z, x, y) if cache_layer else None
+
+        if tile is None:
+            bounds = mercator_tile_bounds(z, x, y)
+
+            # features intersecting tile plus buffer, in layer srid
+            bbox = Polygon.from_bbox(tile_buffer_bounds(bounds))
+            bbox.srid = 3857
+            if self.layer.srid != 3857:
+                bbox.transform(self.layer.srid)
+            queryset = spatial_index_bbox_queryset(self.metadata_layer.get_queryset(), self.bbox_filter_field, bbox)
+            queryset = queryset.filter(**{
+                '{}__intersects'.format(self.bbox_filter_field): bbox
+            })
+
+            excluded = self.get_excluded_fields()
+            field_names = [f.name for f in self.metadata_layer.model._meta.concrete_fields
+                           if not isinstance(f, GeometryField) and (f.primary_key or f.name not in excluded)]
+
+            try:
+                tile = vector_tile(queryset, self.bbox_filter_field, field_names, self.layer_name, bounds)
+            except NotImplementedError as e:
+                raise APIException(e.args[0])
+
+            if cache_layer:
+                save_cached_tile(tile, cache_layer, z, x, y)
+
+        self.binary_response = HttpResponse(tile, content_type=MVT_CONTENT_TYPE)
+        self.binary_response['Cache-Control'] = 'public, max-age={}'.format(settings.VECTOR_TILES_CACHE_TIMEOUT)
+
+    def get_binary_response(self, output_format):
+        """
+        Build streaming response of features queryset in a compact binary format,
+        geometries are reprojected in SQL if necessary
+        :param output_format: format key, 'fgb' or 'arrow'
+        :return: StreamingHttpResponse
+        """
+        responder_class = VECTOR_FORMAT_RESPONDERS[output_format]
+        if not responder_class.is_available():
+            raise APIException(_('Output format {} is not available').format(output_format))
+
+        model = self.metadata_layer.model
+        if self.fields_projection:
+            names = self.fields_projection
+        else:
+            excluded = self.get_excluded_fields()
+            names = [f.name for f in model._meta.concrete_fields if f.primary_key or f.name not in excluded]
+        fields = [model._meta.get_field(n) for n in names]
+        fields = [f for f in fields if not isinstance(f, GeometryField)]
+
+        geometry_attr = None
+        srid = self.layer.srid
+        if self.bbox_filter:
+            geometry_attr = SIMPLIFIED_GEOMETRY_FIELD if self.simplify_tolerance else self.bbox_filter_field
+            if self.reproject:
+                srid = self.layer.project.group.srid.auth_srid
+                self.features_layer = self.features_layer.annotate(**{
+                    OUTPUT_GEOMETRY_FIELD: Transform(F(geometry_attr), srid)
+                })
+                geometry_attr = OUTPUT_GEOMETRY_FIELD
+
+        return responder_class(self.features_layer, fields, geometry_attr, srid,
+                               file_name=getattr(self, 'layer_name', None) or 'layer')()
+
+    def response_batch_mode(self, request):
+        """
+        Write features inserts, updates and deletes of one payload in one transaction,
+        errors are reported for every feature and nothing is written if any.
+        Only POST by users with change permission on layer.
+        :param request: DjangoREST API request object
+        """
+        if request.method != 'POST':
+            raise exceptions.MethodNotAllowed(request.method)
+
+        if not request.user.has_perm('{}.change_layer'.format(self.layer._meta.app_label), self.layer):
+            raise PermissionDenied()
+
+        if not isinstance(request.data, dict):
+            raise ParseError(_('Batch payload must be a JSON object'))
+
+        self.set_geo_filter()
+        writer = FeaturesBatchWriter(
+            self.metadata_layer.model,
+            self.database_to_use,
+            geometry_field=self.bbox_filter_field if self.bbox_filter else None,
+            srid=self.layer.project.group.srid.auth_srid if self.reproject else self.layer.srid,
+            layer_srid=self.layer.srid,
+            lock=self.metadata_layer.lock
+        )
+        results = writer.write(request.data)
+
+        if results is None:
+            self.results.update({'result': False, 'errors': writer.errors})
+            return
+
+        post_save_maplayer.send(self, layer=self.layer_name, mode=MODE_BATCH, data=results, user=request.user)
+        self.results.update({'response': results})
+
+    def get_excluded_fields(self):
+        """
+        Method to implement in child class to get model fields names not to send to client
+        :return: list
+        """
+        return []
+
+    def set_fields_projection(self, request):
+        """
+        Set model fields names to select from db, from 'fields' request param (comma separated)
+        and excluded fields. Primary key and geometry fields are always selected.
+        """
+        self.fields_projection = None
+
+        request_data = request.data if request.method == 'POST' else request.query_params
+        model = self.metadata_layer.model
+        pk_name = model._meta.pk.name
+        geometry_field = self.bbox_filter_field if self.bbox_filter else None
+        model_fields = [f.name for f in model._meta.concrete_fields]
+
+        excluded = set(self.get_excluded_fields()) - {pk_name, geometry_field}
+        requested = [f.strip() for f in request_data.get('fields', '').split(',') if f.strip()]
+        if requested:
+            unknown = set(requested) - set(model_fields)
+            if unknown:
+                raise ParseError(_('Fields not in layer: {}').format(', '.join(unknown)))
+        elif not excluded:
+            return
+
+        self.fields_projection = [f for f in model_fields if f not in excluded and
+                                  (not requested or f in requested or f in (pk_name, geometry_field))]
+
+    def get_geometry_encoding(self, request):
+        """
+        Get output coordinates precision, from 'precision' request param or layer default,
+        and geometry encoding from 'encoding' request param
+        :return: tuple (precision or None, encoding or None)
+        """
+        request_data = request.data if request.method == 'POST' else request.query_params
+
+        precision = self.geometry_precision
+        if request_data.get('precision') not in (None, ''):
+            try:
+                precision = int(request_data['precision'])
+            except ValueError:
+                raise ParseError(_('Invalid precision param'))
+            if not 0 <= precision <= MAX_GEOMETRY_PRECISION:
+                raise ParseError(_('Precision param must be between 0 and {}').format(MAX_GEOMETRY_PRECISION))
+
+        geometry_encoding = request_data.get('encoding') or None
+        if geometry_encoding not in (None, GEOMETRY_ENCODING_QUANTIZED):
+            raise ParseError(_('Invalid encoding param'))
+
+        return precision, geometry_encoding
+
+    def get_request_resolution(self, request):
+        """
+        Get client map resolution, in map units per pixel, from 'resolution'
+        or 'scale' (and optional 'dpi') request params
+        :return: float or None
+        """
+        request_data = request.data if request.method == 'POST' else request.query_params
+        map_srid = self.layer.project.group.srid.auth_srid
+
+        try:
+            if request_data.get('resolution'):
+                resolution = float(request_data['resolution'])
+            elif request_data.get('scale'):
+                dpi = float(request_data.get('dpi', settings.VECTOR_SIMPLIFY_DPI))
+                resolution = float(request_data['scale']) * INCH_METERS / dpi
+                if is_geographic(map_srid):
+                    resolution /= DEGREE_METERS
+            else:
+                return None
+        except ValueError:
+            raise ParseError(_('Invalid resolution, scale or dpi param'))
+
+        return resolution if resolution > 0 else None
+
+    def set_simplify_tolerance(self, request):
+        """
+        Set geometry simplification tolerance, in layer srid units, from 'resolution' (map units per pixel)
+        or 'scale' (and optional 'dpi') request params
+        """
+        self.simplify_tolerance = None
+
+        # no simplification for points or layers without geometry
+        if not self.bbox_filter or 'point' in str(self.metadata_layer.geometry_type).lower():
+            return
+
+        map_srid = self.layer.project.group.srid.auth_srid
+        resolution = self.get_request_resolution(request)
+        if not resolution:
+            return
+
+        tolerance = resolution * settings.VECTOR_SIMPLIFY_PIXEL_TOLERANCE
+
+        # from map units to layer units, measured at bbox center if available
+        if self.reproject:
+            bbox = self.bbox_filter.get_filter_bbox(request)
+            center = bbox.centroid if bbox else None
+            tolerance = transform_length(tolerance, map_srid, self.layer.srid,
+                                         center.x if center else None, center.y if center else None)
+
+        self.simplify_tolerance = tolerance
 
     def set_reprojecting_status(self):
         """
@@ -440,6 +1180,9 @@ class BaseVectorOnModelApiView(G3WAPIView):
         # get results
         self.get_response_data(request)
 
+        # streamed binary formats
+        if self.binary_response is not None:
+            return self.binary_response
 
         # response a APIVectorLayer
         return Response(self.results.results)
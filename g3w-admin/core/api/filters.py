@@ -3,6 +3,9 @@ from rest_framework_gis.filters import InBBoxFilter
 from rest_framework.exceptions import ParseError
 from rest_framework.filters import BaseFilterBackend
 from django.db.models import Q
+from core.utils.search import indexed_search_queryset
+from core.geo.spatialindex import spatial_index_bbox_queryset
+from core.utils.expressions import compile_filter_expression, FilterExpressionError
 
 
 class InsideBBoxFilter(InBBoxFilter):
@@ -58,6 +61,9 @@ class IntersectsBBoxFilter(InsideBBoxFilter):
 
         if not bbox:
             return queryset
+
+        # Spatialite: candidates from R*Tree spatial index, exact predicate only on them
+        queryset = spatial_index_bbox_queryset(queryset, filter_field, bbox)
         return queryset.filter(Q(**{'%s__%s' % (filter_field, geoDjango_filter): bbox}))
 
 
@@ -73,6 +79,37 @@ class CentroidBBoxFilter(IntersectsBBoxFilter):
         return polygon.centroid.buffer(self.tolerance)
 
 
+class ExpressionFilterBackend(BaseFilterBackend):
+    """
+    Filter features by 'filter' param expression, see core.utils.expressions for syntax.
+    Geometries in expression without srid are in project map srid.
+    """
+    expression_param = 'filter'
+
+    def filter_queryset(self, request, queryset, view):
+        request_data = request.data if request.method == 'POST' else request.query_params
+        expression = request_data.get(self.expression_param, None)
+        if not expression:
+            return queryset
+
+        get_excluded_fields = getattr(view, 'get_excluded_fields', None)
+        layer = getattr(view, 'layer', None)
+        try:
+            q = compile_filter_expression(
+                expression,
+                queryset.model,
+                excluded_fields=get_excluded_fields() if get_excluded_fields else None,
+                srid=layer.project.group.srid.auth_srid if layer else None,
+                layer_srid=layer.srid if layer else None
+            )
+        except FilterExpressionError as e:
+            raise ParseError(e.args[0])
+
+        # features are filtered not only by bbox, planner estimate is not reliable
+        setattr(view, 'count_estimable', False)
+        return queryset.filter(q)
+
+
 class DatatablesFilterBackend(BaseFilterBackend):
     """
     Filter that works with datatables params.
@@ -80,7 +117,9 @@ class DatatablesFilterBackend(BaseFilterBackend):
     """
     def filter_queryset(self, request, queryset, view):
 
-        total_count = queryset.count()
+        # count by view count strategy if available
+        get_count = getattr(view, 'get_features_count', None)
+        total_count = get_count(queryset) if get_count else queryset.count()
         # set the queryset count as an attribute of the view for later
         # TODO: find a better way than this hack
         setattr(view, '_datatables_total_count', total_count)
@@ -88,11 +127,19 @@ class DatatablesFilterBackend(BaseFilterBackend):
         # parse query params
         getter = request.query_params.get
         fields = view.metadata_layer.model._meta.fields
-        exlude_fields = eval(view.layer.exclude_attribute_wms) if view.layer.exclude_attribute_wms else []
+        exlude_fields = view.get_excluded_fields() if hasattr(view, 'get_excluded_fields') else []
         search_value = getter('search')
 
         # filter queryset
-        if search_value:
+        search_columns = getattr(view, 'search_columns', None)
+        if search_value and search_columns:
+
+            # indexed search only on searchable columns
+            queryset = indexed_search_queryset(queryset, [c for c in search_columns if c not in exlude_fields],
+                                               search_value)
+            setattr(view, 'count_estimable', False)
+            filtered_count = get_count(queryset) if get_count else queryset.count()
+        elif search_value:
             q = Q()
             for f in fields:
                 if f.column not in exlude_fields:
@@ -100,7 +147,10 @@ class DatatablesFilterBackend(BaseFilterBackend):
 
             if q != Q():
                 queryset = queryset.filter(q).distinct()
-                filtered_count = queryset.count()
+
+                # features are filtered not only by bbox, planner estimate is not reliable
+                setattr(view, 'count_estimable', False)
+                filtered_count = get_count(queryset) if get_count else queryset.count()
             else:
                 filtered_count = total_count
         else:
@@ -0,0 +1,20 @@
+from rest_framework.renderers import JSONRenderer
+from core.geo.formats import FORMAT_FLATGEOBUF, FORMAT_ARROW
+
+
+class FlatGeobufRenderer(JSONRenderer):
+    """
+    Renderer to negotiate FlatGeobuf output of vector API,
+    features are streamed by view, errors are rendered as JSON
+    """
+    media_type = 'application/flatgeobuf'
+    format = FORMAT_FLATGEOBUF
+
+
+class GeoArrowRenderer(JSONRenderer):
+    """
+    Renderer to negotiate Arrow IPC stream (GeoArrow WKB geometries) output of vector API,
+    features are streamed by view, errors are rendered as JSON
+    """
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = FORMAT_ARROW
@@ -11,6 +11,8 @@ from shapely import wkt, geometry
 from core.models import Group
 from core.signals import initconfig_plugin_start
 from core.mixins.api.serializers import G3WRequestSerializer
+from core.utils.data import load_text_data
+from core.utils.db import get_write_alias, serialized_write
 from copy import copy
 
 
@@ -43,7 +45,7 @@ class BaseLayerSerializer(serializers.ModelSerializer):
     """
     def to_representation(self, instance):
         ret = super(BaseLayerSerializer, self).to_representation(instance)
-        ret.update(eval(instance.property))
+        ret.update(load_text_data(instance.property))
         return ret
 
     class Meta:
@@ -200,19 +202,33 @@ class G3WSerializerMixin(object):
             self.Meta.exclude = kwargs['exclude']
             del (kwargs['exclude'])
 
+        # only these fields, model instances may have other fields deferred
+        if 'fields' in kwargs:
+            self.Meta.fields = list(kwargs['fields'])
+            self.Meta.exclude = []
+            del (kwargs['fields'])
+
+        # model attribute (i.e. an annotation) to read geometry from
+        if 'geo_field_source' in kwargs:
+            self.Meta.geo_field_source = kwargs['geo_field_source']
+            del (kwargs['geo_field_source'])
+
     def _get_meta_using(self):
         return self.Meta.using if hasattr(self.Meta, 'using') else None
 
     def create(self, validated_data):
         instance = self.Meta.model(**validated_data)
-        instance.save(using=self._get_meta_using())
+        using = get_write_alias(self._get_meta_using())
+        with serialized_write(using):
+            instance.save(using=using)
         return instance
 
     def update(self, instance, validated_data):
-        using = self.Meta.using if hasattr(self.Meta, 'using') else None
         for field, value in validated_data.items():
             setattr(instance, field, value)
-        instance.save(using=self._get_meta_using())
+        using = get_write_alias(self._get_meta_using() or instance._state.db)
+        with serialized_write(using):
+            instance.save(using=using)
         return instance
 
     @classmethod
@@ -220,4 +236,6 @@ class G3WSerializerMixin(object):
         """
         Classmethod to delete model instance
         """
-        instance.delete()
\ No newline at end of file
+        using = get_write_alias(instance._state.db)
+        with serialized_write(using):
+            instance.delete(using=using)
\ No newline at end of file
@@ -5,10 +5,14 @@ from .views import GroupSetOrderView
 
 
 urlpatterns = [
-    url(r'^vector/api/(?P<mode_call>data|config)/(?P<project_type>[-_\w\d]+)/(?P<project_id>[0-9]+)/'
+    url(r'^vector/api/(?P<mode_call>data|config|batch|cluster|stats)/(?P<project_type>[-_\w\d]+)/(?P<project_id>[0-9]+)/'
         r'(?P<layer_name>[-_\w\d]+)/$',
         layer_vector_view, name='core-vector-api'),
 
+    url(r'^vector/api/(?P<mode_call>tiles)/(?P<project_type>[-_\w\d]+)/(?P<project_id>[0-9]+)/'
+        r'(?P<layer_name>[-_\w\d]+)/(?P<z>[0-9]+)/(?P<x>[0-9]+)/(?P<y>[0-9]+)\.mvt$',
+        layer_vector_view, name='core-vector-tiles-api'),
+
     url(r'^vector/api/(?P<mode_call>widget)/(?P<widget_type>[-_\w\d]+)/data/'
         r'(?P<project_type>[-_\w\d]+)/(?P<project_id>[0-9]+)/'
         r'(?P<layer_name>[-_\w\d]+)/$',
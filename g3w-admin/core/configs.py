@@ -6,6 +6,11 @@ MSTYPES_OGC = 'OGC'
 MSTYPES_MAPSERVER = 'Mapserver'
 MSTYPES_GEOSERVER = 'Geoserver'
 
+# vector layer features count strategies
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+COUNT_CACHED = 'cached'
+
 WIDGET_TYPES = {
     'search': {
         'name': _('Search'),
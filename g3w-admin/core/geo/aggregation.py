@@ -0,0 +1,170 @@
+"""
+Grid aggregation of vector layer features for clustering and density maps.
+Features are binned by centroid in square cells of a grid with origin in (0, 0):
+cell indexes are floor(x / size), floor(y / size).
+"""
+from django.db import connections
+from django.db.models import F, Value, FloatField, Count, Avg, Sum, Min, Max
+from django.contrib.gis.db.models.functions import Centroid, Transform
+from core.geo.functions import X, Y, Floor
+import numpy as np
+import math
+
+AGGREGATES = {
+    'sum': Sum,
+    'avg': Avg,
+    'min': Min,
+    'max': Max
+}
+
+
+def _annotate_centroid(queryset, geometry_field, srid=None):
+    point = Centroid(F(geometry_field))
+    if srid:
+        point = Transform(point, srid)
+    return queryset.filter(**{'{}__isnull'.format(geometry_field): False}).annotate(
+        g3w_x=X(point),
+        g3w_y=Y(point)
+    )
+
+
+def grid_clusters(queryset, geometry_field, size, srid=None, aggregates=None):
+    """
+    Cluster features of queryset in grid cells:
+    Postgis: GROUP BY cell in SQL, other dbs: centroids binned by NumPy
+    :param queryset: features queryset
+    :param geometry_field: name of geometry field
+    :param size: cell size, in srid units
+    :param srid: srid of centroids and grid, default layer srid
+    :param aggregates: list of (function, field name) tuples, function one of AGGREGATES keys
+    :return: list of dicts with keys gx, gy, count, x, y (centroids mean) and <function>_<field> aggregates
+    """
+    aggregates = aggregates or []
+    queryset = _annotate_centroid(queryset.order_by(), geometry_field, srid)
+    size = float(size)
+
+    if connections[queryset.db].vendor == 'postgresql':
+        rows = queryset.annotate(
+            g3w_gx=Floor(F('g3w_x') / Value(size, output_field=FloatField())),
+            g3w_gy=Floor(F('g3w_y') / Value(size, output_field=FloatField()))
+        ).values('g3w_gx', 'g3w_gy').annotate(
+            g3w_count=Count('pk'),
+            g3w_cx=Avg('g3w_x'),
+            g3w_cy=Avg('g3w_y'),
+            **{'{}_{}'.format(function, field): AGGREGATES[function](field) for function, field in aggregates}
+        ).order_by()
+
+        clusters = []
+        for row in rows:
+            cluster = {
+                'gx': int(row.pop('g3w_gx')),
+                'gy': int(row.pop('g3w_gy')),
+                'count': row.pop('g3w_count'),
+                'x': row.pop('g3w_cx'),
+                'y': row.pop('g3w_cy')
+            }
+            cluster.update(row)
+            clusters.append(cluster)
+        return clusters
+
+    fields = [field for function, field in aggregates]
+    rows = list(queryset.values_list('g3w_x', 'g3w_y', *fields))
+    return bin_points(rows, size, aggregates)
+
+
+def bin_points(rows, size, aggregates=None):
+    """
+    Bin points by NumPy in grid cells
+    :param rows: list of tuples (x, y, aggregate field values...)
+    :param size: cell size
+    :param aggregates: list of (function, field name) tuples, in rows values order
+    :return: list of cluster dicts, see grid_clusters
+    """
+    aggregates = aggregates or []
+    rows = [r for r in rows if r[0] is not None and r[1] is not None]
+    if not rows:
+        return []
+
+    n = len(rows)
+    xs = np.fromiter((r[0] for r in rows), dtype=np.float64, count=n)
+    ys = np.fromiter((r[1] for r in rows), dtype=np.float64, count=n)
+    cells = np.stack([np.floor(xs / size), np.floor(ys / size)], axis=1).astype(np.int64)
+    cells, inverse, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+
+    columns = {
+        'x': np.bincount(inverse, weights=xs) / counts,
+        'y': np.bincount(inverse, weights=ys) / counts
+    }
+
+    for i, (function, field) in enumerate(aggregates):
+        values = np.array([np.nan if r[i + 2] is None else float(r[i + 2]) for r in rows], dtype=np.float64)
+        nulls = np.isnan(values)
+        if function in ('sum', 'avg'):
+            column = np.bincount(inverse, weights=np.where(nulls, 0, values), minlength=len(cells))
+            if function == 'avg':
+                not_null_counts = np.bincount(inverse, weights=~nulls, minlength=len(cells))
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    column = np.where(not_null_counts > 0, column / not_null_counts, np.nan)
+        else:
+            column = np.full(len(cells), np.nan)
+            (np.fmin if function == 'min' else np.fmax).at(column, inverse, values)
+        columns['{}_{}'.format(function, field)] = column
+
+    clusters = []
+    for c in range(len(cells)):
+        cluster = {
+            'gx': int(cells[c][0]),
+            'gy': int(cells[c][1]),
+            'count': int(counts[c])
+        }
+        for name, column in columns.items():
+            value = float(column[c])
+            cluster[name] = None if math.isnan(value) else value
+        clusters.append(cluster)
+    return clusters
+
+
+def clusters_featurecollection(clusters):
+    """
+    GeoJSON FeatureCollection of clusters points, placed on features centroids mean
+    """
+    features = []
+    for cluster in clusters:
+        properties = dict(cluster)
+        x, y = properties.pop('x'), properties.pop('y')
+        properties['cell'] = [properties.pop('gx'), properties.pop('gy')]
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [x, y]},
+            'properties': properties
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def density_grid(clusters, extent, size):
+    """
+    Features count grid for heatmaps, covering extent
+    :param clusters: list of cluster dicts
+    :param extent: (xmin, ymin, xmax, ymax)
+    :param size: cell size
+    :return: dict with origin (top left corner), cell size, width, height and
+             counts values in rows from top to bottom
+    """
+    gx0, gy0 = int(math.floor(extent[0] / size)), int(math.floor(extent[1] / size))
+    gx1, gy1 = int(math.floor(extent[2] / size)), int(math.floor(extent[3] / size))
+    width, height = gx1 - gx0 + 1, gy1 - gy0 + 1
+
+    grid = np.zeros((height, width), dtype=np.int64)
+    for cluster in clusters:
+        column, row = cluster['gx'] - gx0, gy1 - cluster['gy']
+        if 0 <= column < width and 0 <= row < height:
+            grid[row, column] += cluster['count']
+
+    return {
+        'origin': [gx0 * size, (gy1 + 1) * size],
+        'cell_size': size,
+        'width': width,
+        'height': height,
+        'max': int(grid.max()) if grid.size else 0,
+        'values': grid.ravel().tolist()
+    }
@@ -0,0 +1,269 @@
+"""
+Compact binary vector formats built streaming model instances from db:
+FlatGeobuf (with packed Hilbert R-Tree spatial index) and Arrow IPC stream with GeoArrow WKB geometry column.
+"""
+from django.http import StreamingHttpResponse
+from django.db.models.fields import BooleanField, NullBooleanField, IntegerField, BigIntegerField, \
+    SmallIntegerField, AutoField, FloatField, DecimalField, DateField, DateTimeField, BinaryField
+from django.utils.encoding import smart_str
+from decimal import Decimal
+import json
+import os
+import tempfile
+
+try:
+    from osgeo import ogr, osr
+except ImportError:
+    ogr = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# formats keys
+FORMAT_FLATGEOBUF = 'fgb'
+FORMAT_ARROW = 'arrow'
+
+# chunk size for streaming response
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _field_kind(field):
+    """
+    Return simple type kind of a django model field
+    """
+    if isinstance(field, (BooleanField, NullBooleanField)):
+        return 'boolean'
+    if isinstance(field, (IntegerField, BigIntegerField, SmallIntegerField, AutoField)):
+        return 'integer'
+    if isinstance(field, (FloatField, DecimalField)):
+        return 'float'
+    if isinstance(field, DateTimeField):
+        return 'datetime'
+    if isinstance(field, DateField):
+        return 'date'
+    if isinstance(field, BinaryField):
+        return 'binary'
+    return 'string'
+
+
+class BaseVectorResponder(object):
+    """
+    Base class to build binary vector response from an iterable of model instances
+    :param instances: queryset or iterable of model instances
+    :param fields: list of django model fields for attributes
+    :param geometry_attr: instance attribute name with GEOSGeometry to output
+    :param srid: output geometries srid
+    :param file_name: name of file to download
+    """
+    content_type = 'application/octet-stream'
+    extension = ''
+
+    def __init__(self, instances, fields, geometry_attr, srid, file_name='layer'):
+        self.instances = instances
+        self.fields = fields
+        self.geometry_attr = geometry_attr
+        self.srid = srid
+        self.file_name = smart_str(file_name)
+
+    def iter_instances(self):
+        if hasattr(self.instances, 'iterator'):
+            return self.instances.iterator()
+        return iter(self.instances)
+
+    def stream(self):
+        raise NotImplementedError
+
+    def __call__(self):
+        response = StreamingHttpResponse(self.stream(), content_type=self.content_type)
+        response['Content-Disposition'] = 'inline; filename={}.{}'.format(self.file_name, self.extension)
+        return response
+
+
+class FlatGeobufResponder(BaseVectorResponder):
+    """
+    FlatGeobuf response written by GDAL/OGR FlatGeobuf driver (GDAL >= 3.1)
+    """
+    content_type = 'application/flatgeobuf'
+    extension = 'fgb'
+
+    OGR_FIELD_TYPES = {
+        'boolean': 'OFTInteger',
+        'integer': 'OFTInteger64',
+        'float': 'OFTReal',
+        'datetime': 'OFTDateTime',
+        'date': 'OFTDate',
+        'binary': 'OFTBinary',
+        'string': 'OFTString'
+    }
+
+    @staticmethod
+    def is_available():
+        return ogr is not None and ogr.GetDriverByName('FlatGeobuf') is not None
+
+    def write(self, path):
+        driver = ogr.GetDriverByName('FlatGeobuf')
+        datasource = driver.CreateDataSource(path)
+
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(int(self.srid))
+        layer = datasource.CreateLayer(self.file_name, srs, ogr.wkbUnknown, options=['SPATIAL_INDEX=YES'])
+
+        kinds = []
+        for field in self.fields:
+            kind = _field_kind(field)
+            field_defn = ogr.FieldDefn(str(field.column), getattr(ogr, self.OGR_FIELD_TYPES[kind]))
+            if kind == 'boolean':
+                field_defn.SetSubType(ogr.OFSTBoolean)
+            layer.CreateField(field_defn)
+            kinds.append(kind)
+
+        layer_defn = layer.GetLayerDefn()
+        for instance in self.iter_instances():
+            feature = ogr.Feature(layer_defn)
+            for n, field in enumerate(self.fields):
+                value = getattr(instance, field.attname)
+                if value is None:
+                    feature.SetFieldNull(n)
+                elif kinds[n] == 'datetime':
+                    feature.SetField(n, value.year, value.month, value.day, value.hour, value.minute,
+                                     value.second, 0)
+                elif kinds[n] == 'date':
+                    feature.SetField(n, value.year, value.month, value.day, 0, 0, 0, 0)
+                elif kinds[n] == 'binary':
+                    feature.SetFieldBinaryFromHexString(n, bytes(value).encode('hex'))
+                elif kinds[n] == 'float':
+                    feature.SetField(n, float(value))
+                elif kinds[n] in ('integer', 'boolean'):
+                    feature.SetField(n, int(value))
+                else:
+                    feature.SetField(n, smart_str(value))
+
+            geometry = getattr(instance, self.geometry_attr) if self.geometry_attr else None
+            if geometry:
+                feature.SetGeometry(ogr.CreateGeometryFromWkb(bytes(geometry.wkb)))
+            layer.CreateFeature(feature)
+
+        # flush and build spatial index
+        datasource = None
+
+    def stream(self):
+        handle, path = tempfile.mkstemp(suffix='.fgb')
+        os.close(handle)
+        os.remove(path)
+        try:
+            self.write(path)
+            with open(path, 'rb') as fgb:
+                chunk = fgb.read(STREAM_CHUNK_SIZE)
+                while chunk:
+                    yield chunk
+                    chunk = fgb.read(STREAM_CHUNK_SIZE)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class GeoArrowStreamResponder(BaseVectorResponder):
+    """
+    Arrow IPC stream response, geometries as GeoArrow WKB extension column,
+    record batches are sent while rows are read from db
+    """
+    content_type = 'application/vnd.apache.arrow.stream'
+    extension = 'arrow'
+    batch_size = 10000
+    geometry_column = 'geometry'
+
+    @staticmethod
+    def is_available():
+        return pa is not None
+
+    def get_schema(self):
+        arrow_types = {
+            'boolean': pa.bool_(),
+            'integer': pa.int64(),
+            'float': pa.float64(),
+            'datetime': pa.timestamp('us'),
+            'date': pa.date32(),
+            'binary': pa.binary(),
+            'string': pa.string()
+        }
+        self.kinds = [_field_kind(f) for f in self.fields]
+        arrow_fields = [pa.field(f.column, arrow_types[k]) for f, k in zip(self.fields, self.kinds)]
+        arrow_fields.append(pa.field(self.geometry_column, pa.binary(), metadata={
+            'ARROW:extension:name': 'geoarrow.wkb',
+            'ARROW:extension:metadata': json.dumps({'crs': 'EPSG:{}'.format(self.srid)})
+        }))
+        return pa.schema(arrow_fields, metadata={
+            'geo': json.dumps({
+                'primary_column': self.geometry_column,
+                'columns': {self.geometry_column: {'encoding': 'WKB', 'crs': 'EPSG:{}'.format(self.srid)}}
+            })
+        })
+
+    def _batch(self, schema, columns):
+        arrays = []
+        for n, values in enumerate(columns):
+            if n < len(self.kinds) and self.kinds[n] == 'float':
+                values = [float(v) if isinstance(v, Decimal) else v for v in values]
+            elif n < len(self.kinds) and self.kinds[n] == 'binary':
+                values = [bytes(v) if v is not None else None for v in values]
+            arrays.append(pa.array(values, type=schema[n].type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def stream(self):
+        schema = self.get_schema()
+        sink = _ChunksSink()
+        writer = pa.RecordBatchStreamWriter(pa.PythonFile(sink, mode='w'), schema)
+
+        columns = [[] for n in range(len(self.fields) + 1)]
+        rows = 0
+        for instance in self.iter_instances():
+            for n, field in enumerate(self.fields):
+                columns[n].append(getattr(instance, field.attname))
+            geometry = getattr(instance, self.geometry_attr) if self.geometry_attr else None
+            columns[-1].append(bytes(geometry.wkb) if geometry else None)
+            rows += 1
+
+            if rows == self.batch_size:
+                writer.write_batch(self._batch(schema, columns))
+                yield sink.pop()
+                columns = [[] for n in range(len(self.fields) + 1)]
+                rows = 0
+
+        if rows:
+            writer.write_batch(self._batch(schema, columns))
+        writer.close()
+        yield sink.pop()
+
+
+class _ChunksSink(object):
+    """
+    File like object collecting bytes written by Arrow stream writer
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+# responders by format key
+VECTOR_FORMAT_RESPONDERS = {
+    FORMAT_FLATGEOBUF: FlatGeobufResponder,
+    FORMAT_ARROW: GeoArrowStreamResponder
+}
@@ -0,0 +1,65 @@
+"""
+GeoDjango database functions not available in Django GIS functions module.
+"""
+from django.db.models import Func, Value, FloatField, BinaryField
+from django.contrib.gis.db.models.functions import GeomOutputGeoFunc
+
+
+class SimplifyPreserveTopology(GeomOutputGeoFunc):
+    """
+    ST_SimplifyPreserveTopology(geometry, tolerance), available on Postgis and Spatialite
+    """
+    sql_function = 'ST_SimplifyPreserveTopology'
+
+    def __init__(self, expression, tolerance, **extra):
+        super(SimplifyPreserveTopology, self).__init__(expression, Value(float(tolerance), output_field=FloatField()),
+                                                       **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        extra_context['function'] = self.sql_function
+        return super(SimplifyPreserveTopology, self).as_sql(compiler, connection, **extra_context)
+
+
+class X(Func):
+    """
+    ST_X(point), x coordinate of a point geometry
+    """
+    function = 'ST_X'
+
+    def __init__(self, expression, **extra):
+        super(X, self).__init__(expression, output_field=FloatField(), **extra)
+
+
+class Y(Func):
+    """
+    ST_Y(point), y coordinate of a point geometry
+    """
+    function = 'ST_Y'
+
+    def __init__(self, expression, **extra):
+        super(Y, self).__init__(expression, output_field=FloatField(), **extra)
+
+
+class Floor(Func):
+    """
+    FLOOR(number), on Spatialite available with math functions (>= 4.0)
+    """
+    function = 'FLOOR'
+
+    def __init__(self, expression, **extra):
+        super(Floor, self).__init__(expression, output_field=FloatField(), **extra)
+
+
+class AsMVTGeom(Func):
+    """
+    ST_AsMVTGeom(geometry, bounds, extent, buffer, clip), geometry in tile coordinates space,
+    only Postgis >= 2.4. Geometry has to be in bounds srid (EPSG:3857).
+    """
+    function = 'ST_AsMVTGeom'
+    template = '%(function)s(%(expressions)s, ST_MakeEnvelope(%(xmin)r, %(ymin)r, %(xmax)r, %(ymax)r, 3857), ' \
+               '%(extent)d, %(buffer)d, true)'
+
+    def __init__(self, expression, bounds, extent=4096, buffer=64, **extra):
+        xmin, ymin, xmax, ymax = [float(b) for b in bounds]
+        super(AsMVTGeom, self).__init__(expression, output_field=BinaryField(), xmin=xmin, ymin=ymin, xmax=xmax,
+                                        ymax=ymax, extent=int(extent), buffer=int(buffer), **extra)
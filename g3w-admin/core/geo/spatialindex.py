@@ -0,0 +1,83 @@
+"""
+Spatialite spatial index (R*Tree) usage for bbox filtering.
+Django Spatialite backend does not use R*Tree tables: bbox candidates are selected from
+idx_<table>_<geometry column> table, exact predicate is applied only to them.
+"""
+from django.db import connections
+
+# cache of Spatialite spatial indexes found, by (connection alias, table, column)
+_SPATIAL_INDEXES = set()
+
+
+def spatial_index_table_name(table, column):
+    return 'idx_{}_{}'.format(table, column)
+
+
+def has_spatial_index(connection, table, column):
+    """
+    Check if Spatialite spatial index of geometry column exists and is enabled
+    :param connection: django db connection
+    :param table: table name
+    :param column: geometry column name
+    :return: boolean
+    """
+    key = (connection.alias, table.lower(), column.lower())
+    if key not in _SPATIAL_INDEXES:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT 1 FROM geometry_columns g JOIN sqlite_master m ON m.type = \'table\' '
+                'AND Lower(m.name) = Lower(%s) WHERE g.spatial_index_enabled = 1 '
+                'AND Lower(g.f_table_name) = Lower(%s) AND Lower(g.f_geometry_column) = Lower(%s)',
+                [spatial_index_table_name(table, column), table, column])
+            if cursor.fetchone():
+                _SPATIAL_INDEXES.add(key)
+    return key in _SPATIAL_INDEXES
+
+
+def spatial_index_bbox_queryset(queryset, geometry_field, bbox):
+    """
+    Pre filter Spatialite queryset by R*Tree spatial index of geometry field, if it exists
+    :param queryset: django queryset
+    :param geometry_field: name of geometry field
+    :param bbox: GEOSGeometry, in layer srid
+    :return: queryset, unchanged for other dbs or without spatial index
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'sqlite':
+        return queryset
+
+    table = queryset.model._meta.db_table
+    column = queryset.model._meta.get_field(geometry_field).column
+    if not has_spatial_index(connection, table, column):
+        return queryset
+
+    qn = connection.ops.quote_name
+    xmin, ymin, xmax, ymax = bbox.extent
+    where = '{}.rowid IN (SELECT pkid FROM {} WHERE xmin <= %s AND xmax >= %s AND ymin <= %s AND ymax >= %s)'.format(
+        qn(table), qn(spatial_index_table_name(table, column)))
+    return queryset.extra(where=[where], params=[xmax, xmin, ymax, ymin])
+
+
+def missing_spatial_index(model, geometry_field, connection):
+    """
+    Return name of Spatialite spatial index to create for model geometry field, None if exists
+    :return: string or None
+    """
+    table = model._meta.db_table
+    column = model._meta.get_field(geometry_field).column
+    if has_spatial_index(connection, table, column):
+        return None
+    return spatial_index_table_name(table, column)
+
+
+def create_spatial_index(model, geometry_field, connection):
+    """
+    Create and fill Spatialite spatial index of model geometry field
+    :return: boolean, True if created
+    """
+    table = model._meta.db_table
+    column = model._meta.get_field(geometry_field).column
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT CreateSpatialIndex(%s, %s)', [table, column])
+        created = bool(cursor.fetchone()[0])
+    return created and has_spatial_index(connection, table, column)
@@ -0,0 +1,196 @@
+"""
+Mapbox Vector Tiles of vector layer features, on XYZ EPSG:3857 tiles grid:
+built by ST_AsMVT on Postgis, by mapbox-vector-tile python encoder on other dbs.
+Tiles are cached by the TileStache cache of raster tiles.
+"""
+from django.conf import settings
+from django.contrib.gis.geos import Polygon
+from django.db import connections
+from django.db.models import F
+from django.contrib.gis.db.models.functions import Transform
+from django.utils.encoding import force_text
+from django.utils import six
+from core.geo.functions import AsMVTGeom
+from copy import deepcopy
+from datetime import date, datetime
+from decimal import Decimal
+
+try:
+    import mapbox_vector_tile
+except ImportError:
+    mapbox_vector_tile = None
+
+try:
+    from ModestMaps.Core import Coordinate
+    from TileStache import Config
+except ImportError:
+    Config = None
+
+MVT_CONTENT_TYPE = 'application/vnd.mapbox-vector-tile'
+
+# tile coordinates extent and buffer around tile, in tile coordinates units
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+
+# max zoom level of tiles requests
+MVT_MAX_ZOOM = 24
+
+TILE_GEOMETRY_FIELD = 'g3w_mvt_geom'
+
+# TileStache cache format of vector tiles, file extension on Disk cache
+MVT_CACHE_FORMAT = 'MVT'
+
+# TileStache cache built from settings.TILESTACHE_CONFIG_BASE, once for every process
+_tile_cache = None
+
+
+class TileCacheLayer(object):
+    """
+    TileStache layer for tiles cache only: name, directory on Disk cache, and cache lifespan
+    """
+
+    def __init__(self, name, cache_lifespan=None):
+        self._name = name
+        self.cache_lifespan = cache_lifespan
+
+    def name(self):
+        return self._name
+
+
+def get_tile_cache():
+    """
+    TileStache cache of raster tiles, None if TileStache is not installed
+    """
+    global _tile_cache
+    if Config is None:
+        return None
+    if _tile_cache is None:
+        _tile_cache = Config.buildConfiguration({
+            'cache': deepcopy(settings.TILESTACHE_CONFIG_BASE['cache']),
+            'layers': {}
+        }).cache
+    return _tile_cache
+
+
+def read_cached_tile(layer, z, x, y):
+    """
+    Read vector tile from TileStache cache
+    :param layer: TileCacheLayer instance
+    :return: bytes or None if not cached
+    """
+    cache = get_tile_cache()
+    if cache is None:
+        return None
+    return cache.read(layer, Coordinate(y, x, z), MVT_CACHE_FORMAT)
+
+
+def save_cached_tile(tile, layer, z, x, y):
+    """
+    Save vector tile in TileStache cache
+    :param tile: bytes
+    :param layer: TileCacheLayer instance
+    """
+    cache = get_tile_cache()
+    if cache is not None:
+        cache.save(tile, layer, Coordinate(y, x, z), MVT_CACHE_FORMAT)
+
+
+def tile_buffer_bounds(bounds, extent=MVT_EXTENT, buffer=MVT_BUFFER):
+    """
+    Tile bounds enlarged by buffer, to select features to clip
+    """
+    margin = (bounds[2] - bounds[0]) * buffer / float(extent)
+    return bounds[0] - margin, bounds[1] - margin, bounds[2] + margin, bounds[3] + margin
+
+
+def is_postgis_tile_available(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def postgis_tile(queryset, geometry_field, field_names, layer_name, bounds, extent=MVT_EXTENT, buffer=MVT_BUFFER):
+    """
+    Build tile in one query by ST_AsMVT
+    :param queryset: features queryset, already filtered by tile bounds
+    :param geometry_field: name of geometry field
+    :param field_names: names of fields for features properties
+    :param layer_name: name of layer inside tile
+    :param bounds: tile bounds in EPSG:3857
+    :return: bytes
+    """
+    queryset = queryset.order_by().annotate(**{
+        TILE_GEOMETRY_FIELD: AsMVTGeom(Transform(F(geometry_field), 3857), bounds, extent=extent, buffer=buffer)
+    }).values(TILE_GEOMETRY_FIELD, *field_names)
+
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            'SELECT ST_AsMVT(t, %s, %s, %s) FROM ({}) AS t WHERE t.{} IS NOT NULL'.format(sql, TILE_GEOMETRY_FIELD),
+            [layer_name, extent, TILE_GEOMETRY_FIELD] + list(params)
+        )
+        row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] is not None else b''
+
+
+def _property_value(value):
+    """
+    Feature property value as a MVT value type: string, integer, float or boolean
+    """
+    if isinstance(value, (bool, float) + six.integer_types):
+        return value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return force_text(value)
+
+
+def python_tile(queryset, geometry_field, field_names, layer_name, bounds, extent=MVT_EXTENT, buffer=MVT_BUFFER):
+    """
+    Build tile by mapbox-vector-tile encoder, geometries are transformed to EPSG:3857 in db
+    and clipped to tile plus buffer, as ST_AsMVTGeom does
+    :return: bytes
+    """
+    queryset = queryset.order_by().annotate(**{
+        TILE_GEOMETRY_FIELD: Transform(F(geometry_field), 3857)
+    })
+
+    clip = Polygon.from_bbox(tile_buffer_bounds(bounds, extent, buffer))
+    clip.srid = 3857
+
+    features = []
+    for row in queryset.values_list(TILE_GEOMETRY_FIELD, *field_names).iterator():
+        geometry = row[0]
+        if geometry is None:
+            continue
+        if not clip.contains(geometry):
+            geometry = geometry.intersection(clip)
+            if geometry.empty:
+                continue
+        features.append({
+            'geometry': bytes(geometry.wkb),
+            'properties': {name: _property_value(value) for name, value in zip(field_names, row[1:])
+                           if value is not None}
+        })
+
+    if not features:
+        return b''
+
+    return mapbox_vector_tile.encode([{'name': layer_name, 'features': features}], quantize_bounds=bounds,
+                                     extents=extent)
+
+
+def vector_tile(queryset, geometry_field, field_names, layer_name, bounds):
+    """
+    Build Mapbox Vector Tile of features queryset
+    :param queryset: features queryset, already filtered by tile bounds
+    :param geometry_field: name of geometry field
+    :param field_names: names of fields for features properties
+    :param layer_name: name of layer inside tile
+    :param bounds: tile bounds in EPSG:3857
+    :return: bytes, empty for tiles without features
+    """
+    if is_postgis_tile_available(queryset):
+        return postgis_tile(queryset, geometry_field, field_names, layer_name, bounds)
+    if mapbox_vector_tile is None:
+        raise NotImplementedError('mapbox-vector-tile package is required for vector tiles on this database')
+    return python_tile(queryset, geometry_field, field_names, layer_name, bounds)
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.contrib.gis.geos import GEOSGeometry
+from core.utils.geo import transform_featurecollection
+from copy import deepcopy
+import json
+import timeit
+
+
+def build_featurecollection(n):
+    """
+    Build a FeatureCollection of n little polygons in EPSG:4326
+    """
+    features = []
+    for i in range(n):
+        x = 7 + (i % 100) * 0.01
+        y = 44 + (i // 100) * 0.01
+        features.append({
+            'type': 'Feature',
+            'properties': {'id': i},
+            'geometry': {
+                'type': 'Polygon',
+                'coordinates': [[[x, y], [x + 0.005, y], [x + 0.005, y + 0.005], [x, y + 0.005], [x, y]]]
+            }
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def per_feature_reproject(featurecollection, from_srid, to_srid):
+    """
+    Per feature reprojection through GEOS objects, as vector API did before batch transformation
+    """
+    for feature in featurecollection['features']:
+        geometry = GEOSGeometry(json.dumps(feature['geometry']), srid=from_srid)
+        geometry.transform(to_srid)
+        feature['geometry'] = json.loads(geometry.json)
+
+
+class Command(BaseCommand):
+    """
+    Micro-benchmark of vector API reprojection: batch transformation vs per feature GEOS loop.
+    """
+    help = 'Benchmark batch reprojection of a FeatureCollection against a per feature GEOS loop'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--features',
+            dest='features',
+            type=int,
+            default=2000,
+            help='Number of polygon features, default 2000',
+        )
+
+        parser.add_argument(
+            '--repeat',
+            dest='repeat',
+            type=int,
+            default=3,
+            help='Runs for every method, default 3',
+        )
+
+        parser.add_argument(
+            '--to-srid',
+            dest='to_srid',
+            type=int,
+            default=3857,
+            help='Target srid, features are in EPSG:4326, default 3857',
+        )
+
+    def handle(self, *args, **options):
+
+        fc = build_featurecollection(options['features'])
+        to_srid = options['to_srid']
+        repeat = options['repeat']
+
+        # warm up transformer cache
+        transform_featurecollection(deepcopy(fc), 4326, to_srid)
+
+        batched = timeit.timeit(lambda: transform_featurecollection(deepcopy(fc), 4326, to_srid), number=repeat)
+        looped = timeit.timeit(lambda: per_feature_reproject(deepcopy(fc), 4326, to_srid), number=repeat)
+
+        self.stdout.write('Reproject {} features to EPSG:{}: batched {:.3f}s, per feature {:.3f}s'.format(
+            options['features'], to_srid, batched / repeat, looped / repeat))
@@ -1,4 +1,30 @@
 
+from core.utils.data import load_text_data
+import copy
+
+
+class G3WParsedTextFieldsMixin(object):
+    """
+    Decode structured text fields (JSON) once per instance lifetime
+    """
+
+    def get_parsed(self, field_name, default=None):
+        """
+        Get decoded value of text field, decoded again only if field value is changed.
+        A copy is returned every time, callers can change it.
+        :param field_name: model field name
+        :param default: returned if field is empty
+        """
+        value = getattr(self, field_name)
+        if not value:
+            return default
+
+        parsed = self.__dict__.setdefault('_parsed_text_fields', dict())
+        if field_name not in parsed or parsed[field_name][0] is not value:
+            parsed[field_name] = (value, load_text_data(value))
+        return copy.deepcopy(parsed[field_name][1])
+
+
 class G3WProjectMixins(object):
 
     def get_type(self):
@@ -1,3 +1,7 @@
+from django.dispatch import receiver
+from django.db.backends.signals import connection_created
+from django.core.signals import request_started
+from core.utils.db import set_spatialite_pragmas, reset_routing
 from .models import GroupProjectPanoramic
 
 
@@ -12,3 +16,20 @@ def check_overviewmap_project(sender, **kwargs):
         group_project_panoramics.delete()
     except Exception:
         pass
+
+
+@receiver(connection_created)
+def setSpatialiteConnectionPragmas(sender, connection, **kwargs):
+    """
+    Tune new Spatialite layers connections
+    """
+    if connection.vendor == 'sqlite':
+        set_spatialite_pragmas(connection)
+
+
+@receiver(request_started)
+def resetDatasourceRouting(sender, **kwargs):
+    """
+    Every request starts reading from layers datasources read replicas
+    """
+    reset_routing()
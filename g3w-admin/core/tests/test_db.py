@@ -0,0 +1,93 @@
+from django.db import connections, models
+from django.test import TestCase
+from core.utils import db
+from core.utils.db import build_django_connection, related_rows, unique_values
+import os
+import tempfile
+
+
+class RelatedRowsChild(models.Model):
+    """
+    Child layer table of related_rows tests, on a Spatialite test db
+    """
+    parent = models.IntegerField(null=True)
+    name = models.CharField(max_length=20)
+
+    class Meta:
+        app_label = 'core'
+        managed = False
+        db_table = 'related_rows_child'
+
+
+class LayerDbTestCase(TestCase):
+    """
+    RelatedRowsChild table on a temporary Spatialite db
+    """
+
+    using = 'test_related_rows'
+
+    def setUp(self):
+        fd, self.dbname = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        connections.databases[self.using] = build_django_connection({'dbname': self.dbname},
+                                                                    layer_type='spatialite')
+        with connections[self.using].schema_editor() as schema_editor:
+            schema_editor.create_model(RelatedRowsChild)
+
+        # 3 children of 1, 1 of 2, 2 without parent
+        for parent, name in ((1, 'a'), (1, 'b'), (1, 'c'), (2, 'd'), (None, 'e'), (None, 'f')):
+            RelatedRowsChild.objects.using(self.using).create(parent=parent, name=name)
+
+    def tearDown(self):
+        connections[self.using].close()
+        del connections[self.using]
+        del connections.databases[self.using]
+        os.remove(self.dbname)
+
+
+class RelatedRowsTest(LayerDbTestCase):
+
+    def related_rows(self, **kwargs):
+        fields = {f.name: f for f in RelatedRowsChild._meta.concrete_fields}
+        res = related_rows(RelatedRowsChild.objects.using(self.using), fields['parent'], [1, 2, 3, None],
+                           [fields['name']], **kwargs)
+        return {v: (r['count'], [row['name'] for row in r['rows']]) for v, r in res.items()}
+
+    def assert_related_rows(self):
+
+        self.assertEqual(self.related_rows(), {1: (3, ['a', 'b', 'c']), 2: (1, ['d']), 3: (0, []),
+                                               None: (2, ['e', 'f'])})
+
+        # paging for every parent value, count is the total
+        self.assertEqual(self.related_rows(offset=1, limit=1), {1: (3, ['b']), 2: (1, []), 3: (0, []),
+                                                                None: (2, ['f'])})
+
+    def test_related_rows(self):
+
+        self.assert_related_rows()
+
+    def test_related_rows_without_window_functions(self):
+
+        # SQLite < 3.25
+        has_window_functions = db.has_window_functions
+        db.has_window_functions = lambda connection: False
+        try:
+            self.assert_related_rows()
+        finally:
+            db.has_window_functions = has_window_functions
+
+
+class UniqueValuesTest(LayerDbTestCase):
+
+    def test_unique_values(self):
+
+        fields = {f.name: f for f in RelatedRowsChild._meta.concrete_fields}
+        queryset = RelatedRowsChild.objects.using(self.using)
+
+        # no nulls for not blank fields, limit for every field
+        res = unique_values(queryset, [fields['parent'], fields['name']], limit=2)
+        self.assertEqual(dict(res), {'parent': [1, 2], 'name': ['a', 'b']})
+
+        # case insensitive prefix
+        res = unique_values(queryset.filter(parent=1), [fields['parent'], fields['name']], startswith='B')
+        self.assertEqual(dict(res), {'parent': [], 'name': ['b']})
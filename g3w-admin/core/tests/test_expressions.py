@@ -0,0 +1,51 @@
+from django.test import TestCase
+from core.models import G3WSpatialRefSys
+from core.utils.expressions import compile_filter_expression, FilterExpressionError, like_lookup, MAX_NESTING
+
+
+class FilterExpressionTest(TestCase):
+
+    fixtures = ['G3WSpatialRefSys.json']
+
+    def filter(self, expression, **kwargs):
+        return G3WSpatialRefSys.objects.filter(compile_filter_expression(expression, G3WSpatialRefSys, **kwargs))
+
+    def test_like_lookup(self):
+
+        self.assertEqual(like_lookup('abc%'), ('startswith', 'abc'))
+        self.assertEqual(like_lookup('%abc', insensitive=True), ('iendswith', 'abc'))
+        self.assertEqual(like_lookup('%abc%'), ('contains', 'abc'))
+        self.assertEqual(like_lookup('abc'), ('exact', 'abc'))
+        self.assertEqual(like_lookup('a_c%'), ('regex', '^a.c.*$'))
+
+    def test_compile(self):
+
+        self.assertEqual(list(self.filter('srid = 4326').values_list('srid', flat=True)), [4326])
+        self.assertEqual(self.filter("srid IN (4326, 3857) AND auth_name ILIKE 'epsg'").count(), 2)
+        self.assertEqual(self.filter("NOT (srid <> 3857) OR srid = 4326").count(), 2)
+        self.assertEqual(self.filter('"auth_name" IS NULL').count(), 0)
+        self.assertEqual(self.filter("srid = 4326 AND srid NOT IN (4326)").count(), 0)
+
+    def test_invalid_expressions(self):
+
+        for expression in (
+                'srid = ',
+                'srid = 4326 OR',
+                'srid == 4326',
+                "srid = 'abc'",
+                'unknown_field = 1',
+                'srid = 4326; DROP TABLE core_g3wspatialrefsys',
+                "(srid = 4326",
+                "srtext LIKE 1"):
+            with self.assertRaises(FilterExpressionError):
+                self.filter(expression)
+
+        # excluded fields are not usable
+        with self.assertRaises(FilterExpressionError):
+            self.filter("proj4text LIKE '%longlat%'", excluded_fields=['proj4text'])
+
+        # nesting is limited, not by python recursion limit
+        self.assertEqual(self.filter('(' * MAX_NESTING + 'srid = 4326' + ')' * MAX_NESTING).count(), 1)
+        for expression in ('(' * 4000 + 'srid = 4326' + ')' * 4000, 'NOT ' * 2000 + 'srid = 4326'):
+            with self.assertRaises(FilterExpressionError):
+                self.filter(expression)
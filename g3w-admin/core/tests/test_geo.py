@@ -0,0 +1,153 @@
+from django.test import TestCase
+from django.contrib.gis.geos import GEOSGeometry
+from core.utils.geo import transform_featurecollection, round_featurecollection, quantize_featurecollection, \
+    mercator_tile_bounds
+from core.geo.aggregation import bin_points, density_grid
+from core.geo.tiles import tile_buffer_bounds
+from copy import deepcopy
+import json
+
+
+def build_featurecollection(n):
+    """
+    Build a FeatureCollection of n little polygons in EPSG:4326
+    """
+    features = []
+    for i in range(n):
+        x = 7 + (i % 100) * 0.01
+        y = 44 + (i // 100) * 0.01
+        features.append({
+            'type': 'Feature',
+            'properties': {'id': i},
+            'geometry': {
+                'type': 'Polygon',
+                'coordinates': [[[x, y], [x + 0.005, y], [x + 0.005, y + 0.005], [x, y + 0.005], [x, y]]]
+            }
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def per_feature_reproject(featurecollection, from_srid, to_srid):
+    """
+    Old per feature loop reprojection through GEOS objects
+    """
+    for feature in featurecollection['features']:
+        geometry = GEOSGeometry(json.dumps(feature['geometry']), srid=from_srid)
+        geometry.transform(to_srid)
+        feature['geometry'] = json.loads(geometry.json)
+
+
+class TransformFeatureCollectionTest(TestCase):
+
+    fixtures = ['G3WSpatialRefSys.json']
+
+    def test_transform_featurecollection(self):
+
+        fc = build_featurecollection(50)
+        fc_geos = deepcopy(fc)
+
+        transform_featurecollection(fc, 4326, 3857)
+        per_feature_reproject(fc_geos, 4326, 3857)
+
+        for feature, feature_geos in zip(fc['features'], fc_geos['features']):
+            for position, position_geos in zip(feature['geometry']['coordinates'][0],
+                                               feature_geos['geometry']['coordinates'][0]):
+                self.assertAlmostEqual(position[0], position_geos[0], places=3)
+                self.assertAlmostEqual(position[1], position_geos[1], places=3)
+
+    def test_transform_null_and_collection_geometries(self):
+
+        fc = {
+            'type': 'FeatureCollection',
+            'features': [
+                {'type': 'Feature', 'properties': {}, 'geometry': None},
+                {'type': 'Feature', 'properties': {}, 'geometry': {
+                    'type': 'GeometryCollection',
+                    'geometries': [
+                        {'type': 'Point', 'coordinates': [0, 0, 10]},
+                        {'type': 'LineString', 'coordinates': [[0, 0], [1, 1]]}
+                    ]
+                }}
+            ]
+        }
+
+        transform_featurecollection(fc, 4326, 3857)
+
+        self.assertIsNone(fc['features'][0]['geometry'])
+        point = fc['features'][1]['geometry']['geometries'][0]['coordinates']
+        self.assertAlmostEqual(point[0], 0)
+        self.assertEqual(point[2], 10)
+
+
+class GeometryEncodingTest(TestCase):
+
+    def test_round_featurecollection(self):
+
+        fc = build_featurecollection(10)
+        round_featurecollection(fc, 2)
+
+        position = fc['features'][3]['geometry']['coordinates'][0][0]
+        self.assertEqual(position, [7.03, 44.0])
+
+    def test_quantize_featurecollection(self):
+
+        fc = build_featurecollection(10)
+        fc_source = deepcopy(fc)
+        quantize_featurecollection(fc, 3)
+
+        scale = fc['transform']['scale']
+        translate = fc['transform']['translate']
+        for feature, feature_source in zip(fc['features'], fc_source['features']):
+            x = y = 0
+            for position, position_source in zip(feature['geometry']['coordinates'][0],
+                                                 feature_source['geometry']['coordinates'][0]):
+                self.assertIsInstance(position[0], int)
+
+                # decode delta
+                x += position[0]
+                y += position[1]
+                self.assertAlmostEqual(x * scale[0] + translate[0], position_source[0], places=3)
+                self.assertAlmostEqual(y * scale[1] + translate[1], position_source[1], places=3)
+
+
+class GridAggregationTest(TestCase):
+
+    def test_bin_points(self):
+
+        rows = [(1, 1, 5), (2, 2, None), (15, 1, 3), (16, 2, 1), (None, None, 1)]
+        clusters = sorted(bin_points(rows, 10, [('avg', 'value')]), key=lambda c: c['gx'])
+
+        self.assertEqual([(c['gx'], c['gy'], c['count']) for c in clusters], [(0, 0, 2), (1, 0, 2)])
+        self.assertEqual((clusters[0]['x'], clusters[0]['y']), (1.5, 1.5))
+
+        # null values are not aggregated
+        self.assertEqual(clusters[0]['avg_value'], 5)
+        self.assertEqual(clusters[1]['avg_value'], 2)
+
+    def test_density_grid(self):
+
+        clusters = [{'gx': 0, 'gy': 0, 'count': 2}, {'gx': 2, 'gy': 1, 'count': 3}]
+        grid = density_grid(clusters, (0, 0, 25, 15), 10)
+
+        self.assertEqual((grid['width'], grid['height']), (3, 2))
+        self.assertEqual(grid['origin'], [0, 20])
+        self.assertEqual(grid['values'], [0, 0, 3, 2, 0, 0])
+
+
+class VectorTilesTest(TestCase):
+
+    def test_mercator_tile_bounds(self):
+
+        world = mercator_tile_bounds(0, 0, 0)
+        self.assertAlmostEqual(world[0], -20037508.342789244)
+        self.assertAlmostEqual(world[3], 20037508.342789244)
+
+        # tile 1/1/0 is north east quarter
+        xmin, ymin, xmax, ymax = mercator_tile_bounds(1, 1, 0)
+        self.assertAlmostEqual(xmin, 0)
+        self.assertAlmostEqual(ymin, 0)
+        self.assertAlmostEqual(xmax, 20037508.342789244)
+
+    def test_tile_buffer_bounds(self):
+
+        self.assertEqual(tile_buffer_bounds((0, 0, 4096, 4096), extent=4096, buffer=64), (-64, -64, 4160, 4160))
@@ -0,0 +1,63 @@
+from django.test import TestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from core.api.base.views import G3WAPIKeysetPaginator
+from core.models import G3WSpatialRefSys
+import base64
+import json
+
+SRIDS = [2000, 2001, 2002, 2003, 2004, 2005]
+
+
+class KeysetPaginatorTest(TestCase):
+
+    fixtures = ['G3WSpatialRefSys.json']
+
+    def paginate(self, **params):
+        request = Request(APIRequestFactory().get('/', params))
+        paginator = G3WAPIKeysetPaginator()
+        results = paginator.paginate_queryset(G3WSpatialRefSys.objects.filter(srid__in=SRIDS), request)
+        return [r.srid for r in results], paginator
+
+    def test_next_previous_cursors(self):
+
+        srids, paginator = self.paginate(page_size=2)
+        self.assertEqual(srids, SRIDS[:2])
+        self.assertIsNone(paginator.previous)
+
+        srids, paginator = self.paginate(page_size=2, cursor=paginator.next)
+        self.assertEqual(srids, SRIDS[2:4])
+
+        srids, last_paginator = self.paginate(page_size=2, cursor=paginator.next)
+        self.assertEqual(srids, SRIDS[4:])
+        self.assertIsNone(last_paginator.next)
+
+        srids, paginator = self.paginate(page_size=2, cursor=last_paginator.previous)
+        self.assertEqual(srids, SRIDS[2:4])
+
+        srids, paginator = self.paginate(page_size=2, cursor=paginator.previous)
+        self.assertEqual(srids, SRIDS[:2])
+        self.assertIsNone(paginator.previous)
+
+    def test_ordering_ties(self):
+
+        # every auth_name is EPSG: pages follow pk inside ties, without duplicates or gaps
+        for ordering, expected in (('auth_name', SRIDS), ('-auth_name', SRIDS[::-1])):
+            srids, paginator = self.paginate(page_size=4, ordering=ordering)
+            next_srids, next_paginator = self.paginate(page_size=4, ordering=ordering, cursor=paginator.next)
+            self.assertEqual(srids + next_srids, expected)
+
+            previous_srids, paginator = self.paginate(page_size=4, ordering=ordering,
+                                                      cursor=next_paginator.previous)
+            self.assertEqual(previous_srids, expected[:4])
+
+    def test_tampered_cursor(self):
+
+        for cursor in (
+                'not a cursor',
+                base64.urlsafe_b64encode(json.dumps({'p': ['abc'], 'r': 0})),
+                base64.urlsafe_b64encode(json.dumps({'p': [1, 2], 'r': 0})),
+                base64.urlsafe_b64encode(json.dumps(['abc']))):
+            with self.assertRaises(ParseError):
+                self.paginate(page_size=2, cursor=cursor)
@@ -1,5 +1,7 @@
 from django.utils.translation import ugettext, ugettext_lazy as _
 from .general import ucfirst
+import ast
+import json
 import re
 
 
@@ -57,3 +59,16 @@ def isXML(string):
         return True
     else:
         return False
+
+
+def load_text_data(value):
+    """
+    Decode structured data stored in text fields: JSON or, for data saved before JSON storage,
+    python literal. Arbitrary python code is never evaluated.
+    :param value: string
+    :return: decoded data
+    """
+    try:
+        return json.loads(value)
+    except ValueError:
+        return ast.literal_eval(value)
@@ -1,7 +1,52 @@
-from django.db import connections
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.db import connections, transaction, close_old_connections, DatabaseError
+from django.db.models import QuerySet
+from django.utils.six.moves import queue
+from contextlib import contextmanager
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
 import hashlib
+import json
+import random
+import threading
+import time
 from collections import OrderedDict
 
+# suffix of Spatialite write connections aliases
+SPATIALITE_WRITE_ALIAS_SUFFIX = '_write'
+
+# Spatialite connections aliases: read alias: write alias
+_SPATIALITE_WRITE_ALIASES = dict()
+
+# locks to serialize writes on Spatialite connections, by write alias
+_SPATIALITE_WRITE_LOCKS = dict()
+_SPATIALITE_LOCK = threading.Lock()
+
+# Postgis read replicas aliases: primary alias: list of replicas aliases
+_REPLICA_ALIASES = dict()
+
+# replica alias: primary alias
+_PRIMARY_ALIASES = dict()
+
+# replica alias: (last check time, usable)
+_REPLICA_STATUS = dict()
+
+# primary aliases to use for reads in current thread request, after writes,
+# and read replica chosen for every primary alias in current thread request
+_routing = threading.local()
+
+# bounded thread pool of concurrent layers queries, created on first use in every process
+_query_pool = None
+_QUERY_POOL_LOCK = threading.Lock()
+
+# Sqlite VM instructions between query timeout checks
+SQLITE_PROGRESS_STEPS = 10000
+
+# events of concurrent query tasks
+QUERY_TASK_STARTED = 'started'
+QUERY_TASK_DONE = 'done'
+
 def getNextVlueFromPGSeq(PGSeqName, connection='default'):
     """
     Perform query on db anche get next sequence value form db
@@ -40,12 +85,189 @@ def build_django_connection(datasource, layer_type='postgres', schema=None):
 
         return conn
     else:
+        # persistent connection for every thread, mod_spatialite is loaded only once
         return {
             'ENGINE': 'django.contrib.gis.db.backends.spatialite',
-            'NAME': datasource['dbname']
+            'NAME': datasource['dbname'],
+            'CONN_MAX_AGE': settings.SPATIALITE_CONN_MAX_AGE,
+            'OPTIONS': {
+                'timeout': settings.SPATIALITE_BUSY_TIMEOUT
+            }
         }
 
 
+def add_spatialite_connections(using, datasource):
+    """
+    Add read and write Spatialite connections aliases for datasource, if not already added
+    :param using: read connection alias
+    :param datasource: dict
+    """
+    if using in _SPATIALITE_WRITE_ALIASES:
+        return
+
+    with _SPATIALITE_LOCK:
+        write_alias = using + SPATIALITE_WRITE_ALIAS_SUFFIX
+        if using not in connections.databases:
+            connections.databases[using] = build_django_connection(datasource, layer_type='spatialite')
+        if write_alias not in connections.databases:
+            connections.databases[write_alias] = build_django_connection(datasource, layer_type='spatialite')
+        _SPATIALITE_WRITE_LOCKS[write_alias] = threading.RLock()
+        _SPATIALITE_WRITE_ALIASES[using] = write_alias
+
+
+def add_replica_connections(using, datasource, schema=None):
+    """
+    Add connections aliases of Postgis datasource read replicas, from settings.VECTOR_DATASOURCE_REPLICAS
+    :param using: primary connection alias
+    :param datasource: dict
+    """
+    if using in _REPLICA_ALIASES:
+        return
+
+    replicas = settings.VECTOR_DATASOURCE_REPLICAS.get('{}/{}'.format(datasource.get('host'), datasource.get('dbname')))
+    aliases = []
+    for n, replica in enumerate(replicas or []):
+        alias = '{}_replica_{}'.format(using, n)
+        replica_datasource = dict(datasource)
+        replica_datasource.update(replica)
+        if alias not in connections.databases:
+            connections.databases[alias] = build_django_connection(replica_datasource, schema=schema)
+        _PRIMARY_ALIASES[alias] = using
+        aliases.append(alias)
+    _REPLICA_ALIASES[using] = aliases
+
+
+def replica_lag(alias):
+    """
+    Replication lag of a Postgis replica, in seconds: 0 if every received WAL is replayed
+    :param alias: replica connection alias
+    :return: float
+    """
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.pg_version >= 100000:
+            received, replayed = 'pg_last_wal_receive_lsn()', 'pg_last_wal_replay_lsn()'
+        else:
+            received, replayed = 'pg_last_xlog_receive_location()', 'pg_last_xlog_replay_location()'
+        cursor.execute(
+            'SELECT CASE WHEN NOT pg_is_in_recovery() OR {} = {} THEN 0 '
+            'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'.format(
+                received, replayed))
+        return float(cursor.fetchone()[0])
+
+
+def is_replica_usable(alias):
+    """
+    Check replica is reachable and its lag is under settings.VECTOR_REPLICA_MAX_LAG,
+    status is checked every settings.VECTOR_REPLICA_LAG_CHECK_INTERVAL seconds
+    """
+    checked, usable = _REPLICA_STATUS.get(alias, (None, False))
+    now = time.time()
+    if checked is None or now - checked > settings.VECTOR_REPLICA_LAG_CHECK_INTERVAL:
+        try:
+            usable = replica_lag(alias) <= settings.VECTOR_REPLICA_MAX_LAG
+        except DatabaseError:
+            usable = False
+        _REPLICA_STATUS[alias] = (now, usable)
+    return usable
+
+
+def pin_primary(using):
+    """
+    Read from primary connection for the rest of current request
+    :param using: primary connection alias
+    """
+    if not hasattr(_routing, 'pinned'):
+        _routing.pinned = set()
+    _routing.pinned.add(_PRIMARY_ALIASES.get(using, using))
+
+
+def reset_routing():
+    """
+    Reset primary connections pinned and read replicas chosen in current thread, on every request start
+    """
+    _routing.pinned = set()
+    _routing.replicas = dict()
+
+
+def get_read_alias(using):
+    """
+    Connection alias to use for reads: an usable read replica if primary is not pinned, else the same alias.
+    Replica is chosen once for every request, so reads of a request see the same data.
+    :param using: connection alias
+    :return: string
+    """
+    replicas = _REPLICA_ALIASES.get(using)
+    if not replicas or using in getattr(_routing, 'pinned', ()):
+        return using
+    if not hasattr(_routing, 'replicas'):
+        _routing.replicas = dict()
+    if using not in _routing.replicas:
+        usable = [r for r in replicas if is_replica_usable(r)]
+        _routing.replicas[using] = random.choice(usable) if usable else using
+    return _routing.replicas[using]
+
+
+def get_write_alias(using):
+    """
+    Connection alias to use for writes: separate write connection for Spatialite, primary for read replicas,
+    the same alias for other dbs. Reads of current request go to primary from now on.
+    :param using: connection alias
+    :return: string
+    """
+    using = _PRIMARY_ALIASES.get(using, using)
+    if using in _REPLICA_ALIASES:
+        pin_primary(using)
+    return _SPATIALITE_WRITE_ALIASES.get(using, using)
+
+
+class DatasourceQuerySet(QuerySet):
+    """
+    Geomodels queryset: routes reads to read connections (replicas) and writes to write connections
+    of layer datasource alias
+    """
+
+    @property
+    def db(self):
+        db = super(DatasourceQuerySet, self).db
+        return get_write_alias(db) if self._for_write else get_read_alias(db)
+
+
+def is_spatialite_write_alias(using):
+    return using in _SPATIALITE_WRITE_LOCKS
+
+
+@contextmanager
+def serialized_write(using):
+    """
+    Serialize writes of threads of this process on Spatialite write connection, no-op for other dbs
+    :param using: write connection alias
+    """
+    lock = _SPATIALITE_WRITE_LOCKS.get(using)
+    if lock is None:
+        yield
+        return
+    with lock:
+        yield
+
+
+def set_spatialite_pragmas(connection):
+    """
+    Set pragmas of Spatialite layers connection from settings, read connections are query only
+    :param connection: django db connection
+    """
+    if is_spatialite_write_alias(connection.alias):
+        pragmas = settings.SPATIALITE_WRITE_PRAGMAS
+    elif connection.alias in _SPATIALITE_WRITE_ALIASES:
+        pragmas = settings.SPATIALITE_READ_PRAGMAS
+    else:
+        return
+
+    with connection.cursor() as cursor:
+        for pragma, value in pragmas.items():
+            cursor.execute('PRAGMA {} = {}'.format(pragma, value))
+
+
 def build_dango_connection_name(datasource):
     """
     Build and return hash using django connection name database with layer datasource
@@ -72,3 +294,322 @@ def dictfetchall(cursor):
         res.append(drow)
 
     return res
+
+
+def estimate_queryset_count(queryset):
+    """
+    Return planner row estimate for queryset without scanning table:
+    table statistics for unfiltered queryset, EXPLAIN row estimate for filtered queryset (only Postgis)
+    :param queryset: django queryset
+    :return: integer or None if estimate is not available
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    filtered = bool(queryset.query.where)
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            if not filtered:
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                               [connection.ops.quote_name(table)])
+                row = cursor.fetchone()
+
+                # reltuples is 0 or -1 for never analyzed tables
+                if row and row[0] > 0:
+                    return int(row[0])
+
+            try:
+                sql, params = queryset.query.sql_with_params()
+            except EmptyResultSet:
+                return 0
+            cursor.execute('EXPLAIN (FORMAT JSON) {}'.format(sql), params)
+            plan = cursor.fetchone()[0]
+            if not isinstance(plan, list):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+
+        elif connection.vendor == 'sqlite' and not filtered:
+
+            # available only after ANALYZE
+            try:
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+                row = cursor.fetchone()
+            except Exception:
+                row = None
+            if row:
+                return int(row[0].split(' ')[0])
+
+    return None
+
+
+def _like_prefix(value):
+    """
+    Escape value for LIKE prefix pattern
+    """
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def unique_values(queryset, fields, limit=None, startswith=None):
+    """
+    Get sorted distinct values of many fields, nulls only for nullable fields:
+    Postgis: one query with a limited SELECT DISTINCT array subquery for every field,
+    other dbs: one UNION ALL query of limited SELECT DISTINCT subqueries
+    :param queryset: django queryset
+    :param fields: list of django model fields
+    :param limit: max number of values for every field
+    :param startswith: prefix values have to start with, case insensitive
+    :return: dict, field column: list of values
+    """
+    connection = connections[queryset.db]
+    queryset = queryset.order_by()
+
+    if connection.vendor == 'postgresql':
+        qn = connection.ops.quote_name
+        sql, params = queryset.values(*[f.name for f in fields]).query.sql_with_params()
+
+        # one array subquery for every field: field types can be different, no UNION
+        selects = []
+        selects_params = []
+        for f in fields:
+            column = 'u.{}'.format(qn(f.column))
+            where = []
+            where_params = []
+            if not (f.null and f.blank):
+                where.append('{} IS NOT NULL'.format(column))
+            if startswith:
+                where.append('UPPER({}::text) LIKE UPPER(%s)'.format(column))
+                where_params.append(_like_prefix(startswith))
+            select = 'SELECT DISTINCT {0} FROM ({1}) AS u{2} ORDER BY {0}'.format(
+                column, sql, ' WHERE {}'.format(' AND '.join(where)) if where else '')
+            if limit:
+                select += ' LIMIT %s'
+                where_params.append(int(limit))
+            selects.append('ARRAY({})'.format(select))
+            selects_params += list(params) + where_params
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT {}'.format(', '.join(selects)), selects_params)
+            row = cursor.fetchone()
+
+        return OrderedDict((f.column, list(row[n] or [])) for n, f in enumerate(fields))
+
+    # other dbs: one UNION ALL of limited SELECT DISTINCT subqueries, every row tagged by field index
+    qn = connection.ops.quote_name
+    sql, params = queryset.values(*[f.name for f in fields]).query.sql_with_params()
+    selects = []
+    selects_params = []
+    for n, f in enumerate(fields):
+        column = 'u.{}'.format(qn(f.column))
+        where = []
+        where_params = []
+        if not (f.null and f.blank):
+            where.append('{} IS NOT NULL'.format(column))
+        if startswith:
+            where.append("UPPER(CAST({} AS TEXT)) LIKE UPPER(%s) ESCAPE '\\'".format(column))
+            where_params.append(_like_prefix(startswith))
+        select = 'SELECT DISTINCT {0} AS g3w_value FROM ({1}) AS u{2} ORDER BY {0}'.format(
+            column, sql, ' WHERE {}'.format(' AND '.join(where)) if where else '')
+        if limit:
+            select += ' LIMIT %s'
+            where_params.append(int(limit))
+        selects.append('SELECT {} AS g3w_field, g3w_value FROM ({}) AS u{}'.format(n, select, n))
+        selects_params += list(params) + where_params
+
+    res = OrderedDict((f.column, []) for f in fields)
+    with connection.cursor() as cursor:
+        cursor.execute(' UNION ALL '.join(selects), selects_params)
+        for n, value in cursor.fetchall():
+            f = fields[n]
+            if value is not None:
+                # raw values, i.e. dates are strings on SQLite
+                try:
+                    value = f.to_python(value)
+                except ValidationError:
+                    pass
+            res[f.column].append(value)
+
+    # UNION ALL doesn't keep subqueries order, nulls last as on Postgis
+    for f in fields:
+        res[f.column].sort(key=lambda v: (v is None, v))
+    return res
+
+
+def has_window_functions(connection):
+    """
+    Check if db supports window functions: Postgres, SQLite >= 3.25
+    """
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 25, 0)
+
+
+def related_rows(queryset, field, values, columns, offset=0, limit=None):
+    """
+    Get rows of many parent key values in one query, paged for every value by ROW_NUMBER() window function
+    (one query for every value if db has no window functions)
+    :param queryset: child layer queryset
+    :param field: django model field referencing parent key
+    :param values: list of parent key values, None for NULL
+    :param columns: list of django model fields to select
+    :param offset: rows to skip for every value
+    :param limit: max rows for every value, None for every row
+    :return: dict, value: {'count': total rows, 'rows': list of dicts by column}
+    """
+    connection = connections[queryset.db]
+    pk = queryset.model._meta.pk
+    res = OrderedDict((v, {'count': 0, 'rows': []}) for v in values)
+    not_null_values = [v for v in values if v is not None]
+    names = [c.column for c in columns]
+
+    if not has_window_functions(connection):
+        for value in values:
+            value_queryset = queryset.filter(**{field.name if value is not None else '{}__isnull'.format(field.name):
+                                                value if value is not None else True}).order_by(pk.name)
+            res[value]['count'] = value_queryset.count()
+            end = offset + limit if limit else None
+            res[value]['rows'] = [OrderedDict(zip(names, row)) for row in
+                                  value_queryset.values_list(*[c.name for c in columns])[offset:end]]
+        return res
+
+    qn = connection.ops.quote_name
+    conditions, params = [], []
+    if not_null_values:
+        conditions.append('{} IN ({})'.format(qn(field.column), ', '.join(['%s'] * len(not_null_values))))
+        params += [field.get_db_prep_value(v, connection) for v in not_null_values]
+    if len(not_null_values) < len(values):
+        conditions.append('{} IS NULL'.format(qn(field.column)))
+
+    sql = 'SELECT * FROM (SELECT {columns}, {field} AS g3w_parent_value, ' \
+          'ROW_NUMBER() OVER (PARTITION BY {field} ORDER BY {pk}) AS g3w_row_number, ' \
+          'COUNT(*) OVER (PARTITION BY {field}) AS g3w_count ' \
+          'FROM {table} WHERE {conditions}) AS t WHERE g3w_row_number = 1 OR (g3w_row_number > %s{page_end})'.format(
+              columns=', '.join(qn(c) for c in names),
+              field=qn(field.column),
+              pk=qn(pk.column),
+              table=qn(queryset.model._meta.db_table),
+              conditions=' OR '.join(conditions),
+              page_end=' AND g3w_row_number <= %s' if limit else '')
+    params.append(offset)
+    if limit:
+        params.append(offset + limit)
+    sql += ' ORDER BY g3w_parent_value, g3w_row_number'
+
+    # first row of every value is always selected for total count, also when outside of page
+    # raw values to python, i.e. Spatialite dates and booleans
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for row in cursor.fetchall():
+            value = field.to_python(row[-3])
+            if value not in res:
+                continue
+            res[value]['count'] = row[-1]
+            if row[-2] > offset and (not limit or row[-2] <= offset + limit):
+                res[value]['rows'].append(OrderedDict((c.column, c.to_python(v))
+                                                      for c, v in zip(columns, row[:-3])))
+    return res
+
+
+@contextmanager
+def query_timeout(using, timeout):
+    """
+    Abort queries on connection lasting more than timeout seconds:
+    statement_timeout in a transaction on Postgres, progress handler on Sqlite.
+    Aborted queries raise django.db.OperationalError.
+    :param using: connection alias
+    :param timeout: seconds, None for no timeout
+    """
+    connection = connections[using]
+    if not timeout or connection.vendor not in ('postgresql', 'sqlite'):
+        yield
+        return
+
+    if connection.vendor == 'postgresql':
+        with transaction.atomic(using=using):
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL statement_timeout = %s', [int(timeout * 1000)])
+            yield
+        return
+
+    deadline = time.time() + timeout
+    connection.ensure_connection()
+    connection.connection.set_progress_handler(lambda: time.time() > deadline, SQLITE_PROGRESS_STEPS)
+    try:
+        yield
+    finally:
+        connection.connection.set_progress_handler(None, 0)
+
+
+def get_query_pool():
+    """
+    Thread pool for concurrent layers queries, settings.VECTOR_QUERY_THREADS threads for every process
+    """
+    global _query_pool
+    with _QUERY_POOL_LOCK:
+        if _query_pool is None:
+            _query_pool = ThreadPool(settings.VECTOR_QUERY_THREADS)
+    return _query_pool
+
+
+def _run_query_task(results, cancelled, key, func, args):
+    """
+    Run function in a pool thread: every thread has its own db connections,
+    reused between tasks until obsolete or broken like at request start and end.
+    Start time and then result are put in results queue.
+    """
+    if cancelled.is_set():
+        return
+    results.put((QUERY_TASK_STARTED, key, time.time(), None))
+    close_old_connections()
+    reset_routing()
+    try:
+        results.put((QUERY_TASK_DONE, key, func(*args), None))
+    except Exception as e:
+        results.put((QUERY_TASK_DONE, key, None, e))
+    finally:
+        close_old_connections()
+
+
+def run_concurrently(tasks, timeout=None):
+    """
+    Run functions (i.e. layers queries) concurrently on query pool, results are yielded as soon as
+    every function returns. Tasks not started yet are cancelled when generator is closed.
+    :param tasks: list of tuples (key, function, args)
+    :param timeout: max seconds of every task, from its start in pool thread, None for no timeout:
+    tasks running longer are yielded with a multiprocessing.TimeoutError, their results are discarded
+    :return: generator of tuples (key, result, exception)
+    """
+    results = queue.Queue()
+    cancelled = threading.Event()
+    pool = get_query_pool()
+    for key, func, args in tasks:
+        pool.apply_async(_run_query_task, (results, cancelled, key, func, args))
+
+    pending = set(key for key, func, args in tasks)
+
+    # start time of running tasks
+    started = dict()
+    try:
+        while pending:
+            wait = None
+            if timeout is not None and started:
+                wait = max(0, min(started.values()) + timeout - time.time())
+            try:
+                event, key, result, error = results.get(timeout=wait)
+            except queue.Empty:
+                now = time.time()
+                for key in [k for k, t in started.items() if t + timeout <= now]:
+                    del started[key]
+                    pending.discard(key)
+                    yield key, None, TimeoutError('Query timeout')
+                continue
+
+            if key not in pending:
+                continue
+            if event == QUERY_TASK_STARTED:
+                started[key] = result
+                continue
+            started.pop(key, None)
+            pending.discard(key)
+            yield key, result, error
+    finally:
+        cancelled.set()
@@ -0,0 +1,331 @@
+"""
+Safe filter expressions for vector layers, compiled to django Q objects.
+
+Grammar (keywords are case insensitive):
+
+    expression := term (OR term)*
+    term       := factor (AND factor)*
+    factor     := NOT factor | '(' expression ')' | predicate
+    predicate  := field ('=' | '!=' | '<>' | '<' | '<=' | '>' | '>=') value
+                | field [NOT] IN '(' value (',' value)* ')'
+                | field [NOT] LIKE | ILIKE string
+                | field IS [NOT] NULL
+                | spatial_function '(' field ',' string [',' number] ')'
+    field      := name | "quoted name"
+    value      := 'string' | number | TRUE | FALSE
+
+Geometry strings of spatial functions are WKT, EWKT or GeoJSON.
+Example: name ILIKE 'via%' AND (type IN (1, 2) OR code IS NULL) AND INTERSECTS(geom, 'POINT(10 44)')
+"""
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.geos import GEOSGeometry, GEOSException
+from django.contrib.gis.gdal import OGRException, GDALException
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.translation import ugettext as _
+import re
+
+# max length of expression string, max number of predicates and max nesting of parentheses and NOT
+MAX_EXPRESSION_LENGTH = 10000
+MAX_PREDICATES = 100
+MAX_NESTING = 32
+
+COMPARISON_LOOKUPS = {
+    '=': 'exact',
+    '<': 'lt',
+    '<=': 'lte',
+    '>': 'gt',
+    '>=': 'gte',
+}
+
+# spatial function: geodjango lookup
+SPATIAL_LOOKUPS = {
+    'INTERSECTS': 'intersects',
+    'CONTAINS': 'contains',
+    'WITHIN': 'within',
+    'DISJOINT': 'disjoint',
+    'TOUCHES': 'touches',
+    'CROSSES': 'crosses',
+    'OVERLAPS': 'overlaps',
+    'EQUALS': 'equals',
+    'DWITHIN': 'dwithin',
+}
+
+KEYWORDS = ('AND', 'OR', 'NOT', 'IN', 'LIKE', 'ILIKE', 'IS', 'NULL', 'TRUE', 'FALSE')
+
+TOKEN_RE = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<number>-?\d+(\.\d*)?([eE][-+]?\d+)?)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")+")
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op><=|>=|<>|!=|=|<|>)
+  | (?P<punct>[(),])
+""", re.VERBOSE | re.UNICODE)
+
+
+class FilterExpressionError(Exception):
+    """
+    Invalid filter expression
+    """
+    pass
+
+
+def tokenize(expression):
+    """
+    Split expression in (type, value) tokens
+    :param expression: string
+    :return: list of tuples
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise FilterExpressionError(_('Filter expression too long'))
+
+    tokens = []
+    position = 0
+    while position < len(expression):
+        match = TOKEN_RE.match(expression, position)
+        if not match:
+            raise FilterExpressionError(_('Invalid character at position {}').format(position))
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'space':
+            continue
+        if kind == 'string':
+            value = value[1:-1].replace("''", "'")
+        elif kind == 'quoted':
+            kind, value = 'field', value[1:-1].replace('""', '"')
+        elif kind == 'name':
+            if value.upper() in KEYWORDS or value.upper() in SPATIAL_LOOKUPS:
+                kind, value = 'keyword', value.upper()
+            else:
+                kind = 'field'
+        tokens.append((kind, value))
+    return tokens
+
+
+def like_lookup(pattern, insensitive=False):
+    """
+    Translate SQL LIKE pattern to django lookup and value, using
+    exact/startswith/endswith/contains where possible (they can use indexes) else regex
+    :return: tuple (lookup, value)
+    """
+    prefix = 'i' if insensitive else ''
+    body = pattern.strip('%')
+    if '_' not in pattern and '%' not in body:
+        starts, ends = pattern.startswith('%'), pattern.endswith('%') and len(pattern) > 1
+        if starts and ends:
+            return prefix + 'contains', body
+        if ends:
+            return prefix + 'startswith', body
+        if starts:
+            return prefix + 'endswith', body
+        return prefix + 'exact', body
+
+    regex = ''.join('.*' if c == '%' else '.' if c == '_' else re.escape(c) for c in pattern)
+    return prefix + 'regex', '^{}$'.format(regex)
+
+
+class FilterExpressionCompiler(object):
+    """
+    Recursive descent parser compiling filter expression to Q object,
+    fields and values are validated against model fields
+    :param model: django model
+    :param excluded_fields: list of model fields names not usable in expression
+    :param srid: srid of geometries in expression without srid
+    :param layer_srid: srid of model geometries, expression geometries are transformed to it
+    """
+
+    def __init__(self, model, excluded_fields=None, srid=None, layer_srid=None):
+        self.model = model
+        self.excluded_fields = set(excluded_fields or [])
+        self.srid = srid
+        self.layer_srid = layer_srid
+
+        # fields by name and column
+        self.fields = dict()
+        for f in model._meta.concrete_fields:
+            if f.name not in self.excluded_fields or f.primary_key:
+                self.fields[f.name] = f
+                self.fields[f.column] = f
+
+    def compile(self, expression):
+        """
+        :param expression: filter expression string
+        :return: Q object
+        """
+        self.tokens = tokenize(expression)
+        self.position = 0
+        self.predicates = 0
+        self.depth = 0
+        if not self.tokens:
+            return Q()
+        q = self.parse_expression()
+        if self.position < len(self.tokens):
+            raise FilterExpressionError(_('Unexpected token: {}').format(self.tokens[self.position][1]))
+        return q
+
+    # tokens navigation
+    # ------------------------------------------
+    def peek(self, kind=None, value=None):
+        if self.position >= len(self.tokens):
+            return None
+        token = self.tokens[self.position]
+        if (kind and token[0] != kind) or (value and token[1] != value):
+            return None
+        return token
+
+    def accept(self, kind=None, value=None):
+        token = self.peek(kind, value)
+        if token:
+            self.position += 1
+        return token
+
+    def expect(self, kind=None, value=None):
+        token = self.accept(kind, value)
+        if not token:
+            found = self.tokens[self.position][1] if self.position < len(self.tokens) else _('end of expression')
+            raise FilterExpressionError(_('Expected {}, found {}').format(value or kind, found))
+        return token
+
+    # grammar
+    # ------------------------------------------
+    def parse_expression(self):
+        q = self.parse_term()
+        while self.accept('keyword', 'OR'):
+            q = q | self.parse_term()
+        return q
+
+    def parse_term(self):
+        q = self.parse_factor()
+        while self.accept('keyword', 'AND'):
+            q = q & self.parse_factor()
+        return q
+
+    def parse_factor(self):
+        if self.peek('keyword', 'NOT') or self.peek('punct', '('):
+            self.depth += 1
+            if self.depth > MAX_NESTING:
+                raise FilterExpressionError(_('Too many nested conditions in filter expression'))
+            if self.accept('keyword', 'NOT'):
+                q = ~self.parse_factor()
+            else:
+                self.accept('punct', '(')
+                q = self.parse_expression()
+                self.expect('punct', ')')
+            self.depth -= 1
+            return q
+
+        self.predicates += 1
+        if self.predicates > MAX_PREDICATES:
+            raise FilterExpressionError(_('Too many conditions in filter expression'))
+
+        token = self.peek('keyword')
+        if token and token[1] in SPATIAL_LOOKUPS:
+            return self.parse_spatial()
+        return self.parse_predicate()
+
+    def parse_predicate(self):
+        field = self.get_field(self.expect('field')[1])
+        if isinstance(field, GeometryField):
+            raise FilterExpressionError(_('Use spatial functions for geometry field {}').format(field.name))
+
+        if self.accept('keyword', 'IS'):
+            negate = bool(self.accept('keyword', 'NOT'))
+            self.expect('keyword', 'NULL')
+            q = Q(**{'{}__isnull'.format(field.name): True})
+            return ~q if negate else q
+
+        negate = bool(self.accept('keyword', 'NOT'))
+
+        if self.accept('keyword', 'IN'):
+            self.expect('punct', '(')
+            values = [self.parse_value(field)]
+            while self.accept('punct', ','):
+                values.append(self.parse_value(field))
+            self.expect('punct', ')')
+            q = Q(**{'{}__in'.format(field.name): values})
+            return ~q if negate else q
+
+        like = self.accept('keyword', 'LIKE') or self.accept('keyword', 'ILIKE')
+        if like:
+            lookup, value = like_lookup(self.expect('string')[1], insensitive=like[1] == 'ILIKE')
+            q = Q(**{'{}__{}'.format(field.name, lookup): value})
+            return ~q if negate else q
+
+        if negate:
+            raise FilterExpressionError(_('Expected IN, LIKE or ILIKE after NOT'))
+
+        operator = self.expect('op')[1]
+        value = self.parse_value(field)
+        if operator in ('!=', '<>'):
+            return ~Q(**{field.name: value})
+        return Q(**{'{}__{}'.format(field.name, COMPARISON_LOOKUPS[operator]): value})
+
+    def parse_spatial(self):
+        function = self.expect('keyword')[1]
+        self.expect('punct', '(')
+        field = self.get_field(self.expect('field')[1])
+        if not isinstance(field, GeometryField):
+            raise FilterExpressionError(_('Field {} is not a geometry field').format(field.name))
+        self.expect('punct', ',')
+        geometry = self.parse_geometry(self.expect('string')[1])
+
+        if function == 'DWITHIN':
+            self.expect('punct', ',')
+            distance = float(self.expect('number')[1])
+            self.expect('punct', ')')
+            return Q(**{'{}__dwithin'.format(field.name): (geometry, distance)})
+
+        self.expect('punct', ')')
+        return Q(**{'{}__{}'.format(field.name, SPATIAL_LOOKUPS[function]): geometry})
+
+    # values
+    # ------------------------------------------
+    def get_field(self, name):
+        if name not in self.fields:
+            raise FilterExpressionError(_('Field not in layer: {}').format(name))
+        return self.fields[name]
+
+    def parse_value(self, field):
+        token = self.accept('string') or self.accept('number') or self.accept('keyword', 'TRUE') or \
+                self.accept('keyword', 'FALSE')
+        if not token:
+            raise FilterExpressionError(_('Expected value for field {}').format(field.name))
+
+        value = token[1]
+        if token[0] == 'keyword':
+            value = token[1] == 'TRUE'
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            raise FilterExpressionError(_('Invalid value for field {}: {}').format(field.name, token[1]))
+
+    def parse_geometry(self, value):
+        try:
+            geometry = GEOSGeometry(value)
+        except (ValueError, GEOSException, OGRException):
+            raise FilterExpressionError(_('Invalid geometry: {}').format(value[:50]))
+
+        if not geometry.srid:
+            geometry.srid = self.srid or self.layer_srid
+        if self.layer_srid and geometry.srid and geometry.srid != self.layer_srid:
+            try:
+                geometry.transform(self.layer_srid)
+            except (GEOSException, GDALException):
+                raise FilterExpressionError(_('Invalid geometry srid: {}').format(geometry.srid))
+        return geometry
+
+
+def compile_filter_expression(expression, model, excluded_fields=None, srid=None, layer_srid=None):
+    """
+    Compile filter expression to Q object for model queryset
+    :param expression: filter expression string
+    :param model: django model
+    :param excluded_fields: list of model fields names not usable in expression
+    :param srid: srid of geometries in expression without srid
+    :param layer_srid: srid of model geometries
+    :return: Q object
+    """
+    return FilterExpressionCompiler(model, excluded_fields=excluded_fields, srid=srid,
+                                    layer_srid=layer_srid).compile(expression)
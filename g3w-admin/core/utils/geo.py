@@ -1,4 +1,15 @@
 from pyproj import Proj, transform
+from itertools import izip
+from numbers import Number
+import numpy as np
+
+# meters of one degree at equator
+DEGREE_METERS = 111319.49079327357
+
+# cache of pyproj Proj by srid and of Proj couples by (from srid, to srid)
+_PROJS = dict()
+_TRANSFORMERS = dict()
+
 
 def TransformBBox(epsgFrom, epsgTo, BBox):
 
@@ -26,3 +37,236 @@ def camel_geometry_type(geometry_type):
     }
 
     return trans[geometry_type.lower()]
+
+
+def get_proj(srid):
+    """
+    Return cached pyproj Proj object for srid, built from G3WSpatialRefSys proj4text
+    :param srid: integer
+    :return: Proj instance
+    """
+    srid = int(srid)
+    if srid not in _PROJS:
+        from core.models import G3WSpatialRefSys
+        _PROJS[srid] = Proj(str(G3WSpatialRefSys.objects.get(srid=srid).proj4text))
+    return _PROJS[srid]
+
+
+def get_transformer(from_srid, to_srid):
+    """
+    Return cached pyproj Proj objects couple for srids, built from G3WSpatialRefSys proj4text
+    :param from_srid: integer
+    :param to_srid: integer
+    :return: tuple (Proj from, Proj to)
+    """
+    key = (int(from_srid), int(to_srid))
+    if key not in _TRANSFORMERS:
+        _TRANSFORMERS[key] = (get_proj(key[0]), get_proj(key[1]))
+    return _TRANSFORMERS[key]
+
+
+def is_geographic(srid):
+    """
+    Check if srid has geographic coordinates (degrees)
+    :param srid: integer
+    :return: boolean
+    """
+    return get_proj(srid).is_latlong()
+
+
+def transform_length(length, from_srid, to_srid, x=None, y=None):
+    """
+    Convert a length from srid units to another srid units, measuring it in x,y position if given
+    else by units conversion at equator
+    :param length: float
+    :param from_srid: integer
+    :param to_srid: integer
+    :param x: float, position x in from_srid
+    :param y: float, position y in from_srid
+    :return: float
+    """
+    if x is not None and y is not None:
+        from_proj, to_proj = get_transformer(from_srid, to_srid)
+        xs, ys = transform(from_proj, to_proj, [x, x + length], [y, y])
+        return float(np.hypot(xs[1] - xs[0], ys[1] - ys[0]))
+
+    from_geographic, to_geographic = is_geographic(from_srid), is_geographic(to_srid)
+    if from_geographic and not to_geographic:
+        return length * DEGREE_METERS
+    elif to_geographic and not from_geographic:
+        return length / DEGREE_METERS
+    return length
+
+
+def _collect_positions(coordinates, positions):
+    """
+    Walk GeoJSON coordinates array, append every position to positions list
+    and return coordinates rebuilt with mutable positions
+    """
+    if len(coordinates) and isinstance(coordinates[0], Number):
+        position = list(coordinates)
+        positions.append(position)
+        return position
+    return [_collect_positions(c, positions) for c in coordinates]
+
+
+def collect_geometry_positions(geometry, positions):
+    """
+    Collect GeoJSON geometry positions into positions list
+    :param geometry: GeoJSON geometry dict
+    :param positions: list
+    """
+    if not geometry:
+        return
+    if geometry['type'] == 'GeometryCollection':
+        for g in geometry['geometries']:
+            collect_geometry_positions(g, positions)
+    else:
+        geometry['coordinates'] = _collect_positions(geometry['coordinates'], positions)
+
+
+def transform_geometries(geometries, from_srid, to_srid):
+    """
+    Reproject in place GeoJSON geometries with one vectorized transformation call
+    :param geometries: iterable of GeoJSON geometry dicts
+    :param from_srid: integer
+    :param to_srid: integer
+    """
+    positions = list()
+    for geometry in geometries:
+        collect_geometry_positions(geometry, positions)
+
+    if not positions:
+        return
+
+    n = len(positions)
+    xs = np.fromiter((p[0] for p in positions), dtype=np.float64, count=n)
+    ys = np.fromiter((p[1] for p in positions), dtype=np.float64, count=n)
+
+    from_proj, to_proj = get_transformer(from_srid, to_srid)
+    xs, ys = transform(from_proj, to_proj, xs, ys)
+
+    for position, x, y in izip(positions, xs.tolist(), ys.tolist()):
+        position[0] = x
+        position[1] = y
+
+
+def transform_featurecollection(featurecollection, from_srid, to_srid):
+    """
+    Reproject in place every feature geometry of a GeoJSON FeatureCollection
+    :param featurecollection: GeoJSON FeatureCollection dict
+    :param from_srid: integer
+    :param to_srid: integer
+    """
+    transform_geometries((f.get('geometry') for f in featurecollection['features']), from_srid, to_srid)
+
+
+def round_featurecollection(featurecollection, precision):
+    """
+    Round in place x,y coordinates of every feature geometry to precision decimal digits
+    :param featurecollection: GeoJSON FeatureCollection dict
+    :param precision: integer, number of decimal digits
+    """
+    positions = list()
+    for feature in featurecollection['features']:
+        collect_geometry_positions(feature.get('geometry'), positions)
+
+    if not positions:
+        return
+
+    n = len(positions)
+    xs = np.round(np.fromiter((p[0] for p in positions), dtype=np.float64, count=n), precision)
+    ys = np.round(np.fromiter((p[1] for p in positions), dtype=np.float64, count=n), precision)
+
+    for position, x, y in izip(positions, xs.tolist(), ys.tolist()):
+        position[0] = x
+        position[1] = y
+
+
+def _quantize_coordinates(coordinates, translate, scale, delta):
+    """
+    Quantize GeoJSON coordinates array, positions arrays are delta encoded if delta is True
+    """
+    if not len(coordinates):
+        return coordinates
+
+    if isinstance(coordinates[0], Number):
+        return [int(round((coordinates[0] - translate[0]) / scale[0])),
+                int(round((coordinates[1] - translate[1]) / scale[1]))] + list(coordinates[2:])
+
+    if delta and len(coordinates[0]) and isinstance(coordinates[0][0], Number):
+        quantized = []
+        px = py = 0
+        for position in coordinates:
+            x = int(round((position[0] - translate[0]) / scale[0]))
+            y = int(round((position[1] - translate[1]) / scale[1]))
+            quantized.append([x - px, y - py] + list(position[2:]))
+            px, py = x, y
+        return quantized
+
+    return [_quantize_coordinates(c, translate, scale, delta) for c in coordinates]
+
+
+def _quantize_geometry(geometry, translate, scale):
+    if not geometry:
+        return
+    if geometry['type'] == 'GeometryCollection':
+        for g in geometry['geometries']:
+            _quantize_geometry(g, translate, scale)
+    else:
+        geometry['coordinates'] = _quantize_coordinates(geometry['coordinates'], translate, scale,
+                                                        geometry['type'] not in ('Point', 'MultiPoint'))
+
+
+def quantize_featurecollection(featurecollection, precision=None, quantization=1e6):
+    """
+    Quantize in place features geometries as TopoJSON: integer coordinates in a grid with origin
+    in collection bbox lower left corner, positions of lines and rings delta encoded.
+    Transform to decode positions (x = xq * scale[0] + translate[0]) is added to featurecollection.
+    :param featurecollection: GeoJSON FeatureCollection dict
+    :param precision: integer, grid step as decimal digits, if None grid is bbox divided by quantization
+    :param quantization: number of grid steps for bbox side, used when precision is None
+    """
+    positions = list()
+    for feature in featurecollection['features']:
+        collect_geometry_positions(feature.get('geometry'), positions)
+
+    if not positions:
+        return
+
+    n = len(positions)
+    xs = np.fromiter((p[0] for p in positions), dtype=np.float64, count=n)
+    ys = np.fromiter((p[1] for p in positions), dtype=np.float64, count=n)
+    translate = [float(xs.min()), float(ys.min())]
+
+    if precision is not None:
+        scale = [10.0 ** -precision, 10.0 ** -precision]
+    else:
+        scale = [float(xs.max() - translate[0]) / (quantization - 1) or 1.0,
+                 float(ys.max() - translate[1]) / (quantization - 1) or 1.0]
+
+    for feature in featurecollection['features']:
+        _quantize_geometry(feature.get('geometry'), translate, scale)
+
+    featurecollection['transform'] = {
+        'scale': scale,
+        'translate': translate
+    }
+
+
+# half side of EPSG:3857 world square
+WEB_MERCATOR_HALF_SIDE = 20037508.342789244
+
+
+def mercator_tile_bounds(z, x, y):
+    """
+    Bounds of a XYZ tile in EPSG:3857
+    :param z: zoom level
+    :param x: tile column, from west
+    :param y: tile row, from north
+    :return: tuple (xmin, ymin, xmax, ymax)
+    """
+    size = 2 * WEB_MERCATOR_HALF_SIDE / 2 ** z
+    xmin = -WEB_MERCATOR_HALF_SIDE + x * size
+    ymax = WEB_MERCATOR_HALF_SIDE - y * size
+    return xmin, ymax - size, xmin + size, ymax
@@ -11,7 +11,8 @@ import geoalchemy2.types as geotypes
 from sqlalchemy.dialects.postgresql import base as PGD
 from sqlalchemy.dialects.sqlite import base as SLD
 from osgeo import ogr
-from core.utils.db import build_django_connection, build_dango_connection_name
+from core.utils.db import build_django_connection, build_dango_connection_name, add_spatialite_connections, \
+    add_replica_connections, DatasourceQuerySet
 from core.utils.geo import camel_geometry_type
 from .structure import MAPPING_GEOALCHEMY_DJANGO_FIELDS, MAPPING_OGRWKBGTYPE, BooleanField, NullBooleanField
 
@@ -63,9 +64,9 @@ def create_model(name, fields=None, app_label='', module='', db='default', optio
     if fields:
         attrs.update(fields)
 
-    # add model manager default
+    # add model manager default, routing reads and writes of layer datasource
     if db != 'default':
-        attrs['objects'] = models.Manager()
+        attrs['objects'] = models.Manager.from_queryset(DatasourceQuerySet)()
         attrs['objects']._db = db
 
     # Create the class, which automatically triggers ModelBase processing
@@ -393,6 +394,8 @@ class PostgisCreateGeomodel(CreateGeomodel):
         if self.using not in connections.databases:
             connections.databases[self.using] = build_django_connection(self.datasource, schema=self.schema)
 
+        add_replica_connections(self.using, self.datasource, schema=self.schema)
+
 
 class SpatialiteCreateGeomodel(CreateGeomodel):
 
@@ -476,5 +479,5 @@ class SpatialiteCreateGeomodel(CreateGeomodel):
     def build_connection(self):
         self.using = build_dango_connection_name(self.datasource['dbname'])
 
-        if self.using not in connections.databases:
-            connections.databases[self.using] = build_django_connection(self.datasource, layer_type=self.layer_type)
+        # read and write connections, see core.utils.db
+        add_spatialite_connections(self.using, self.datasource)
@@ -0,0 +1,257 @@
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.utils.translation import ugettext as _
+from django.db.models.fields import CharField, TextField, IntegerField, BigIntegerField, SmallIntegerField, \
+    FloatField, DecimalField, AutoField
+from core.utils.expressions import like_lookup
+
+# fields types for text search
+TEXT_FIELDS = (CharField, TextField)
+
+# fields types for equality search when value is a number
+NUMERIC_FIELDS = (IntegerField, BigIntegerField, SmallIntegerField, AutoField, FloatField, DecimalField)
+
+# search widgets comparison operators: django lookup, negated
+SEARCH_FILTER_OPS = {
+    'eq': ('exact', False),
+    'ltgt': ('exact', True),
+    'gt': ('gt', False),
+    'gte': ('gte', False),
+    'lt': ('lt', False),
+    'lte': ('lte', False),
+    'lte=': ('lte', False),
+    'LIKE': (None, False),
+    'ILIKE': (None, False),
+}
+
+# suffix of search indexes and FTS5 tables names
+SEARCH_INDEX_SUFFIX = 'g3w_search'
+
+# cache of Spatialite FTS5 tables found
+_FTS_TABLES = set()
+
+
+def get_search_fields(model, columns):
+    """
+    Return model fields to use for indexed search
+    :param model: django model
+    :param columns: list of columns names marked searchable
+    :return: list of django model fields
+    """
+    return [f for f in model._meta.concrete_fields
+            if f.column in columns and isinstance(f, TEXT_FIELDS + NUMERIC_FIELDS)]
+
+
+def pg_trgm_index_name(table, column):
+    return '{}_{}_{}'.format(table, column, SEARCH_INDEX_SUFFIX)[:63]
+
+
+def fts_table_name(table):
+    return '{}_{}'.format(table, SEARCH_INDEX_SUFFIX)
+
+
+def _number(value):
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def indexed_search_queryset(queryset, columns, value):
+    """
+    Filter queryset by search value only on searchable columns:
+    Postgis: trigram GIN index on UPPER(column::text) is used by icontains lookup,
+    Spatialite: FTS5 table with MATCH on column tokens prefix
+    :param queryset: django queryset
+    :param columns: list of columns names marked searchable
+    :param value: search value
+    :return: filtered queryset
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    fields = get_search_fields(model, columns)
+    number = _number(value)
+
+    q = Q()
+    text_fields = []
+    for f in fields:
+        if isinstance(f, TEXT_FIELDS):
+            text_fields.append(f)
+        elif number is not None:
+            if isinstance(f, (FloatField, DecimalField)):
+                q |= Q(**{f.name: number})
+            elif number.is_integer():
+                q |= Q(**{f.name: int(number)})
+
+    if connection.vendor == 'sqlite' and text_fields and has_fts_table(connection, model._meta.db_table):
+        q |= Q(pk__in=fts_match_queryset(model, queryset.db, fts_prefix_match(value)).values('pk'))
+    else:
+        for f in text_fields:
+            q |= Q(**{'{}__icontains'.format(f.name): value})
+
+    if q == Q():
+        return queryset.none()
+    return queryset.filter(q)
+
+
+def fts_prefix_match(value, column=None):
+    """
+    FTS5 MATCH expression for tokens starting with value, optionally only in column
+    """
+    match = '"{}"*'.format(value.replace('"', '""'))
+    return '"{}" : {}'.format(column.replace('"', '""'), match) if column else match
+
+
+def fts_match_queryset(model, using, match):
+    """
+    Model rows matching FTS5 expression on Spatialite search table of model
+    """
+    connection = connections[using]
+    fts = connection.ops.quote_name(fts_table_name(model._meta.db_table))
+    where = '{} IN (SELECT rowid FROM {} WHERE {} MATCH %s)'.format(
+        connection.ops.quote_name(model._meta.pk.column), fts, fts)
+    return model._default_manager.db_manager(using).extra(where=[where], params=[match])
+
+
+def has_fts_table(connection, table):
+    """
+    Check if Spatialite FTS5 search table exists
+    """
+    key = (connection.alias, table)
+    if key not in _FTS_TABLES:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [fts_table_name(table)])
+            if cursor.fetchone():
+                _FTS_TABLES.add(key)
+    return key in _FTS_TABLES
+
+
+def search_index_statements(model, columns, connection):
+    """
+    Build SQL statements to create search indexes for model searchable columns
+    :return: list of SQL strings
+    """
+    table = model._meta.db_table
+    qn = connection.ops.quote_name
+    text_columns = [f.column for f in get_search_fields(model, columns) if isinstance(f, TEXT_FIELDS)]
+    if not text_columns:
+        return []
+
+    if connection.vendor == 'postgresql':
+        statements = ['CREATE EXTENSION IF NOT EXISTS pg_trgm']
+        for column in text_columns:
+            statements.append('CREATE INDEX IF NOT EXISTS {} ON {} USING gin ((UPPER({}::text)) gin_trgm_ops)'.format(
+                qn(pg_trgm_index_name(table, column)), qn(table), qn(column)))
+        return statements
+
+    # Spatialite: external content FTS5 table kept in sync by triggers
+    fts = fts_table_name(table)
+    pk = qn(model._meta.pk.column)
+    fts_columns = ', '.join(qn(c) for c in text_columns)
+    new_values = ', '.join('new.{}'.format(qn(c)) for c in text_columns)
+    old_values = ', '.join('old.{}'.format(qn(c)) for c in text_columns)
+    return [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS {} USING fts5({}, content={}, content_rowid={})'.format(
+            qn(fts), fts_columns, qn(table), pk),
+        'CREATE TRIGGER IF NOT EXISTS {} AFTER INSERT ON {} BEGIN '
+        'INSERT INTO {}(rowid, {}) VALUES (new.{}, {}); END'.format(
+            qn(fts + '_ai'), qn(table), qn(fts), fts_columns, pk, new_values),
+        'CREATE TRIGGER IF NOT EXISTS {} AFTER DELETE ON {} BEGIN '
+        'INSERT INTO {}({}, rowid, {}) VALUES (\'delete\', old.{}, {}); END'.format(
+            qn(fts + '_ad'), qn(table), qn(fts), qn(fts), fts_columns, pk, old_values),
+        'CREATE TRIGGER IF NOT EXISTS {} AFTER UPDATE ON {} BEGIN '
+        'INSERT INTO {}({}, rowid, {}) VALUES (\'delete\', old.{}, {}); '
+        'INSERT INTO {}(rowid, {}) VALUES (new.{}, {}); END'.format(
+            qn(fts + '_au'), qn(table), qn(fts), qn(fts), fts_columns, pk, old_values,
+            qn(fts), fts_columns, pk, new_values),
+        'INSERT INTO {}({}) VALUES (\'rebuild\')'.format(qn(fts), qn(fts))
+    ]
+
+
+def missing_search_indexes(model, columns, connection):
+    """
+    Return names of search indexes/FTS tables not yet created for model searchable columns
+    :return: list of strings
+    """
+    table = model._meta.db_table
+    text_columns = [f.column for f in get_search_fields(model, columns) if isinstance(f, TEXT_FIELDS)]
+    if not text_columns:
+        return []
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            missing = []
+            for column in text_columns:
+                cursor.execute('SELECT 1 FROM pg_indexes WHERE indexname = %s', [pg_trgm_index_name(table, column)])
+                if not cursor.fetchone():
+                    missing.append(pg_trgm_index_name(table, column))
+            return missing
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [fts_table_name(table)])
+        return [] if cursor.fetchone() else [fts_table_name(table)]
+
+
+def search_filter_q(model, filters):
+    """
+    Compile search widget filters to Q object, every filter in AND.
+    LIKE/ILIKE values without % are searched as substrings (icontains is indexed by trigram indexes on Postgis)
+    :param model: django model
+    :param filters: list of tuples (operator, column name, value), see SEARCH_FILTER_OPS
+    :return: Q object
+    :raise ValidationError: for invalid operator, field or value
+    """
+    fields = {f.column: f for f in model._meta.concrete_fields}
+    q = Q()
+    for op, column, value in filters:
+        if op not in SEARCH_FILTER_OPS:
+            raise ValidationError(_('Invalid search operator: {}').format(op))
+        if column not in fields:
+            raise ValidationError(_('Field not in layer: {}').format(column))
+        field = fields[column]
+
+        lookup, negate = SEARCH_FILTER_OPS[op]
+        if lookup is None:
+            pattern = value if '%' in value else '%{}%'.format(value)
+            lookup, value = like_lookup(pattern, insensitive=op == 'ILIKE')
+        else:
+            value = field.to_python(value)
+
+        condition = Q(**{'{}__{}'.format(field.name, lookup): value})
+        q &= ~condition if negate else condition
+    return q
+
+
+def autocomplete_values(queryset, field, value, limit):
+    """
+    Top distinct values of field for autocomplete: values starting with value first, then values containing it.
+    Every query is limited and uses search indexes: trigram index on Postgis (LIKE on UPPER(column::text)),
+    FTS5 token prefix pre filter on Spatialite.
+    :param queryset: django queryset
+    :param field: django model field
+    :param value: text typed by user, empty for first values
+    :param limit: max number of values
+    :return: list of values
+    """
+    connection = connections[queryset.db]
+    queryset = queryset.exclude(**{'{}__isnull'.format(field.name): True}).order_by()
+
+    if not value:
+        return list(queryset.order_by(field.name).values_list(field.name, flat=True).distinct()[:limit])
+
+    if connection.vendor == 'sqlite' and isinstance(field, TEXT_FIELDS) and \
+            has_fts_table(connection, queryset.model._meta.db_table):
+        fts_pks = fts_match_queryset(queryset.model, queryset.db, fts_prefix_match(value, field.column))
+        prefix_queryset = queryset.filter(pk__in=fts_pks.values('pk'))
+    else:
+        prefix_queryset = queryset
+
+    values = []
+    for qs, lookup in ((prefix_queryset, 'istartswith'), (queryset, 'icontains')):
+        qs = qs.filter(**{'{}__{}'.format(field.name, lookup): value})
+        if values:
+            qs = qs.exclude(**{'{}__in'.format(field.name): values})
+        values += list(qs.order_by(field.name).values_list(field.name, flat=True).distinct()[:limit - len(values)])
+        if len(values) >= limit:
+            break
+    return values
@@ -0,0 +1,142 @@
+"""
+Vector layer statistics: features count, extent and columns min/max/distinct values and
+histograms of numeric columns, from db planner statistics where available.
+"""
+from django.conf import settings
+from django.db import connections, transaction, DatabaseError
+from django.db.models import Min, Max, Count
+from django.db.models.fields import BooleanField, NullBooleanField, BinaryField
+from django.contrib.gis.db.models import GeometryField, Extent
+from core.utils.db import estimate_queryset_count
+from core.utils.search import NUMERIC_FIELDS
+import numpy as np
+
+
+def estimated_extent(queryset, geometry_field):
+    """
+    Extent from db statistics: ST_EstimatedExtent on Postgis, geometry_columns_statistics on Spatialite
+    :return: list [xmin, ymin, xmax, ymax] or None if statistics are not available
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    column = queryset.model._meta.get_field(geometry_field).column
+
+    try:
+        with transaction.atomic(using=queryset.db), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT ST_XMin(e), ST_YMin(e), ST_XMax(e), ST_YMax(e) '
+                               'FROM (SELECT ST_EstimatedExtent(%s, %s) AS e) AS t', [table, column])
+            else:
+                cursor.execute('SELECT extent_min_x, extent_min_y, extent_max_x, extent_max_y '
+                               'FROM geometry_columns_statistics WHERE Lower(f_table_name) = Lower(%s) '
+                               'AND Lower(f_geometry_column) = Lower(%s)', [table, column])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+
+    if not row or None in row:
+        return None
+    return [float(v) for v in row]
+
+
+def _distinct_statistics(queryset, count):
+    """
+    Distinct values counts from Postgres planner statistics (pg_stats)
+    :return: dict, column: distinct count
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or not count:
+        return {}
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT attname, n_distinct FROM pg_stats WHERE tablename = %s',
+                       [queryset.model._meta.db_table])
+        rows = cursor.fetchall()
+
+    # negative n_distinct is ratio of rows
+    return {column: int(round(n if n >= 0 else -n * count)) for column, n in rows}
+
+
+def sample_values(queryset, fields, count, size):
+    """
+    Random sample of about size rows of fields values
+    :return: list of tuples
+    """
+    queryset = queryset.order_by()
+    if count and count > size:
+        fraction = float(size) / count
+        if connections[queryset.db].vendor == 'postgresql':
+            queryset = queryset.extra(where=['random() < %s'], params=[fraction])
+        else:
+            queryset = queryset.extra(where=['(abs(random()) %% 1000000) < %s'], params=[int(fraction * 1000000)])
+    return list(queryset.values_list(*[f.name for f in fields])[:size])
+
+
+def histogram(values, bins):
+    """
+    NumPy histogram of not null values
+    :return: dict with bins edges and counts, None if no values
+    """
+    values = np.array([v for v in values if v is not None], dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if not values.size:
+        return None
+    counts, edges = np.histogram(values, bins=bins)
+    return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+
+def layer_statistics(queryset, geometry_field=None, excluded_fields=None, exact=False):
+    """
+    Statistics of vector layer queryset
+    :param queryset: layer queryset
+    :param geometry_field: name of geometry field, None for no geometry layers
+    :param excluded_fields: fields names not to compute statistics for
+    :param exact: if True count and extent are computed from data, not from db statistics
+    :return: dict
+    """
+    model = queryset.model
+    excluded_fields = excluded_fields or []
+    queryset = queryset.order_by()
+
+    count = None if exact else estimate_queryset_count(queryset)
+    stats = {'count_estimated': count is not None}
+    stats['count'] = count if count is not None else queryset.count()
+
+    if geometry_field:
+        extent = None if exact else estimated_extent(queryset, geometry_field)
+        stats['extent_estimated'] = extent is not None
+        if extent is None:
+            extent = queryset.aggregate(g3w_extent=Extent(geometry_field))['g3w_extent']
+        stats['extent'] = list(extent) if extent else None
+
+    fields = [f for f in model._meta.concrete_fields if f.name not in excluded_fields and
+              not isinstance(f, (GeometryField, BinaryField))]
+    distincts = {} if exact else _distinct_statistics(queryset, stats['count'])
+
+    # min, max and missing distinct counts in one query
+    aggregates = {}
+    for n, f in enumerate(fields):
+        if not isinstance(f, (BooleanField, NullBooleanField)):
+            aggregates['min_{}'.format(n)] = Min(f.name)
+            aggregates['max_{}'.format(n)] = Max(f.name)
+        if f.column not in distincts:
+            aggregates['distinct_{}'.format(n)] = Count(f.name, distinct=True)
+    values = queryset.aggregate(**aggregates) if aggregates else {}
+
+    numeric_fields = [f for f in fields if isinstance(f, NUMERIC_FIELDS)]
+    samples = sample_values(queryset, numeric_fields, stats['count'], settings.VECTOR_STATS_SAMPLE_SIZE) \
+        if numeric_fields else []
+
+    stats['columns'] = {}
+    for n, f in enumerate(fields):
+        column = {
+            'min': values.get('min_{}'.format(n)),
+            'max': values.get('max_{}'.format(n)),
+            'distinct': distincts[f.column] if f.column in distincts else values['distinct_{}'.format(n)]
+        }
+        if f in numeric_fields:
+            i = numeric_fields.index(f)
+            column['histogram'] = histogram([row[i] for row in samples], settings.VECTOR_STATS_HISTOGRAM_BINS)
+        stats['columns'][f.column] = column
+
+    return stats
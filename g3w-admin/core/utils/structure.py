@@ -221,7 +221,7 @@ def mapLayerAttributes(layer, formField=False, **kwargs):
     layer_type = getattr(layer, 'layer_type')
     mappingData = FIELD_TYPES_MAPPING.get(layer_type, FIELD_TYPES_MAPPING['default'])
 
-    fields = eval(layer.database_columns) if layer.database_columns else None
+    fields = layer.get_parsed('database_columns')
     fieldsMapped = deepcopy(fields)
 
     # exlude if set:
@@ -353,12 +353,21 @@ class APIVectorLayerStructure(object):
 
         self.format = kwargs.get('type', self._format)
         self.count = kwargs.get('count', None)
+        self.countApproximate = kwargs.get('countApproximate', None)
+        self.simplifyTolerance = kwargs.get('simplifyTolerance', None)
+        self.precision = kwargs.get('precision', None)
+        self.geometryEncoding = kwargs.get('geometryEncoding', None)
         self.pkField = kwargs.get('pkField', self._pkField)
         self.data = kwargs.get('data', self._data)
         self.featureLocks = kwargs.get('featureLocks', self._featureLocks)
         self.geometryType = kwargs.get('geomentryType', self._geomentryType)
         self.fields = kwargs.get('fields', self._fields)
 
+        # cursors for keyset pagination
+        self.cursors = 'next' in kwargs or 'previous' in kwargs
+        self.next = kwargs.get('next', None)
+        self.previous = kwargs.get('previous', None)
+
     def setPkField(self, pkField):
         self._pkField = pkField
 
@@ -378,6 +387,10 @@ class APIVectorLayerStructure(object):
                 'format': self.format,
                 'pk': self.pkField,
                 'count': self.count,
+                'count_approximate': self.countApproximate,
+                'simplify_tolerance': self.simplifyTolerance,
+                'precision': self.precision,
+                'geometry_encoding': self.geometryEncoding,
                 'data': self.data,
                 'geometrytype': self.geometryType,
                 'fields': self.fields,
@@ -385,4 +398,10 @@ class APIVectorLayerStructure(object):
             'featurelocks': self.featureLocks,
         }
 
-        return res
\ No newline at end of file
+        if self.cursors:
+            res['vector'].update({
+                'next': self.next,
+                'previous': self.previous
+            })
+
+        return res
@@ -13,7 +13,7 @@ class ProjectRelationPermission(BasePermission):
     def has_permission(self, request, view):
 
         # get model by type
-        func, args, kwargs = resolve(request.get_full_path())
+        func, args, kwargs = resolve(request.path_info)
         project = Project.objects.get(pk=kwargs['project_id'])
         return request.user.has_perm('qdjango.view_project', project) or \
             get_anonymous_user().has_perm('qdjango.view_project', project)
@@ -1,6 +1,7 @@
 from django.http.request import QueryDict
 from django.conf import settings
 from django.core.cache import cache
+from django.core.urlresolvers import reverse
 from rest_framework import serializers
 from rest_framework_gis import serializers as geo_serializers
 from rest_framework.fields import empty
@@ -13,9 +14,10 @@ from qdjango.utils.data import QgisProjectSettingsWMS, QGIS_LAYER_TYPE_NO_GEOM
 from qdjango.ows import OWSRequestHandler
 from qdjango.signals import load_qdjango_widget_layer
 from core.utils.structure import mapLayerAttributes
+from core.utils.data import load_text_data
 from core.configs import *
 from core.signals import after_serialized_project_layer
-from core.api.serializers import update_serializer_data, G3WSerializerMixin
+from core.api.serializers import update_serializer_data, G3WSerializerMixin, G3WGeometryField
 from core.utils.models import get_geometry_column, create_geomodel_from_qdjango_layer
 from core.utils.structure import RELATIONS_ONE_TO_MANY, RELATIONS_ONE_TO_ONE
 from core.models import G3WSpatialRefSys
@@ -30,7 +32,7 @@ class ProjectSerializer(serializers.ModelSerializer):
     layerstree = serializers.SerializerMethodField()
 
     def get_layerstree(self, instance):
-        return eval(instance.layers_tree)
+        return instance.get_parsed('layers_tree')
 
     def get_qgis_projectsettings_wms(self, instance):
         """
@@ -62,9 +64,9 @@ class ProjectSerializer(serializers.ModelSerializer):
         """
 
         if instance.max_extent:
-            extent = eval(instance.max_extent)
+            extent = instance.get_parsed('max_extent')
         else:
-            extent = eval(instance.initial_extent)
+            extent = instance.get_parsed('initial_extent')
 
         init_map_extent = [
             float(extent['xmin']),
@@ -74,7 +76,7 @@ class ProjectSerializer(serializers.ModelSerializer):
         ]
 
         if instance.max_extent:
-            max_extent = eval(instance.max_extent)
+            max_extent = instance.get_parsed('max_extent')
             map_extent = [
                 float(max_extent['xmin']),
                 float(max_extent['ymin']),
@@ -94,7 +96,7 @@ class ProjectSerializer(serializers.ModelSerializer):
         :return:
         """
 
-        relations = eval(instance.relations)
+        relations = instance.get_parsed('relations', [])
         map_relations = []
         for relation in relations:
 
@@ -105,7 +107,7 @@ class ProjectSerializer(serializers.ModelSerializer):
         return map_relations
 
     def get_map_layers_relations_from_vectorjoins(self, layer_id, vectorjoins, layers):
-        joins = eval(vectorjoins)
+        joins = load_text_data(vectorjoins)
         map_relations = []
         for n, join in enumerate(joins):
             if layers[join['joinLayerId']].layer_type in (('postgres', 'spatialite')):
@@ -259,7 +261,7 @@ class LayerSerializer(serializers.ModelSerializer):
         columns = mapLayerAttributes(instance) if instance.database_columns else []
 
         # evalute fields to show or not by qgis project
-        column_to_exlude = eval(instance.exclude_attribute_wms) if instance.exclude_attribute_wms else []
+        column_to_exlude = instance.get_parsed('exclude_attribute_wms', [])
         for column in columns:
             column['show'] = False if column['name'] in column_to_exlude else True
         return columns
@@ -341,7 +343,7 @@ class LayerSerializer(serializers.ModelSerializer):
 
         # eval editor_form_structure
         if ret['editor_form_structure']:
-            ret['editor_form_structure'] = eval(instance.editor_form_structure)
+            ret['editor_form_structure'] = instance.get_parsed('editor_form_structure')
 
         return ret
 
@@ -374,14 +376,18 @@ class WidgetSerializer(serializers.ModelSerializer):
             }
             for field in body['fields']:
 
-                # if widgettype is selectbox, get values
+                # if widgettype is selectbox, get values or autocomplete url
                 if 'widgettype' in field and field['widgettype'] == 'selectbox':
-                    model = create_geomodel_from_qdjango_layer(self.layer)
-                    values = model[0].objects.order_by(field['name']).values(field['name']).distinct()
-                    del(model)
-
                     field['input']['type'] = 'selectfield'
-                    field['input']['options']['values'] = [v[field['name']] for v in values]
+                    field['input']['options']['autocompleteurl'] = reverse(
+                        'qdjango-api-widget-autocomplete', args=[self.layer.project_id, instance.pk])
+                    if settings.VECTOR_SEARCH_SELECTBOX_VALUES:
+                        model = create_geomodel_from_qdjango_layer(self.layer)
+                        values = model[0].objects.order_by(field['name']).values(field['name']).distinct()
+                        del(model)
+                        field['input']['options']['values'] = [v[field['name']] for v in values]
+                    else:
+                        field['input']['options']['values'] = []
 
                 input = field['input']
                 input['options']['blanktext'] = field['blanktext']
@@ -438,6 +444,14 @@ class QGISGeoLayerSerializer(G3WSerializerMixin, geo_serializers.GeoFeatureModel
 
         super(QGISGeoLayerSerializer, self).__init__(*args, **kwargs)
 
+    def get_fields(self):
+        fields = super(QGISGeoLayerSerializer, self).get_fields()
+
+        # read geometry from other attribute, i.e. simplified geometry annotation
+        if getattr(self.Meta, 'geo_field_source', None):
+            fields[self.Meta.geo_field] = G3WGeometryField(source=self.Meta.geo_field_source, read_only=True)
+        return fields
+
     class Meta:
         model = None
         exclude = []
\ No newline at end of file
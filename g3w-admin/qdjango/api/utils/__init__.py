@@ -15,4 +15,23 @@ def serialize_vectorjoin(layer_id, n, join):
             'referencedField': join['targetFieldName'],
             'referencingField': join['joinFieldName']
         }
-    }
\ No newline at end of file
+    }
+
+
+def get_project_relations(project, relation_ids):
+    """
+    Get project relations and layers vectorjoins relations with ids in relation_ids
+    :param project: qdjango Project instance
+    :param relation_ids: list of relations ids
+    :return: dict, relation id: relation
+    """
+    relations = {r['id']: r for r in project.get_parsed('relations', []) if r['id'] in relation_ids}
+
+    # vectorjoins relations ids are <layer qgs id>_vectorjoin_<n>
+    layer_ids = set(r.split('_vectorjoin_')[0] for r in relation_ids if r not in relations and '_vectorjoin_' in r)
+    for layer in project.layer_set.filter(qgs_layer_id__in=layer_ids):
+        for n, join in enumerate(layer.get_parsed('vectorjoins', []) or []):
+            relation = serialize_vectorjoin(layer.qgs_layer_id, n, join)
+            if relation['id'] in relation_ids:
+                relations[relation['id']] = relation
+    return relations
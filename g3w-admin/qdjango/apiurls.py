@@ -1,11 +1,24 @@
 from django.conf.urls import url
 from django.contrib.auth.decorators import login_required
-from .views import QdjangoProjectRelationsApiView
+from .views import QdjangoProjectRelationsApiView, QdjangoProjectRelationsBatchApiView, \
+    QdjangoWidgetAutocompleteApiView, QdjangoProjectSearchApiView
 
 urlpatterns = [
     url(r'^api/relations/(?P<project_id>[0-9]+)/(?P<relation_id>[-_\w\d]+)/(?P<relation_field_value>[-+_\w\d]+)$',
         QdjangoProjectRelationsApiView.as_view(),
         name='qdjango-api-project-relations'),
 
+    url(r'^api/relations/(?P<project_id>[0-9]+)/$',
+        QdjangoProjectRelationsBatchApiView.as_view(),
+        name='qdjango-api-project-relations-batch'),
+
+    url(r'^api/autocomplete/(?P<project_id>[0-9]+)/(?P<widget_id>[0-9]+)/$',
+        QdjangoWidgetAutocompleteApiView.as_view(),
+        name='qdjango-api-widget-autocomplete'),
+
+    url(r'^api/search/(?P<project_id>[0-9]+)/$',
+        QdjangoProjectSearchApiView.as_view(),
+        name='qdjango-api-project-search'),
+
 
 ]
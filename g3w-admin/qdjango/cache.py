@@ -1,6 +1,17 @@
 from django.conf import settings
+from django.core.cache import cache
 from django.http.request import QueryDict
 from .models import Layer
+import hashlib
+
+# cache key of layer data version, every layer data cache key contains it
+LAYER_CACHE_VERSION_KEY = 'qdjango_layer_{}_cache_version'
+
+# cache key of layer statistics, by layer pk and data version
+LAYER_STATS_CACHE_KEY = 'qdjango_layer_stats_{}_{}'
+
+# cache key of search field autocomplete values, by layer pk, data version and hash of field, text and limit
+LAYER_AUTOCOMPLETE_CACHE_KEY = 'qdjango_layer_autocomplete_{}_{}_{}'
 
 
 def get_layer_to_erase_for_project(layer_id):
@@ -14,6 +25,57 @@ def get_layer_to_erase_for_project(layer_id):
     return Layer.objects.filter(datasource=layer.datasource)
 
 
+def get_layer_cache_version(layer_id):
+    """
+    Get current version of layer data cache
+    :param layer_id: qdjango Layer pk
+    :return: integer
+    """
+    key = LAYER_CACHE_VERSION_KEY.format(layer_id)
+    version = cache.get(key)
+    if version is None:
+        version = 1
+        cache.add(key, version, None)
+    return version
+
+
+def get_layer_stats_cache_key(layer_id):
+    """
+    Cache key of layer statistics for current layer data version
+    :param layer_id: qdjango Layer pk
+    :return: string
+    """
+    return LAYER_STATS_CACHE_KEY.format(layer_id, get_layer_cache_version(layer_id))
+
+
+def get_layer_autocomplete_cache_key(layer_id, column, value, limit):
+    """
+    Cache key of search field autocomplete values for current layer data version
+    :param layer_id: qdjango Layer pk
+    :param column: field column name
+    :param value: autocomplete text
+    :param limit: max number of values
+    :return: string
+    """
+    return LAYER_AUTOCOMPLETE_CACHE_KEY.format(
+        layer_id, get_layer_cache_version(layer_id),
+        hashlib.md5(u'{}|{}|{}'.format(column, value, limit).encode('utf-8')).hexdigest())
+
+
+def invalidate_layer_cache(layer):
+    """
+    Increment data cache version of layer and of layers with same datasource,
+    so previous cached data are not used anymore
+    :param layer: qdjango Layer instance
+    """
+    for layer_id in Layer.objects.filter(datasource=layer.datasource).values_list('pk', flat=True):
+        key = LAYER_CACHE_VERSION_KEY.format(layer_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, None)
+
+
 if 'caching' in settings.G3WADMIN_LOCAL_MORE_APPS:
 
     from caching.utils.layer import TilestacheLayerBase
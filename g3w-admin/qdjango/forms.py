@@ -157,3 +157,43 @@ class QdjangoWidgetForm(QdjangoProjectFormMixin, G3WFormMixin, G3WGroupFormMixin
             'body': widgets.HiddenInput
         }
 
+
+class QdjangoLayerSettingsForm(G3WFormMixin, forms.ModelForm):
+    """
+    Form object for vector API settings of Qdjango layer model.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(QdjangoLayerSettingsForm, self).__init__(*args, **kwargs)
+        self.helper = FormHelper(self)
+        self.helper.form_tag = False
+        self.helper.layout = Layout(
+            Div(
+                Div(
+                    'count_strategy',
+                    css_class='col-md-6'
+                ),
+                Div(
+                    'geometry_precision',
+                    css_class='col-md-6'
+                ),
+                css_class='row'
+            ),
+            'search_columns'
+        )
+
+    class Meta:
+        model = Layer
+        fields = (
+            'count_strategy',
+            'geometry_precision',
+            'search_columns'
+        )
+        widgets = {
+            'search_columns': widgets.Textarea(attrs={'rows': 3})
+        }
+        help_texts = {
+            'search_columns': _('JSON list of layer columns names for vector API text search, '
+                                'i.e. ["name", "address"]'),
+            'geometry_precision': _('Decimal digits of geometries coordinates, empty for full precision')
+        }
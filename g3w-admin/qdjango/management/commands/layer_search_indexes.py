@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from core.utils.db import get_write_alias
+from core.utils.models import create_geomodel_from_qdjango_layer
+from core.utils.search import search_index_statements, missing_search_indexes
+from qdjango.models import Layer
+
+
+class Command(BaseCommand):
+    """
+    Check or create search indexes (trigram on Postgis, FTS5 on Spatialite) for layers with searchable columns.
+    """
+    help = 'Check or create search indexes for layers searchable columns'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('layer_ids', nargs='*', type=int, help='Qdjango layers ids, default every layer')
+
+        parser.add_argument(
+            '--project',
+            dest='project_id',
+            type=int,
+            default=None,
+            help='Only layers of this qdjango project id',
+        )
+
+        parser.add_argument(
+            '--create',
+            action='store_true',
+            dest='create',
+            default=False,
+            help='Create missing indexes',
+        )
+
+    def handle(self, *args, **options):
+
+        layers = Layer.objects.filter(layer_type__in=('postgres', 'spatialite')).exclude(search_columns__isnull=True)\
+            .exclude(search_columns='')
+        if options['layer_ids']:
+            layers = layers.filter(pk__in=options['layer_ids'])
+        if options['project_id']:
+            layers = layers.filter(project_id=options['project_id'])
+
+        for layer in layers:
+            columns = layer.get_search_columns()
+            if not columns:
+                self.stdout.write(self.style.WARNING('Layer {} ({}): invalid searchable columns'.format(
+                    layer.name, layer.pk)))
+                continue
+
+            try:
+                geomodel, using, geometrytype = create_geomodel_from_qdjango_layer(layer)
+            except Exception as e:
+                raise CommandError('Layer {} ({}): {}'.format(layer.name, layer.pk, e))
+
+            # Spatialite read connections are query only
+            using = get_write_alias(using)
+            connection = connections[using]
+            missing = missing_search_indexes(geomodel, columns, connection)
+
+            if not missing:
+                self.stdout.write(self.style.SUCCESS('Layer {} ({}): search indexes ok'.format(layer.name, layer.pk)))
+                continue
+
+            if not options['create']:
+                self.stdout.write(self.style.WARNING('Layer {} ({}): missing {}'.format(
+                    layer.name, layer.pk, ', '.join(missing))))
+                continue
+
+            with transaction.atomic(using=using):
+                with connection.cursor() as cursor:
+                    for statement in search_index_statements(geomodel, columns, connection):
+                        cursor.execute(statement)
+
+            self.stdout.write(self.style.SUCCESS('Layer {} ({}): created {}'.format(
+                layer.name, layer.pk, ', '.join(missing))))
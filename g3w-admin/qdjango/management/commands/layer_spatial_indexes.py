@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from core.utils.db import get_write_alias
+from core.utils.models import create_geomodel_from_qdjango_layer, get_geometry_column
+from core.geo.spatialindex import missing_spatial_index, create_spatial_index
+from qdjango.models import Layer
+from qdjango.utils.data import QGIS_LAYER_TYPE_NO_GEOM
+
+
+class Command(BaseCommand):
+    """
+    Check or create Spatialite spatial indexes (R*Tree) of geometry columns of layers.
+    """
+    help = 'Check or create spatial indexes of Spatialite layers geometry columns'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('layer_ids', nargs='*', type=int, help='Qdjango layers ids, default every layer')
+
+        parser.add_argument(
+            '--project',
+            dest='project_id',
+            type=int,
+            default=None,
+            help='Only layers of this qdjango project id',
+        )
+
+        parser.add_argument(
+            '--create',
+            action='store_true',
+            dest='create',
+            default=False,
+            help='Create missing indexes',
+        )
+
+    def handle(self, *args, **options):
+
+        layers = Layer.objects.filter(layer_type='spatialite')
+        if options['layer_ids']:
+            layers = layers.filter(pk__in=options['layer_ids'])
+        if options['project_id']:
+            layers = layers.filter(project_id=options['project_id'])
+
+        for layer in layers:
+
+            try:
+                geomodel, using, geometrytype = create_geomodel_from_qdjango_layer(layer)
+            except Exception as e:
+                raise CommandError('Layer {} ({}): {}'.format(layer.name, layer.pk, e))
+
+            if geometrytype == QGIS_LAYER_TYPE_NO_GEOM:
+                continue
+
+            # Spatialite read connections are query only
+            using = get_write_alias(using)
+            connection = connections[using]
+            geometry_field = get_geometry_column(geomodel).name
+            missing = missing_spatial_index(geomodel, geometry_field, connection)
+
+            if not missing:
+                self.stdout.write(self.style.SUCCESS('Layer {} ({}): spatial index ok'.format(layer.name, layer.pk)))
+                continue
+
+            if not options['create']:
+                self.stdout.write(self.style.WARNING('Layer {} ({}): missing {}'.format(
+                    layer.name, layer.pk, missing)))
+                continue
+
+            with transaction.atomic(using=using):
+                created = create_spatial_index(geomodel, geometry_field, connection)
+
+            if created:
+                self.stdout.write(self.style.SUCCESS('Layer {} ({}): created {}'.format(
+                    layer.name, layer.pk, missing)))
+            else:
+                self.stdout.write(self.style.ERROR('Layer {} ({}): {} not created'.format(
+                    layer.name, layer.pk, missing)))
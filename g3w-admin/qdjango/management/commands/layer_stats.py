@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from core.utils.models import create_geomodel_from_qdjango_layer, get_geometry_column
+from core.utils.stats import layer_statistics
+from qdjango.models import Layer
+from qdjango.utils.data import QGIS_LAYER_TYPE_NO_GEOM
+from qdjango.cache import get_layer_stats_cache_key
+
+
+class Command(BaseCommand):
+    """
+    Precompute and cache statistics of layers, used by vector API stats mode until next layer edit or project reload.
+    """
+    help = 'Precompute statistics of Postgis and Spatialite layers'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('layer_ids', nargs='*', type=int, help='Qdjango layers ids, default every layer')
+
+        parser.add_argument(
+            '--project',
+            dest='project_id',
+            type=int,
+            default=None,
+            help='Only layers of this qdjango project id',
+        )
+
+        parser.add_argument(
+            '--exact',
+            action='store_true',
+            dest='exact',
+            default=False,
+            help='Compute count, extent and distinct values from data, not from db statistics',
+        )
+
+    def handle(self, *args, **options):
+
+        layers = Layer.objects.filter(layer_type__in=('postgres', 'spatialite'))
+        if options['layer_ids']:
+            layers = layers.filter(pk__in=options['layer_ids'])
+        if options['project_id']:
+            layers = layers.filter(project_id=options['project_id'])
+
+        for layer in layers:
+
+            try:
+                geomodel, using, geometrytype = create_geomodel_from_qdjango_layer(layer)
+            except Exception as e:
+                raise CommandError('Layer {} ({}): {}'.format(layer.name, layer.pk, e))
+
+            geometry_field = get_geometry_column(geomodel).name \
+                if geometrytype and geometrytype != QGIS_LAYER_TYPE_NO_GEOM else None
+
+            stats = layer_statistics(
+                geomodel.objects.all(),
+                geometry_field=geometry_field,
+                excluded_fields=layer.get_parsed('exclude_attribute_wms', []),
+                exact=options['exact']
+            )
+            cache.set(get_layer_stats_cache_key(layer.pk), stats, None)
+
+            self.stdout.write(self.style.SUCCESS('Layer {} ({}): {} features'.format(
+                layer.name, layer.pk, stats['count'])))
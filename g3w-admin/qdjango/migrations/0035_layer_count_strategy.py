@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.2 on 2026-10-19 09:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qdjango', '0034_auto_20180822_0830'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='layer',
+            name='count_strategy',
+            field=models.CharField(choices=[('exact', 'Exact'), ('estimate', 'Planner estimate'), ('cached', 'Cached')], default='exact', max_length=20, verbose_name='Features count strategy'),
+        ),
+    ]
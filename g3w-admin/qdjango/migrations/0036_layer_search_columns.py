@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.2 on 2026-10-19 10:03
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qdjango', '0035_layer_count_strategy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='layer',
+            name='search_columns',
+            field=models.TextField(blank=True, null=True, verbose_name='Searchable columns'),
+        ),
+    ]
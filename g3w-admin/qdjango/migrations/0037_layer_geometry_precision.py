@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.2 on 2026-10-19 11:20
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qdjango', '0036_layer_search_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='layer',
+            name='geometry_precision',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Geometry coordinates precision'),
+        ),
+    ]
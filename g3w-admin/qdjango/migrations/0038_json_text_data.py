@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+import ast
+import json
+
+PROJECT_FIELDS = ('initial_extent', 'max_extent', 'layers_tree', 'relations')
+LAYER_FIELDS = ('vectorjoins', 'edittypes', 'editor_form_structure', 'exclude_attribute_wms',
+                'exclude_attribute_wfs', 'database_columns')
+
+
+def to_json(value):
+    """
+    Return python literal text as JSON text, None if value is already JSON or not a literal
+    """
+    try:
+        json.loads(value)
+        return None
+    except ValueError:
+        pass
+    try:
+        return json.dumps(ast.literal_eval(value))
+    except (ValueError, SyntaxError):
+        return None
+
+
+def text_data_to_json(apps, schema_editor):
+    """
+    Convert python repr text of project and layers structured data to JSON
+    """
+    for model_name, fields in (('Project', PROJECT_FIELDS), ('Layer', LAYER_FIELDS)):
+        model = apps.get_model('qdjango', model_name)
+        for row in model.objects.values('pk', *fields).iterator():
+            changes = dict()
+            for field in fields:
+                if row[field]:
+                    value = to_json(row[field])
+                    if value is not None:
+                        changes[field] = value
+            if changes:
+                model.objects.filter(pk=row['pk']).update(**changes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qdjango', '0037_layer_geometry_precision'),
+    ]
+
+    operations = [
+        migrations.RunPython(text_data_to_json, migrations.RunPython.noop),
+    ]
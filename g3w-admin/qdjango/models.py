@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.db import models
 from django.db.models.signals import post_delete
+from django.core.exceptions import ValidationError
 from model_utils.models import TimeStampedModel
 from autoslug import AutoSlugField
 from django.utils.translation import ugettext_lazy as _
@@ -8,12 +9,13 @@ from django.contrib.auth.models import User
 from autoslug.utils import slugify
 from core.models import Group, BaseLayer, GroupProjectPanoramic
 from .utils.storage import QgisFileOverwriteStorage
-from core.mixins.models import G3WACLModelMixins, G3WProjectMixins
+from core.mixins.models import G3WACLModelMixins, G3WProjectMixins, G3WParsedTextFieldsMixin
 from model_utils import Choices
 from usersmanage.utils import setPermissionUserObject, getUserGroups, get_users_for_object
 from usersmanage.configs import *
 from core.configs import *
 from core.receivers import check_overviewmap_project
+import json
 import os
 
 
@@ -35,7 +37,7 @@ def get_thumbnail_path(instance, filename):
     return os.path.join('thumbnails', filename)
 
 
-class Project(G3WProjectMixins, G3WACLModelMixins, TimeStampedModel):
+class Project(G3WProjectMixins, G3WACLModelMixins, G3WParsedTextFieldsMixin, TimeStampedModel):
     """A QGIS project."""
 
     # Project file
@@ -141,9 +143,15 @@ def get_layer_data_file_path(instance, filename):
     return settings.DATASOURCE_PATH
 
 
-class Layer(G3WACLModelMixins, models.Model):
+class Layer(G3WACLModelMixins, G3WParsedTextFieldsMixin, models.Model):
     """A QGIS layer."""
 
+    COUNT_STRATEGIES = Choices(
+        (COUNT_EXACT, _('Exact')),
+        (COUNT_ESTIMATE, _('Planner estimate')),
+        (COUNT_CACHED, _('Cached')),
+    )
+
     TYPES = Choices(
         ('postgres', _('Postgres')),
         ('spatialite', _('SpatiaLite')),
@@ -214,6 +222,16 @@ class Layer(G3WACLModelMixins, models.Model):
     editor_layout = models.CharField(_('Form editor layout'), max_length=100, blank=True, null=True)
     editor_form_structure = models.TextField(_('Editor form structure'), blank=True, null=True)
 
+    # columns for indexed search on vector API (json list)
+    search_columns = models.TextField(_('Searchable columns'), blank=True, null=True)
+
+    # strategy to count features on vector API
+    count_strategy = models.CharField(_('Features count strategy'), choices=COUNT_STRATEGIES, max_length=20,
+                                      default=COUNT_EXACT)
+
+    # default decimal digits of geometries coordinates on vector API
+    geometry_precision = models.PositiveSmallIntegerField(_('Geometry coordinates precision'), blank=True, null=True)
+
     def __unicode__(self):
         return self.name
 
@@ -227,7 +245,53 @@ class Layer(G3WACLModelMixins, models.Model):
         )
 
     def database_columns_by_name(self):
-        return {db_col['name']: db_col for db_col in eval(self.database_columns)}
+        return {db_col['name']: db_col for db_col in self.get_parsed('database_columns', [])}
+
+    def get_search_columns(self):
+        """
+        Searchable columns names, empty list if not set or not valid
+        """
+        if not self.search_columns:
+            return []
+        try:
+            columns = json.loads(self.search_columns)
+        except ValueError:
+            return []
+        if not isinstance(columns, list):
+            return []
+        return [c for c in columns if isinstance(c, basestring)]
+
+    def clean_search_columns(self):
+        """
+        Check search_columns is a JSON list of layer columns names
+        """
+        if not self.search_columns:
+            return
+        try:
+            columns = json.loads(self.search_columns)
+        except ValueError:
+            columns = None
+        if not isinstance(columns, list) or not all(isinstance(c, basestring) for c in columns):
+            raise ValidationError({'search_columns': _('Searchable columns must be a JSON list of columns names')})
+
+        database_columns = self.database_columns_by_name() if self.database_columns else {}
+        unknown = [c for c in columns if database_columns and c not in database_columns]
+        if unknown:
+            raise ValidationError({'search_columns': _('Columns not in layer: {}').format(', '.join(unknown))})
+
+    def clean(self):
+        super(Layer, self).clean()
+        self.clean_search_columns()
+
+    def prune_search_columns(self):
+        """
+        Remove searchable columns not in layer database columns anymore, i.e. on project reload
+        """
+        if not self.search_columns or not self.database_columns:
+            return
+        database_columns = self.database_columns_by_name()
+        columns = [c for c in self.get_search_columns() if c in database_columns]
+        self.search_columns = json.dumps(columns) if columns else None
 
     def getWidgetsNumber(self):
         """
@@ -1,43 +1,47 @@
 from django.dispatch import receiver
-from django.http.request import QueryDict
-from core.signals import perform_client_search
-from OWS.utils.data import GetFeatureInfoResponse
+from django.db.models.signals import post_save
+from django.core.exceptions import ValidationError
+from rest_framework.exceptions import ParseError
+from core.signals import perform_client_search, post_save_maplayer, pre_delete_maplayer
 from .models import Project, Layer, Widget
-from .ows import OWSRequestHandler
+from .cache import invalidate_layer_cache
+from .search import WidgetSearch
 
 
 @receiver(perform_client_search)
 def performWidgetSearch(sender, **kwargs):
+    """
+    Perform search widget on its project layers databases, sender is client search API request
+    """
 
     if 'app_name' not in kwargs or kwargs['app_name'] != 'qdjango':
         return None
 
-    project = Project.objects.get(pk=kwargs['project_id']);
-    widget = Widget.objects.get(pk=kwargs['widget_id'])
+    project = Project.objects.get(pk=kwargs['project_id'])
+    widget = Widget.objects.get(pk=kwargs['widget_id'], widget_type='search')
 
-    data = sender.POST
+    data = sender.data if sender.method == 'POST' else sender.query_params
 
-    # build querydict fro url
-    q = QueryDict('', mutable=True)
-    q['map'] = project.qgis_file.file.name
-    q['SERVICE'] = 'WMS'
-    q['VERSION'] = '1.3.0'
-    q['REQUEST'] = 'GetFeatureInfo'
-    q['LAYERS'] = 'accesso'
-    q['INFO_FORMAT'] = 'text/xml'
-    q['QUERY_LAYERS'] = 'accesso'
-    q['FEATURE_COUNT'] = '1000'
-    q['FILTER'] = 'accesso:"cod_acc" = \'RT046007019737AC\''
+    try:
+        return WidgetSearch(widget, project, data).run()
+    except ValidationError as e:
+        raise ParseError(e.messages[0])
 
-    class Object(object):
-        pass
 
-    request = Object()
-    request.method = 'GET'
-    request.body = ''
-    response = OWSRequestHandler(None).baseDoRequest(q, request=request)
-
-    response = GetFeatureInfoResponse(response.content)
-    return response
+@receiver(post_save_maplayer)
+@receiver(pre_delete_maplayer)
+def invalidateLayerDataCache(sender, **kwargs):
+    """
+    Invalidate layer data cache on features editing, sender is vector API view
+    """
+    layer = getattr(sender, 'layer', None)
+    if isinstance(layer, Layer):
+        invalidate_layer_cache(layer)
 
 
+@receiver(post_save, sender=Layer)
+def invalidateLayerDataCacheOnSave(sender, **kwargs):
+    """
+    Invalidate layer data cache on layer settings update
+    """
+    invalidate_layer_cache(kwargs['instance'])
@@ -0,0 +1,304 @@
+"""
+Search widgets and text search of qdjango projects, performed directly on layers databases (Postgis and Spatialite),
+layer by layer or concurrently.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import OperationalError
+from django.db.models import F, BinaryField
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.db.models.functions import Transform
+from core.geo.functions import SimplifyPreserveTopology
+from core.utils.models import create_geomodel_from_qdjango_layer, get_geometry_column
+from core.utils.db import query_timeout, run_concurrently
+from core.utils.search import search_filter_q, indexed_search_queryset
+from core.utils.geo import transform_length
+from .utils.data import QGIS_LAYER_TYPE_NO_GEOM
+from .models import Layer
+from itertools import chain
+from multiprocessing import TimeoutError
+import json
+import logging
+
+logger = logging.getLogger('g3wadmin.debug')
+
+# annotation name of search output geometry
+SEARCH_GEOMETRY_FIELD = 'g3w_search_geometry'
+
+
+class WidgetSearchResponse(object):
+    """
+    Search results of a widget, for every layer a GeoJSON FeatureCollection
+    """
+
+    def __init__(self):
+        self.layers = []
+
+    @staticmethod
+    def layer_result(layer, featurecollection, limit_reached):
+        return {
+            'id': layer.qgs_layer_id,
+            'name': layer.name,
+            'data': featurecollection,
+            'count': len(featurecollection['features']),
+            'limitReached': limit_reached
+        }
+
+    def add_layer(self, layer, featurecollection, limit_reached):
+        self.layers.append(self.layer_result(layer, featurecollection, limit_reached))
+
+    def asJSON(self):
+
+        return {
+            'layers': self.layers
+        }
+
+
+class LayerSearch(object):
+    """
+    Base search of features of project layers, results are GeoJSON FeatureCollections.
+    Request params:
+        limit: max features for every layer, up to settings.VECTOR_SEARCH_MAX_RESULTS
+        ordering: result field to order by, '-' prefix for descending order
+        resolution: map units per pixel to simplify geometries
+    :param project: qdjango Project instance
+    :param request_data: dict of request params
+    :param timeout: seconds before every layer query is aborted, None for no timeout
+    """
+
+    def __init__(self, project, request_data, timeout=None):
+        self.project = project
+        self.request_data = request_data
+        self.timeout = timeout
+        self.map_srid = project.group.srid.auth_srid
+
+    def get_layers(self):
+        raise NotImplementedError
+
+    def filter_queryset(self, queryset, layer, excluded_fields):
+        raise NotImplementedError
+
+    def get_result_columns(self, layer):
+        """
+        Columns of features properties, every not excluded field if empty
+        """
+        return []
+
+    def get_result_info(self):
+        """
+        Data added to every layer result of concurrent searches, to tell searches apart
+        """
+        return {}
+
+    def get_limit(self):
+        try:
+            limit = int(self.request_data.get('limit', settings.VECTOR_SEARCH_MAX_RESULTS))
+        except ValueError:
+            raise ValidationError('Invalid limit param')
+        return max(1, min(limit, settings.VECTOR_SEARCH_MAX_RESULTS))
+
+    def get_resolution(self):
+        try:
+            resolution = float(self.request_data.get('resolution') or 0)
+        except ValueError:
+            raise ValidationError('Invalid resolution param')
+        return resolution if resolution > 0 else None
+
+    def build_layer_query(self, layer, limit):
+        """
+        Build geomodel and features queryset of one layer, without querying layer db
+        :return: dict, queryset with read alias fixed, values and result columns names
+        """
+        geomodel, using, geometrytype = create_geomodel_from_qdjango_layer(layer)
+        excluded_fields = layer.get_parsed('exclude_attribute_wms', []) or []
+        fields = {f.column: f for f in geomodel._meta.concrete_fields}
+        pk = geomodel._meta.pk
+
+        # read connection alias is fixed, for query timeout
+        queryset = geomodel.objects.all()
+        queryset = self.filter_queryset(queryset.using(queryset.db), layer, excluded_fields)
+
+        names = [c for c in self.get_result_columns(layer) if c in fields] or list(fields.keys())
+        names = [n for n in names if n not in excluded_fields and n != pk.column and
+                 not isinstance(fields[n], (GeometryField, BinaryField))]
+        values = [pk.name] + [fields[n].name for n in names]
+
+        geometry_field = get_geometry_column(geomodel).name \
+            if geometrytype and geometrytype != QGIS_LAYER_TYPE_NO_GEOM else None
+        if geometry_field:
+            geometry = F(geometry_field)
+            resolution = self.get_resolution()
+            if resolution and 'point' not in str(geometrytype).lower():
+                tolerance = resolution * settings.VECTOR_SIMPLIFY_PIXEL_TOLERANCE
+                if layer.srid != self.map_srid:
+                    tolerance = transform_length(tolerance, self.map_srid, layer.srid)
+                geometry = SimplifyPreserveTopology(geometry, tolerance)
+            if layer.srid != self.map_srid:
+                geometry = Transform(geometry, self.map_srid)
+            queryset = queryset.annotate(**{SEARCH_GEOMETRY_FIELD: geometry})
+            values.append(SEARCH_GEOMETRY_FIELD)
+
+        # ordering by a result field
+        ordering = self.request_data.get('ordering')
+        if ordering and ordering.lstrip('-') in names:
+            direction = '-' if ordering.startswith('-') else ''
+            queryset = queryset.order_by(direction + fields[ordering.lstrip('-')].name, pk.name)
+        else:
+            queryset = queryset.order_by(pk.name)
+
+        return {
+            'queryset': queryset.values_list(*values)[:limit + 1],
+            'names': names,
+            'geometry': bool(geometry_field),
+            'limit': limit
+        }
+
+    def fetch_layer_query(self, query):
+        """
+        Run layer query built by build_layer_query, with timeout
+        :return: tuple (GeoJSON FeatureCollection dict, limit reached)
+        """
+        queryset, names, limit = query['queryset'], query['names'], query['limit']
+        with query_timeout(queryset.db, self.timeout):
+            rows = list(queryset)
+        limit_reached = len(rows) > limit
+
+        features = []
+        for row in rows[:limit]:
+            geometry = row[-1] if query['geometry'] else None
+            features.append({
+                'type': 'Feature',
+                'id': row[0],
+                'geometry': json.loads(geometry.json) if geometry else None,
+                'properties': dict(zip(names, row[1:len(names) + 1]))
+            })
+
+        return {'type': 'FeatureCollection', 'features': features}, limit_reached
+
+    def search_layer(self, layer, limit):
+        """
+        Search features of one layer
+        :return: tuple (GeoJSON FeatureCollection dict, limit reached)
+        """
+        return self.fetch_layer_query(self.build_layer_query(layer, limit))
+
+    def run(self):
+        """
+        Search every layer
+        :return: WidgetSearchResponse
+        """
+        limit = self.get_limit()
+        response = WidgetSearchResponse()
+        for layer in self.get_layers():
+            featurecollection, limit_reached = self.search_layer(layer, limit)
+            response.add_layer(layer, featurecollection, limit_reached)
+        return response
+
+
+class WidgetSearch(LayerSearch):
+    """
+    Search features of widget layers in project by widget body fields filters:
+    values are taken from request data by field name, empty values are not used.
+    :param widget: qdjango Widget instance
+    """
+
+    def __init__(self, widget, project, request_data, timeout=None):
+        super(WidgetSearch, self).__init__(project, request_data, timeout=timeout)
+        self.widget = widget
+        self.body = json.loads(widget.body)
+
+    def get_layers(self):
+        return Layer.objects.filter(pk__in=self.widget.layers.all(), project=self.project,
+                                    layer_type__in=('postgres', 'spatialite'))
+
+    def get_filters(self, excluded_fields):
+        """
+        Filters (operator, column, value) of widget fields with a value in request data
+        """
+        filters = []
+        for field in self.body.get('fields', []):
+            value = self.request_data.get(field['name'])
+            if value in (None, ''):
+                continue
+            if field['name'] in excluded_fields:
+                raise ValidationError('Field not searchable: {}'.format(field['name']))
+            filters.append((field['filterop'], field['name'], value))
+        return filters
+
+    def filter_queryset(self, queryset, layer, excluded_fields):
+        return queryset.filter(search_filter_q(queryset.model, self.get_filters(excluded_fields)))
+
+    def get_result_columns(self, layer):
+        return [r['name'] for r in self.body.get('results', []) if r.get('name')]
+
+    def get_result_info(self):
+        return {'widget': self.widget.pk}
+
+
+class TextSearch(LayerSearch):
+    """
+    Search text in searchable columns of project layers, by 'search' request param
+    :param qgs_layer_ids: list of QGIS layers ids
+    """
+
+    def __init__(self, qgs_layer_ids, project, request_data, timeout=None):
+        super(TextSearch, self).__init__(project, request_data, timeout=timeout)
+        self.qgs_layer_ids = qgs_layer_ids
+
+    def get_layers(self):
+        return Layer.objects.filter(qgs_layer_id__in=self.qgs_layer_ids, project=self.project,
+                                    layer_type__in=('postgres', 'spatialite'))\
+            .exclude(search_columns__isnull=True).exclude(search_columns='')
+
+    def filter_queryset(self, queryset, layer, excluded_fields):
+        value = self.request_data.get('search')
+        if not value:
+            raise ValidationError('The search param is required')
+        columns = [c for c in layer.get_search_columns() if c not in excluded_fields]
+        return indexed_search_queryset(queryset, columns, value)
+
+
+def concurrent_search(searches, timeout=None):
+    """
+    Run layers queries of many searches concurrently on query pool, layers results are yielded
+    as soon as every layer query ends. Geomodels and querysets are built in the calling thread,
+    only queries run in pool threads.
+    :param searches: list of LayerSearch instances
+    :param timeout: max seconds of every layer query, from its start
+    :return: generator of dicts, layer result or layer error with 'error' key
+    :raise ValidationError: for invalid params, before any query
+    """
+    tasks = []
+    layers = {}
+    errors = []
+    for n, search in enumerate(searches):
+        limit = search.get_limit()
+        for layer in search.get_layers():
+            key = (n, layer.pk)
+            layers[key] = (search, layer)
+            try:
+                query = search.build_layer_query(layer, limit)
+            except Exception as e:
+                errors.append((key, None, e))
+                continue
+            tasks.append((key, search.fetch_layer_query, (query,)))
+
+    return _concurrent_search_results(errors, run_concurrently(tasks, timeout=timeout), layers)
+
+
+def _concurrent_search_results(errors, results, layers):
+    for key, result, error in chain(errors, results):
+        search, layer = layers[key]
+        if error is None:
+            res = WidgetSearchResponse.layer_result(layer, *result)
+        else:
+            res = {'id': layer.qgs_layer_id, 'name': layer.name, 'data': None}
+            if isinstance(error, ValidationError):
+                res['error'] = error.messages[0]
+            elif isinstance(error, (TimeoutError, OperationalError)):
+                res['error'] = 'Query timeout'
+            else:
+                logger.error('Search on layer {} ({}): {}'.format(layer.name, layer.pk, error))
+                res['error'] = 'Search error'
+        res.update(search.get_result_info())
+        yield res
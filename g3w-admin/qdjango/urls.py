@@ -29,6 +29,8 @@ urlpatterns = [
         login_required(QdjangoLayersListView.as_view()), name='qdjango-project-layers-list'),
     url(r'^jx/(?P<group_slug>[-_\w\d]+)/projects/(?P<project_slug>[-_\w\d]+)/layers/(?P<layer_id>[0-9]+)/cache/$',
         login_required(QdjangoLayerCacheView.as_view()), name='qdjango-project-layers-cache'),
+    url(r'^jx/(?P<group_slug>[-_\w\d]+)/projects/(?P<project_slug>[-_\w\d]+)/layers/(?P<layer_id>[0-9]+)/settings/$',
+        login_required(QdjangoLayerSettingsUpdateView.as_view()), name='qdjango-project-layers-settings'),
     url(r'^(?P<group_slug>[-_\w\d]+)/projects/(?P<project_slug>[-_\w\d]+)/layer/(?P<layer_slug>[-_\w\d]+)/widgets/$',
         login_required(QdjangoLayerWidgetsView.as_view()), name='qdjango-project-layer-widgets'),
 
@@ -428,7 +428,7 @@ class QgisProjectLayer(XmlData):
 
                 # check for values
                 for value in widgetv2config:
-                    data['values'].append(value.attrib)
+                    data['values'].append(dict(value.attrib))
 
                 edittype_columns[edittype.attrib['name']] = data
 
@@ -503,6 +503,9 @@ class QgisProjectLayer(XmlData):
         columns = json.dumps(self.columns) if self.columns else None
         excludeAttributesWMS = json.dumps(self.excludeAttributesWMS) if self.excludeAttributesWMS else None
         excludeAttributesWFS = json.dumps(self.excludeAttributesWFS) if self.excludeAttributesWFS else None
+        vectorjoins = json.dumps(self.vectorjoins) if self.vectorjoins else None
+        editTypes = json.dumps(self.editTypes) if self.editTypes else None
+        editorFormStructure = json.dumps(self.editorformstructure) if self.editorformstructure else None
 
         self.instance, created = Layer.objects.get_or_create(
             name=self.name,
@@ -526,10 +529,10 @@ class QgisProjectLayer(XmlData):
                 'exclude_attribute_wms': excludeAttributesWMS,
                 'exclude_attribute_wfs': excludeAttributesWFS,
                 'geometrytype': self.geometrytype,
-                'vectorjoins': self.vectorjoins,
-                'edittypes': self.editTypes,
+                'vectorjoins': vectorjoins,
+                'edittypes': editTypes,
                 'editor_layout': self.editorlayout,
-                'editor_form_structure': self.editorformstructure,
+                'editor_form_structure': editorFormStructure,
                 }
             )
         if not created:
@@ -550,10 +553,13 @@ class QgisProjectLayer(XmlData):
             self.instance.exclude_attribute_wms = excludeAttributesWMS
             self.instance.exclude_attribute_wfs = excludeAttributesWFS
             self.instance.geometrytype = self.geometrytype
-            self.instance.vectorjoins = self.vectorjoins
-            self.instance.edittypes = self.editTypes
+            self.instance.vectorjoins = vectorjoins
+            self.instance.edittypes = editTypes
             self.instance.editor_layout = self.editorlayout
-            self.instance.editor_form_structure = self.editorformstructure
+            self.instance.editor_form_structure = editorFormStructure
+
+            # searchable columns dropped from datasource
+            self.instance.prune_search_columns()
 
         # Save self.instance
         self.instance.save()
@@ -775,7 +781,7 @@ class QgisProject(XmlData):
 
             # add fieldRef
             field_ref = layer_relation.find('fieldRef')
-            attrib['fieldRef'] = field_ref.attrib
+            attrib['fieldRef'] = dict(field_ref.attrib)
             layer_realtions.append(attrib)
 
         return layer_realtions if layer_realtions else None
@@ -830,6 +836,11 @@ class QgisProject(XmlData):
         :param instance: Project instance
         """
 
+        initialExtent = json.dumps(self.initialExtent)
+        maxExtent = json.dumps(self.maxExtent) if self.maxExtent else None
+        layersTree = json.dumps(self.layersTree) if self.layersTree else None
+        layerRelations = json.dumps(self.layerRelations) if self.layerRelations else None
+
         with transaction.atomic():
             if not instance and not self.instance:
 
@@ -841,14 +852,14 @@ class QgisProject(XmlData):
                     qgis_file=self.qgisProjectFile,
                     group=self.group,
                     title=self.title,
-                    initial_extent=self.initialExtent,
-                    max_extent=self.maxExtent,
+                    initial_extent=initialExtent,
+                    max_extent=maxExtent,
                     thumbnail=thumbnail,
                     description=description,
                     baselayer=baselayer,
                     qgis_version=self.qgisVersion,
-                    layers_tree=self.layersTree,
-                    relations=self.layerRelations
+                    layers_tree=layersTree,
+                    relations=layerRelations
                 )
             else:
                 if instance:
@@ -856,10 +867,10 @@ class QgisProject(XmlData):
                 self.instance.qgis_file = self.qgisProjectFile
                 self.instance.title = self.title
                 self.instance.qgis_version = self.qgisVersion
-                self.instance.initial_extent = self.initialExtent
-                self.instance.max_extent = self.maxExtent
-                self.instance.layers_tree = self.layersTree
-                self.instance.relations = self.layerRelations
+                self.instance.initial_extent = initialExtent
+                self.instance.max_extent = maxExtent
+                self.instance.layers_tree = layersTree
+                self.instance.relations = layerRelations
 
                 self.instance.save()
 
@@ -1,18 +1,30 @@
-from django.db import connections
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import get_language
+from django.contrib.gis.db.models import GeometryField
 from rest_framework.filters import OrderingFilter
-from core.api.base.views import BaseVectorOnModelApiView, IntersectsBBoxFilter, MODE_DATA, MODE_CONFIG, APIException
+from core.api.base.views import BaseVectorOnModelApiView, IntersectsBBoxFilter, MODE_DATA, MODE_CONFIG, MODE_BATCH, \
+    MODE_CLUSTER, MODE_TILES, MODE_STATS, APIException
 from core.api.base.vector import MetadataVectorLayer
+from core.api.base.joins import VectorJoin
 from core.utils.structure import mapLayerAttributesFromModel
 from core.utils.models import create_geomodel_from_qdjango_layer, get_geometry_column
+from core.utils.db import unique_values
 from core.api.permissions import ProjectPermission
-from core.api.filters import DatatablesFilterBackend
+from core.api.filters import DatatablesFilterBackend, ExpressionFilterBackend
 from .utils.edittype import MAPPING_EDITTYPE_QGISEDITTYPE
 from .utils.data import QGIS_LAYER_TYPE_NO_GEOM
 from .api.serializers import QGISLayerSerializer, QGISGeoLayerSerializer
 from .models import Layer
+from .cache import get_layer_cache_version, get_layer_stats_cache_key
+import hashlib
 
 MODE_WIDGET = 'widget'
 
+# relation geomodels built in this process, by relations cache key: referencing QGIS layer id:
+# (geomodel, connection alias, geometry type); cleared when it holds too many keys
+_RELATION_GEOMODELS = dict()
+RELATION_GEOMODELS_MAX_KEYS = 128
 
 class QGISLayerVectorViewMixin(object):
 
@@ -41,31 +53,69 @@ class QGISLayerVectorViewMixin(object):
         # get layer object from qdjango model layer
         return Layer.objects.get(project_id=project_id, qgs_layer_id=layer_id)
 
+    def get_excluded_fields(self):
+
+        if hasattr(self, 'layer'):
+            return list(self.layer.get_parsed('exclude_attribute_wms', []))
+        return []
+
     def get_geoserializer_kwargs(self):
 
         kwargs = {'model': self.metadata_layer.model, 'using': self.database_to_use}
-        if hasattr(self, 'layer') and self.layer.exclude_attribute_wms:
-            kwargs['exclude'] = eval(self.layer.exclude_attribute_wms)
+        excluded_fields = self.get_excluded_fields()
+        if excluded_fields:
+            kwargs['exclude'] = excluded_fields
             if self.metadata_layer.model._meta.pk.name in kwargs['exclude']:
                 kwargs['exclude'].remove(self.metadata_layer.model._meta.pk.name)
 
-
         return kwargs
 
+    def get_relations_cache_key(self):
+        """
+        Cache key of layer relations: project last update (project reload changes join layers too)
+        and relations definitions fingerprint
+        """
+        project = self.layer.project
+        return 'qdjango_layer_relations_{}_{}_{}'.format(
+            project.pk,
+            self.layer.pk,
+            hashlib.md5(repr((project.modified, project.relations, self.layer.vectorjoins)).encode('utf-8'))
+            .hexdigest()
+        )
+
     def set_relations(self):
+        """
+        Set project relations and layer vectorjoins, cached until their definitions change
+        """
+        cache_key = self.relations_cache_key = self.get_relations_cache_key()
+        self.relations = cache.get(cache_key)
+        if self.relations is None:
+            self.relations = self.build_relations()
+            cache.set(cache_key, self.relations, settings.VECTOR_CONFIG_CACHE_TIMEOUT)
+
+    def build_relations(self):
+        """
+        Build relations dict from project relations and layer vectorjoins,
+        join layers are resolved in one query
+        """
 
         # get relations on project
-        self.relations = {} if not self.layer.project.relations else \
-            {r['id']: r for r in eval(self.layer.project.relations)}
+        relations = {r['id']: r for r in self.layer.project.get_parsed('relations', [])}
 
         # get relations on layer
         if self.layer.vectorjoins:
-            joins = eval(self.layer.vectorjoins)
+            joins = self.layer.get_parsed('vectorjoins')
+            join_layers = {qgs_layer_id: (layer_type, name) for qgs_layer_id, layer_type, name in
+                           Layer.objects.filter(
+                               project=self.layer.project,
+                               qgs_layer_id__in=[join['joinLayerId'] for join in joins]
+                           ).values_list('qgs_layer_id', 'layer_type', 'name')}
+
             for n, join in enumerate(joins):
-                if Layer.objects.get(qgs_layer_id=join['joinLayerId'], project=self.layer.project).layer_type \
-                        in (('postgres', 'spatialite')):
+                if join['joinLayerId'] in join_layers and \
+                        join_layers[join['joinLayerId']][0] in ('postgres', 'spatialite'):
                     name = '{}_vectorjoin_{}'.format(self.layer.qgs_layer_id, n)
-                    self.relations[name] = {
+                    relations[name] = {
                         'id': name,
                         'name': name,
                         'referencedLayer': self.layer.qgs_layer_id,
@@ -73,23 +123,71 @@ class QGISLayerVectorViewMixin(object):
                         'fieldRef': {
                             'referencedField': join['targetFieldName'],
                             'referencingField': join['joinFieldName']
-                        }
+                        },
+                        'prefix': self.get_vectorjoin_prefix(join, join_layers[join['joinLayerId']][1])
                     }
+        return relations
+
+    @staticmethod
+    def get_vectorjoin_prefix(join, join_layer_name):
+        """
+        Prefix of joined fields like QGIS: custom prefix if set, else '<join layer name>_'
+        """
+        if join.get('hasCustomPrefix', '1' if 'customPrefix' in join else '0') in ('1', 'true'):
+            return join.get('customPrefix', '')
+        return '{}_'.format(join_layer_name)
+
+    def get_vectorjoins(self):
+        """
+        Vector joins of layer, from relations metadata
+        """
+        joins = []
+        for metadata_relation in self.metadata_relations.values():
+            relation = self.relations.get(metadata_relation.relation_id)
+            if not relation or 'prefix' not in relation:
+                continue
+            joins.append(VectorJoin(
+                metadata_relation.model,
+                metadata_relation.using,
+                join_field=metadata_relation.referencing_field,
+                target_field=relation['fieldRef']['referencedField'],
+                prefix=relation['prefix'],
+                excluded_fields=metadata_relation.layer.get_parsed('exclude_attribute_wms', [])
+            ))
+        return joins
 
     def set_metadata_relations(self, request, **kwargs):
+        """
+        Build relations metadata, called on first access to metadata_relations
+        """
 
         # init relations
         self.set_relations()
 
+        # get relation layers objects in one query
+        referencing_layers = [r['referencingLayer'] for r in self.relations.values()
+                              if r['referencedLayer'] == self.layer.qgs_layer_id]
+        relation_layers = {l.qgs_layer_id: l for l in Layer.objects.filter(
+            project=self.layer.project, qgs_layer_id__in=referencing_layers)}
+
+        # geomodels are built once for every relations definition
+        geomodels = _RELATION_GEOMODELS.get(self.relations_cache_key)
+        if geomodels is None:
+            if len(_RELATION_GEOMODELS) >= RELATION_GEOMODELS_MAX_KEYS:
+                _RELATION_GEOMODELS.clear()
+            geomodels = _RELATION_GEOMODELS[self.relations_cache_key] = dict()
+
         for idr, relation in self.relations.items():
 
             # check if in relation there is referencedLayer == self layer
-            if relation['referencedLayer'] == self.layer.qgs_layer_id:
+            if relation['referencedLayer'] == self.layer.qgs_layer_id and \
+                    relation['referencingLayer'] in relation_layers:
                 # get relation layer object
-                relation_layer = Layer.objects.get(qgs_layer_id=relation['referencingLayer'],
-                                                   project=self.layer.project)
+                relation_layer = relation_layers[relation['referencingLayer']]
 
-                geomodel, database_to_use, geometrytype = create_geomodel_from_qdjango_layer(relation_layer)
+                if relation_layer.qgs_layer_id not in geomodels:
+                    geomodels[relation_layer.qgs_layer_id] = create_geomodel_from_qdjango_layer(relation_layer)
+                geomodel, database_to_use, geometrytype = geomodels[relation_layer.qgs_layer_id]
 
                 if geometrytype and geometrytype != QGIS_LAYER_TYPE_NO_GEOM:
                     serializer = QGISGeoLayerSerializer
@@ -117,6 +215,21 @@ class QGISLayerVectorViewMixin(object):
         # set layer_name
         self.layer_name = self.layer.origname
 
+        # set features count strategy
+        self.count_strategy = self.layer.count_strategy
+
+        # set columns for indexed search
+        self.search_columns = self.layer.get_search_columns() or None
+
+        # set default coordinates precision
+        self.geometry_precision = self.layer.geometry_precision
+
+        # cached layer structure of config mode doesn't need geomodel
+        if self.mode_call == MODE_CONFIG:
+            self.cached_config = self.get_cached_config()
+            if self.cached_config is not None:
+                return
+
         geomodel, self.database_to_use, geometrytype = create_geomodel_from_qdjango_layer(self.layer)
 
         if geometrytype is None:
@@ -143,16 +256,22 @@ class LayerVectorView(QGISLayerVectorViewMixin, BaseVectorOnModelApiView):
 
     permission_classes = (ProjectPermission,)
 
-    filter_backends = (OrderingFilter, DatatablesFilterBackend)
+    filter_backends = (OrderingFilter, ExpressionFilterBackend, DatatablesFilterBackend)
     ordering_fields = '__all__'
 
     # Modes call avilable
     modes_call_available = [
         MODE_CONFIG,
         MODE_DATA,
-        MODE_WIDGET
+        MODE_WIDGET,
+        MODE_BATCH,
+        MODE_CLUSTER,
+        MODE_TILES,
+        MODE_STATS
     ]
 
+    replica_modes_call = BaseVectorOnModelApiView.replica_modes_call + [MODE_WIDGET]
+
     mapping_layer_attributes_function = mapLayerAttributesFromModel
 
     def initial(self, request, *args, **kwargs):
@@ -178,7 +297,7 @@ class LayerVectorView(QGISLayerVectorViewMixin, BaseVectorOnModelApiView):
             }
 
             # reduild edittypes
-            edittypes = eval(self.layer.edittypes)
+            edittypes = self.layer.get_parsed('edittypes')
             allow_edittypes = MAPPING_EDITTYPE_QGISEDITTYPE.keys()
 
             for field, data in edittypes.items():
@@ -190,49 +309,74 @@ class LayerVectorView(QGISLayerVectorViewMixin, BaseVectorOnModelApiView):
 
         return fields
 
+    def get_config_cache_key(self):
+        """
+        Cache key of layer structure: layer row fingerprint, with database columns stored on project load,
+        and language, so key changes on project reload without reflecting geomodel
+        """
+        layer_row = [getattr(self.layer, f.attname) for f in Layer._meta.concrete_fields]
+
+        return 'qdjango_layer_config_{}_{}_{}'.format(
+            self.layer.pk,
+            get_language(),
+            hashlib.md5(repr(layer_row).encode('utf-8')).hexdigest()
+        )
+
+    def get_stats_cache_key(self):
+        """
+        Cache key of layer statistics, the same of layer_stats command
+        """
+        return get_layer_stats_cache_key(self.layer.pk)
+
+    def get_tile_cache_name(self):
+        """
+        Name of layer vector tiles in TileStache cache by layer data version, excluded fields are in name too
+        """
+        return 'qdjango_layer_tile_{}_{}_{}'.format(
+            self.layer.pk,
+            get_layer_cache_version(self.layer.pk),
+            hashlib.md5(repr(sorted(self.get_excluded_fields())).encode('utf-8')).hexdigest()
+        )
+
     def response_widget_unique_data(self, request_data):
         """
-        Execute a distinc query for unique editing qgis widget
+        Get distinct values of fields for unique editing qgis widget in one db round trip,
+        optional 'limit' and 'startswith' (case insensitive) params for autocomplete.
+        Results are cached by layer data version.
         """
         if 'fields' not in request_data:
             raise APIException('The \'fields\' param not in request data')
 
-
         # get fields to get unique value:
-        fields = request_data['fields'].split(',')
+        columns = [c for c in request_data['fields'].split(',') if c]
 
-        if len(fields) == 0:
+        if len(columns) == 0:
             raise APIException('The \'fields\' param is empty')
 
-        res = dict()
-        for field in fields:
-
-            # check if field is nullable
-            nullable = False
-
-            for ofield in self.metadata_layer.model._meta.fields:
-                if ofield.column == field and ofield.null and ofield.blank:
-                    nullable = True
-
-            if self.layer.layer_type == 'spatialite':
-
-                # query raw
-                with connections[self.database_to_use].cursor() as cursor:
-                    cursor.execute(
-                        'select distinct {0} from {1} {2}'.format(
-                            field,
-                            self.metadata_layer.model._meta.db_table,
-                            '' if nullable else 'where {} is not null'.format(field)
-                        ))
-                    raws = cursor.fetchall()
-                    field_values = [r[0] for r in raws]
-
-            else:
-
-                # get value
-                field_values = [getattr(r, field)
-                                for r in self.metadata_layer.model.objects.order_by(field).distinct(field)]
-            res[field] = field_values
+        model_fields = {f.column: f for f in self.metadata_layer.model._meta.concrete_fields
+                        if not isinstance(f, GeometryField)}
+        unknown = [c for c in columns if c not in model_fields]
+        if unknown:
+            raise APIException('Fields not in layer: {}'.format(', '.join(unknown)))
+
+        try:
+            limit = int(request_data['limit']) if request_data.get('limit') else None
+        except ValueError:
+            raise APIException('The \'limit\' param is not an integer')
+        if limit is not None and limit < 1:
+            raise APIException('The \'limit\' param has to be greater than 0')
+        startswith = request_data.get('startswith') or None
+
+        cache_key = 'qdjango_widget_unique_{}_{}_{}'.format(
+            self.layer.pk,
+            get_layer_cache_version(self.layer.pk),
+            hashlib.md5(u'{}|{}|{}'.format(','.join(columns), limit, startswith).encode('utf-8')).hexdigest())
+
+        res = cache.get(cache_key)
+        if res is None:
+            res = unique_values(self.metadata_layer.get_queryset(), [model_fields[c] for c in columns],
+                                limit=limit, startswith=startswith)
+            cache.set(cache_key, res, settings.VECTOR_WIDGET_UNIQUE_CACHE_TIMEOUT)
 
         return res
 
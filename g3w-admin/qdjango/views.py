@@ -24,7 +24,7 @@ from usersmanage.mixins.views import G3WACLViewMixin
 from .signals import load_qdjango_widgets_data
 from .mixins.views import *
 from .forms import *
-from .api.utils import serialize_vectorjoin
+from .api.utils import get_project_relations
 import json
 from collections import OrderedDict
 
@@ -165,8 +165,19 @@ class QdjangoProjectDeleteView(G3WAjaxDeleteViewMixin, SingleObjectMixin, View):
         return super(QdjangoProjectDeleteView, self).post(request, *args, **kwargs)
 
 
-from core.utils.db import build_dango_connection_name, build_django_connection, dictfetchall
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import BinaryField
+from django.http import StreamingHttpResponse
+from django.contrib.gis.db.models import GeometryField
+from django.shortcuts import get_object_or_404
+from rest_framework.exceptions import ParseError, NotFound
+from core.utils.db import build_dango_connection_name, build_django_connection, dictfetchall, related_rows
+from core.utils.models import create_geomodel_from_qdjango_layer
+from core.utils.search import autocomplete_values
 from qdjango.utils.structure import datasource2dict
+from .cache import get_layer_autocomplete_cache_key
+from .search import WidgetSearch, TextSearch, concurrent_search
 from .api.permissions import ProjectRelationPermission
 
 
@@ -185,19 +196,7 @@ class QdjangoProjectRelationsApiView(APIView):
         project = Project.objects.get(pk=project_id)
 
         # ty to get project relations and if fail layer relations
-        try:
-            relations = {r['id']: r for r in eval(project.relations)}
-            relation = relations[relation_id]
-        except Exception as e:
-
-            # try to get layer relations
-            layer_id = relation_id.split('_vectorjoin_')[0]
-            layer = project.layer_set.filter(qgs_layer_id=layer_id)[0]
-            joins = eval(layer.vectorjoins)
-            for n, join in enumerate(joins):
-                serialized_relation = serialize_vectorjoin(layer.qgs_layer_id, n, join)
-                if serialized_relation['id'] == relation_id:
-                    relation = serialized_relation
+        relation = get_project_relations(project, [relation_id])[relation_id]
 
         # get layer for query:
         referencing_layer = Layer.objects.get(qgs_layer_id=relation['referencingLayer'], project=project)
@@ -206,13 +205,14 @@ class QdjangoProjectRelationsApiView(APIView):
         db_columns_referencing_layer = referencing_layer.database_columns_by_name() \
             if referencing_layer.database_columns else None
 
-        exclude_columns = eval(referencing_layer.exclude_attribute_wms) \
-            if referencing_layer.exclude_attribute_wms else None
+        exclude_columns = referencing_layer.get_parsed('exclude_attribute_wms')
 
-        # build using connection name
+        # build using connection name, connection is kept for next requests
         datasource = datasource2dict(referencing_layer.datasource)
         using = build_dango_connection_name(referencing_layer.datasource)
-        connections.databases[using] = build_django_connection(datasource, layer_type=referencing_layer.layer_type)
+        if using not in connections.databases:
+            connections.databases[using] = build_django_connection(datasource,
+                                                                   layer_type=referencing_layer.layer_type)
 
         # exec raw query
         # todo: better
@@ -266,12 +266,215 @@ class QdjangoProjectRelationsApiView(APIView):
                     new_rn[f] = rn[f]
             rowss.append(new_rn)
 
-        # remove new db connection
-        del connections.databases[using]
-
         return Response(rowss)
 
 
+def get_list_param(data, name):
+    """
+    List param from POST list or GET comma separated values
+    """
+    value = data.get(name) if isinstance(data, dict) else None
+    if isinstance(value, list):
+        return value
+    return [v for v in (value or '').split(',') if v]
+
+
+class QdjangoProjectRelationsBatchApiView(APIView):
+    """
+    Return paged rows of many relations for many parent features values,
+    one query with bound parameters for every relation.
+    Params (GET or POST):
+        relations: comma separated relations ids (list by POST)
+        values: comma separated parent features key values (list by POST), 'NULL' for null
+        limit, offset: paging of rows for every parent value
+    """
+
+    permission_classes = [
+        ProjectRelationPermission
+    ]
+
+    def _get_int_param(self, data, name, default):
+        try:
+            return int(data.get(name, default))
+        except (TypeError, ValueError):
+            raise ParseError('Invalid {} param'.format(name))
+
+    def get_response(self, request, project_id):
+
+        data = request.data if request.method == 'POST' else request.query_params
+        relation_ids = get_list_param(data, 'relations')
+        values = [None if v is None or (isinstance(v, basestring) and v.upper() == 'NULL') else v
+                  for v in get_list_param(data, 'values')]
+        if not relation_ids or not values:
+            raise ParseError('relations and values params are required')
+
+        limit = min(self._get_int_param(data, 'limit', settings.VECTOR_RELATIONS_PAGE_SIZE),
+                    settings.VECTOR_RELATIONS_PAGE_SIZE)
+        offset = self._get_int_param(data, 'offset', 0)
+        if limit < 1 or offset < 0:
+            raise ParseError('Invalid paging params')
+
+        project = get_object_or_404(Project, pk=project_id)
+        relations = get_project_relations(project, relation_ids)
+        missing = [r for r in relation_ids if r not in relations]
+        if missing:
+            raise NotFound('Relations not found: {}'.format(', '.join(missing)))
+
+        layers = {l.qgs_layer_id: l for l in project.layer_set.filter(
+            qgs_layer_id__in=[relations[r]['referencingLayer'] for r in relation_ids])}
+
+        res = OrderedDict()
+        for relation_id in relation_ids:
+            relation = relations[relation_id]
+            layer = layers.get(relation['referencingLayer'])
+            if layer is None or layer.layer_type not in ('postgres', 'spatialite'):
+                raise ParseError('Relation {} layer is not a database layer'.format(relation_id))
+
+            # pooled connection of layer datasource
+            geomodel, using, geometrytype = create_geomodel_from_qdjango_layer(layer)
+            fields = {f.column: f for f in geomodel._meta.concrete_fields}
+            field = fields.get(relation['fieldRef']['referencingField'])
+            if field is None:
+                raise ParseError('Relation {} field not in layer'.format(relation_id))
+
+            excluded = layer.get_parsed('exclude_attribute_wms', []) or []
+            columns = [f for f in geomodel._meta.concrete_fields
+                       if f.name not in excluded and not isinstance(f, (GeometryField, BinaryField))]
+
+            try:
+                parent_values = OrderedDict((field.to_python(v), v) for v in values)
+            except ValidationError:
+                raise ParseError('Invalid values for relation {}'.format(relation_id))
+
+            rows = OrderedDict()
+            keys = list(parent_values.keys())
+            for n in range(0, len(keys), settings.VECTOR_BATCH_SIZE):
+                rows.update(related_rows(geomodel.objects.all(), field, keys[n:n + settings.VECTOR_BATCH_SIZE],
+                                         columns, offset=offset, limit=limit))
+
+            res[relation_id] = OrderedDict()
+            for value, value_rows in rows.items():
+                res[relation_id]['NULL' if value is None else parent_values[value]] = {
+                    'count': value_rows['count'],
+                    'rows': value_rows['rows']
+                }
+
+        return Response(res)
+
+    def get(self, request, format=None, project_id=None):
+        return self.get_response(request, project_id)
+
+    def post(self, request, format=None, project_id=None):
+        return self.get_response(request, project_id)
+
+
+class QdjangoWidgetAutocompleteApiView(APIView):
+    """
+    Return top values of a search widget field for autocomplete, prefix matches first then substring matches.
+    Values are cached by layer data version.
+    Params:
+        field: widget field name
+        value: text typed by user, empty for first values
+        limit: max number of values, up to settings.VECTOR_AUTOCOMPLETE_MAX_RESULTS
+    """
+
+    permission_classes = [
+        ProjectRelationPermission
+    ]
+
+    def get(self, request, format=None, project_id=None, widget_id=None):
+
+        project = get_object_or_404(Project, pk=project_id)
+        widget = get_object_or_404(Widget, pk=widget_id, widget_type='search')
+
+        column = request.query_params.get('field')
+        if column not in [f['name'] for f in json.loads(widget.body).get('fields', [])]:
+            raise ParseError('Invalid field param')
+        value = request.query_params.get('value', '')
+
+        try:
+            limit = int(request.query_params.get('limit', settings.VECTOR_AUTOCOMPLETE_MAX_RESULTS))
+        except ValueError:
+            raise ParseError('Invalid limit param')
+        limit = max(1, min(limit, settings.VECTOR_AUTOCOMPLETE_MAX_RESULTS))
+
+        values = []
+        for layer in WidgetSearch(widget, project, {}).get_layers():
+            if column in (layer.get_parsed('exclude_attribute_wms', []) or []):
+                raise ParseError('Field not searchable: {}'.format(column))
+
+            cache_key = get_layer_autocomplete_cache_key(layer.pk, column, value, limit)
+            layer_values = cache.get(cache_key)
+            if layer_values is None:
+                geomodel, using, geometrytype = create_geomodel_from_qdjango_layer(layer)
+                fields = {f.column: f for f in geomodel._meta.concrete_fields}
+                if column not in fields:
+                    raise ParseError('Field not in layer: {}'.format(column))
+                layer_values = autocomplete_values(geomodel.objects.all(), fields[column], value, limit)
+                cache.set(cache_key, layer_values, settings.VECTOR_WIDGET_UNIQUE_CACHE_TIMEOUT)
+
+            values += [v for v in layer_values if v not in values]
+
+        return Response({
+            'field': column,
+            'values': values[:limit]
+        })
+
+
+class QdjangoProjectSearchApiView(APIView):
+    """
+    Run many searches on project layers concurrently, every layer query with a timeout.
+    Response is NDJSON: a line for every layer as soon as its query ends, partial results
+    on timeouts ('error' key).
+    Params (GET or POST):
+        widgets: comma separated search widgets ids (list by POST), fields values by field name
+        layers: comma separated QGIS layers ids (list by POST), for text search of 'search' param
+            on layers searchable columns
+        limit, ordering, resolution: see qdjango.search.LayerSearch
+    """
+
+    permission_classes = [
+        ProjectRelationPermission
+    ]
+
+    def get_response(self, request, project_id):
+
+        data = request.data if request.method == 'POST' else request.query_params
+        widget_ids = get_list_param(data, 'widgets')
+        qgs_layer_ids = get_list_param(data, 'layers')
+        if not widget_ids and not qgs_layer_ids:
+            raise ParseError('widgets or layers params are required')
+
+        project = get_object_or_404(Project, pk=project_id)
+        timeout = settings.VECTOR_SEARCH_LAYER_TIMEOUT
+
+        try:
+            widgets = Widget.objects.filter(pk__in=[int(w) for w in widget_ids], widget_type='search',
+                                            layers__project=project).distinct()
+        except ValueError:
+            raise ParseError('Invalid widgets param')
+        if len(widgets) != len(set(widget_ids)):
+            raise NotFound('Search widgets not found in project')
+
+        searches = [WidgetSearch(w, project, data, timeout=timeout) for w in widgets]
+        if qgs_layer_ids:
+            searches.append(TextSearch(qgs_layer_ids, project, data, timeout=timeout))
+
+        try:
+            results = concurrent_search(searches, timeout=timeout)
+        except ValidationError as e:
+            raise ParseError(e.messages[0])
+
+        lines = (json.dumps(res, cls=DjangoJSONEncoder) + '\n' for res in results)
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+    def get(self, request, format=None, project_id=None):
+        return self.get_response(request, project_id)
+
+    def post(self, request, format=None, project_id=None):
+        return self.get_response(request, project_id)
+
+
 # For layers
 class QdjangoLayersListView(G3WRequestViewMixin, G3WGroupViewMixin, QdjangoProjectViewMixin, ListView):
     template_name = 'qdjango/layers_list.html'
@@ -296,7 +499,7 @@ class QdjangoLayersListView(G3WRequestViewMixin, G3WGroupViewMixin, QdjangoProje
         qlayers = self.get_queryset()
         layers = {l.qgs_layer_id: l for l in qlayers}
 
-        layersTree = eval(project.layers_tree)
+        layersTree = project.get_parsed('layers_tree')
         layersTreeBoostrap = []
 
         def buildLeaf(layer):
@@ -319,6 +522,12 @@ class QdjangoLayersListView(G3WRequestViewMixin, G3WGroupViewMixin, QdjangoProje
             'spatialite',
             'ogr'
         )
+
+        # layers with vector API settings: count strategy, searchable columns, geometry precision
+        context['type_layer_for_vector_settings'] = (
+            'postgres',
+            'spatialite'
+        )
         return context
 
 
@@ -370,6 +579,28 @@ class QdjangoLayerDataView(G3WGroupViewMixin, QdjangoProjectViewMixin, View):
         return JsonResponse({'Saved': 'ok'})
 
 
+class QdjangoLayerSettingsUpdateView(G3WGroupViewMixin, QdjangoProjectViewMixin, AjaxableFormResponseMixin,
+                                     UpdateView):
+    """
+    Vector API settings of layer: features count strategy, searchable columns, geometry precision
+    """
+
+    form_class = QdjangoLayerSettingsForm
+    model = Layer
+    template_name = 'qdjango/ajax/layer_settings_form.html'
+
+    @method_decorator(permission_required('qdjango.change_project', (Project, 'slug', 'project_slug'),
+                                          raise_exception=True))
+    def dispatch(self, *args, **kwargs):
+        return super(QdjangoLayerSettingsUpdateView, self).dispatch(*args, **kwargs)
+
+    def get_object(self, queryset=None):
+        return get_object_or_404(Layer, project=self.project, pk=self.kwargs['layer_id'])
+
+    def get_success_url(self):
+        return None
+
+
 class QdjangoLayerWidgetsView(G3WGroupViewMixin, QdjangoProjectViewMixin, QdjangoLayerViewMixin, ListView):
 
     model = Widget